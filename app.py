@@ -1,19 +1,138 @@
 import streamlit as st
 import os
+import time
 import tempfile
 import shutil
+from collections import deque
 from datetime import datetime
-from processing.extract_audio import extract_audio_from_url
-from processing.transcribe import transcribe_audio
-from processing.summarize_and_generate import generate_content
-from utils.file_manager import save_outputs, create_directories
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from processing.extract_audio import get_video_id
+from processing.transcription_worker import get_worker_status
+from processing.gemini_client import GeminiError, get_gemini_client
+from processing.summarize_and_generate import (
+    CONTENT_MODE, needs_map_reduce, stream_summary, stream_hashtags, stream_titles,
+    prefetch_stream, parse_hashtags, parse_titles
+)
+from processing.speculative import SPECULATIVE_GENERATION, SpeculativeGenerator, get_speculative_mode
+from processing.pipeline import (
+    load_cached_transcript, fetch_audio, run_transcription, run_generation, job_profile,
+    load_cached_content, store_content
+)
+from processing.transcribe import choose_profile
+from processing.job_queue import JOB_QUEUE_IN_APP, start_scheduler, queue_status
+from utils.file_manager import (
+    save_outputs, create_directories, cleanup_temp_files,
+    list_previous_results, load_previous_results
+)
+from utils.run_store import run_file, find_run
+from utils.jobs import (
+    JOB_STATES, open_foreground_job, advance_job, fail_job, load_segments,
+    submit_job, get_job, release_job
+)
+from utils.search_index import search
+from utils.metrics import read_metrics, summarize_metrics, start_metrics_server, METRICS_LOG
+
+# Number of recent segments shown while transcription is running
+LIVE_SEGMENT_LINES = 8
+
+# Number of saved runs offered in the sidebar
+HISTORY_RUNS = 20
+
+# Number of hits shown on the search page
+SEARCH_RESULTS = 25
+
+# Number of recent metric records the diagnostics page aggregates
+DIAGNOSTICS_RECORDS = 1000
+
+# Seconds between refreshes of background job status
+JOB_POLL_SECONDS = 2
+
+# Job priorities offered in the sidebar
+PRIORITIES = {"Low": -1, "Normal": 0, "High": 1}
+
+def format_timestamp(seconds):
+    """Format seconds as m:ss or h:mm:ss"""
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
+
+def current_user():
+    """
+    Identify who submits jobs, for per-user fairness in the job queue
+
+    Signed-in users (st.login) are identified by email, which holds
+    across tabs and reloads. Otherwise the client address is used, and
+    failing that the browser session, so fairness is per tab.
+    """
+    if st.user.get('is_logged_in') and st.user.get('email'):
+        return f"user:{st.user.get('email')}"
+    address = st.context.ip_address
+    if address:
+        return f"ip:{address}"
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return f"session:{ctx.session_id}" if ctx else None
 
 def main():
+    # Serves /metrics when METRICS_PORT is set
+    start_metrics_server()
+    
+    # Background workers for queued jobs (once per process)
+    start_scheduler()
+    
+    page = st.sidebar.radio("Page", ["🎥 Process video", "🗂️ Jobs", "🔎 Search", "📈 Diagnostics"])
+    if page == "🗂️ Jobs":
+        jobs_page()
+        return
+    if page == "🔎 Search":
+        search_page()
+        return
+    if page == "📈 Diagnostics":
+        diagnostics_page()
+        return
+    
     st.title("🎥 YouTube Content Optimizer")
     st.markdown("**AI-powered tool to generate summaries, hashtags, and titles from YouTube videos**")
     
     # Create necessary directories
     create_directories()
+    cleanup_temp_files()
+    
+    # Transcription worker load, when one is configured
+    worker_status = get_worker_status()
+    if worker_status:
+        st.sidebar.subheader("🎤 Transcription worker")
+        st.sidebar.metric("Queued jobs", worker_status['queue_depth'])
+        st.sidebar.metric("Active jobs", f"{worker_status['active_jobs']} / {worker_status['models']}")
+    
+    background = st.sidebar.checkbox(
+        "🧵 Run in the background queue",
+        value=JOB_QUEUE_IN_APP,
+        help="Queue the video and keep the page responsive; progress is polled "
+             "and the job survives closing the tab"
+    )
+    priority = "Normal"
+    if background:
+        priority = st.sidebar.select_slider("Priority", options=list(PRIORITIES), value="Normal")
+    
+    speculative = st.sidebar.checkbox(
+        "⚡ Overlap generation with transcription",
+        value=SPECULATIVE_GENERATION,
+        help="Start hashtags, titles and part summaries from the first minutes of "
+             "transcript while the rest is still being transcribed"
+    )
+    
+    # Previous runs, read from the run index without loading transcripts
+    previous_run = None
+    runs = list_previous_results(limit=HISTORY_RUNS)
+    if runs:
+        st.sidebar.subheader("🕘 Previous runs")
+        previous_run = st.sidebar.selectbox(
+            "Open a previous run",
+            [None] + runs,
+            format_func=lambda run: "—" if run is None else f"{run['created']} · {run.get('video_id') or 'local file'}"
+        )
     
     # Input section
     st.header("📝 Input")
@@ -30,69 +149,414 @@ def main():
             st.error("Please enter a valid YouTube URL")
             return
             
-        process_video(youtube_url)
+        if background:
+            job = submit_job(
+                youtube_url, get_video_id(youtube_url), user_id=current_user(), priority=PRIORITIES[priority]
+            )
+            st.session_state['job_id'] = job['job_id']
+            job_panel(job['job_id'])
+        else:
+            process_video(youtube_url, speculative=speculative)
+    elif previous_run:
+        content = load_previous_results(previous_run)
+        if content:
+            display_results(content, content.get('transcript', ''))
+            display_downloads(previous_run)
+    elif st.session_state.get('job_id'):
+        job_panel(st.session_state['job_id'])
+
+def job_panel(job_id):
+    """Show a background job: live status while it runs, results once saved"""
+    job = get_job(job_id)
+    if not job:
+        st.warning("This job is no longer in the queue")
+        return
+    
+    if job['state'] == 'saved':
+        record = find_run(job['run_id']) if job['run_id'] else None
+        content = load_previous_results(record) if record else None
+        if not content:
+            st.warning("The job finished but its run could not be loaded")
+            return
+        display_results(content, content.get('transcript', ''))
+        display_downloads(record)
+        return
+    
+    job_status(job_id)
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def job_status(job_id):
+    """Poll a queued or running job until it is saved"""
+    job = get_job(job_id)
+    if not job:
+        return
+    if job['state'] == 'saved':
+        # Switch the page over to the results
+        st.rerun()
+    
+    st.header("⏳ Job status")
+    done = JOB_STATES.index(job['state'])
+    fraction = done / (len(JOB_STATES) - 1)
+    if job['stage'] == "transcribe" and job['progress']:
+        fraction += job['progress'] / (len(JOB_STATES) - 1)
+    st.progress(min(fraction, 1.0))
+    
+    if job['error'] and not job['claimed_by']:
+        st.error(f"The job stopped after '{job['state']}': {job['error']}")
+        if st.button("🔁 Retry"):
+            submit_job(job['url'], job['video_id'], user_id=current_user(), priority=job['priority'])
+            st.rerun()
+        return
+    
+    status = next((entry for entry in queue_status()['jobs'] if entry['job_id'] == job_id), None)
+    eta = status['eta'] if status else None
+    activity = f"running {job['stage']}" if job['stage'] else "waiting for a worker"
+    st.write(f"Completed: **{job['state']}** · {activity}")
+    if eta is not None:
+        st.caption(f"Estimated time left: {format_timestamp(eta)}")
 
-def process_video(url):
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def jobs_page():
+    """Queue depth, ETAs and stage timings of background jobs"""
+    st.title("🗂️ Jobs")
+    status = queue_status()
+    
+    columns = st.columns(len(status['stages']))
+    for column, (stage, counts) in zip(columns, status['stages'].items()):
+        column.metric(
+            stage.capitalize(), f"{counts['waiting']} waiting",
+            help=f"Typical stage time {counts['typical_seconds']} s"
+        )
+        column.caption(f"{counts['running']} / {counts['limit']} running")
+    
+    if not status['jobs']:
+        st.info("No jobs yet")
+        return
+    
+    user = current_user()
+    rows = [
+        {
+            'submitted': datetime.fromtimestamp(job['created']).strftime('%Y-%m-%d %H:%M:%S'),
+            'video': job['video_id'] or job['url'],
+            'mine': job['user_id'] == user,
+            'priority': job['priority'],
+            'completed': job['state'],
+            'running': job['stage'],
+            'progress': job['progress'],
+            'eta': format_timestamp(job['eta']) if job['eta'] is not None else None,
+            **{f"{stage}_s": job['timings'].get(stage) for stage in status['stages']},
+            'error': job['error']
+        }
+        for job in status['jobs']
+    ]
+    st.dataframe(rows, hide_index=True, width="stretch")
+
+def search_page():
+    """Search all stored transcripts and generated content"""
+    st.title("🔎 Search")
+    query = st.text_input("Search transcripts, summaries and titles:", placeholder="e.g. gradient descent")
+    if not query:
+        return
+    
+    try:
+        started = time.perf_counter()
+        hits = search(query, limit=SEARCH_RESULTS)
+        elapsed = time.perf_counter() - started
+    except Exception as e:
+        st.error(f"Search failed: {str(e)}")
+        return
+    
+    st.caption(f"{len(hits)} results in {elapsed * 1000:.0f} ms")
+    for hit in hits:
+        source = hit['video_id'] or "local file"
+        if hit['link']:
+            moment = format_timestamp(hit['start']) if hit['start'] is not None else "video"
+            source = f"{source} · [▶ {moment}]({hit['link']})"
+        st.markdown(f"**{source}** · {hit['field']} · {hit['created']}")
+        st.markdown(hit['snippet'])
+        st.divider()
+
+def diagnostics_page():
+    """Show per-stage timings, resource use and token counts"""
+    st.title("📈 Diagnostics")
+    
+    records = read_metrics(limit=DIAGNOSTICS_RECORDS)
+    if not records:
+        st.info(f"No metrics recorded yet in {METRICS_LOG}")
+        return
+    
+    st.subheader("Stages")
+    st.caption(f"Aggregated over the last {len(records)} records")
+    st.dataframe(summarize_metrics(records), hide_index=True, width="stretch")
+    
+    st.subheader("Recent records")
+    columns = [
+        'stage', 'status', 'wall_seconds', 'cpu_seconds', 'realtime_factor', 'audio_seconds',
+        'whisper_profile', 'vad_skipped_seconds', 'bytes_downloaded', 'prompt_tokens', 'response_tokens', 'first_item_seconds', 'peak_rss_bytes'
+    ]
+    recent = [
+        {
+            'finished': datetime.fromtimestamp(record['finished']).strftime('%Y-%m-%d %H:%M:%S'),
+            **{column: record.get(column) for column in columns}
+        }
+        for record in records[:100]
+    ]
+    st.dataframe(recent, hide_index=True, width="stretch")
+
+def process_video(url, speculative=False):
     """Process the YouTube video through the complete pipeline"""
     
     # Progress tracking
     progress_bar = st.progress(0)
     status_text = st.empty()
     
+    audio_path = None
+    speculator = None
+    segments = []
+    
+    job_id = None
     try:
-        # Step 1: Extract audio
-        status_text.text("🎵 Extracting audio from YouTube video...")
-        progress_bar.progress(20)
+        video_id = get_video_id(url)
         
-        audio_path = extract_audio_from_url(url)
-        if not audio_path:
-            st.error("Failed to extract audio from the video. Please check the URL.")
+        # Work from an interrupted run of the same URL is picked up where it stopped
+        job, claimed = open_foreground_job(url, video_id)
+        if not claimed:
+            st.warning("This video is already being processed in the background; "
+                       "its progress is shown below and on the Jobs page")
+            st.session_state['job_id'] = job['job_id']
+            job_panel(job['job_id'])
             return
-            
-        st.success("✅ Audio extracted successfully")
+        job_id = job['job_id']
+        if job['state'] != 'queued':
+            st.info(f"↩️ Resuming an earlier run of this video (completed: {job['state']})")
         
-        # Step 2: Transcribe audio
-        status_text.text("🎤 Transcribing audio to text...")
-        progress_bar.progress(40)
+        transcript = job['transcript'] or load_cached_transcript(video_id)
         
-        transcript = transcribe_audio(audio_path)
-        if not transcript:
-            st.error("Failed to transcribe audio")
-            return
+        if transcript:
+            if job['transcript']:
+                segments = load_segments(job_id)
+                st.success("✅ Loaded transcript from the earlier run")
+            else:
+                advance_job(job_id, 'transcribed', transcript=transcript)
+                st.success("✅ Loaded transcript from cache")
+        else:
+            # Step 1: Extract audio
+            status_text.text("🎵 Extracting audio from YouTube video...")
+            progress_bar.progress(20)
+            
+            audio_path = job['audio_path']
+            if not (audio_path and os.path.exists(audio_path)):
+                audio_path = fetch_audio(url, video_id)
+            if not audio_path:
+                fail_job(job_id, "audio extraction failed")
+                st.error("Failed to extract audio from the video. Please check the URL.")
+                return
+            
+            advance_job(job_id, 'downloaded', audio_path=audio_path)
+            st.success("✅ Audio extracted successfully")
+            
+            # Step 2: Transcribe audio
+            status_text.text("🎤 Transcribing audio to text...")
+            progress_bar.progress(40)
+            
+            # Show segments live as they are decoded, keeping only the latest few on screen
+            live_transcript = st.empty()
+            recent_segments = deque(maxlen=LIVE_SEGMENT_LINES)
+            
+            # Generation starts on the partial transcript while decoding continues
+            if speculative:
+                speculator = SpeculativeGenerator()
             
-        st.success("✅ Audio transcribed successfully")
+            def show_segment(segment):
+                segments.append(segment)
+                if speculator:
+                    speculator.on_segment(segment)
+                recent_segments.append(f"[{format_timestamp(segment['start'])}] {segment['text']}")
+                live_transcript.text("\n".join(recent_segments))
+                progress_bar.progress(40 + int(30 * segment['progress']))
+                status_text.text(f"🎤 Transcribing audio to text... {segment['progress']:.0%}")
+            
+            # A resumed job keeps the profile its first segments were decoded with
+            profile = job_profile(job_id) or choose_profile(audio_path)
+            transcript = run_transcription(
+                video_id, audio_path, on_segment=show_segment, profile=profile, job_id=job_id
+            )
+            live_transcript.empty()
+            if not transcript:
+                if speculator:
+                    speculator.cancel()
+                fail_job(job_id, "transcription failed")
+                st.error("Failed to transcribe audio")
+                return
+                
+            st.success("✅ Audio transcribed successfully")
+            st.caption(
+                f"Whisper profile: {profile.name} ({profile.model}, "
+                f"{'greedy' if profile.beam_size == 1 else f'beam {profile.beam_size}'})"
+            )
         
         # Step 3: Generate content using AI
         status_text.text("🤖 Generating summaries, hashtags, and titles...")
         progress_bar.progress(70)
         
-        content = generate_content(transcript)
-        if not content:
-            st.error("Failed to generate content")
-            return
-            
-        st.success("✅ Content generated successfully")
+        if job['content']:
+            content = job['content']
+            st.success("✅ Loaded content from the earlier run")
+            display_results(content, transcript)
+        elif speculator:
+            content = load_cached_content(video_id, transcript, mode=get_speculative_mode())
+            if content:
+                speculator.cancel()
+                st.success("✅ Loaded content from cache")
+            else:
+                status_text.text("🤖 Finishing summaries, hashtags, and titles...")
+                content = speculator.finish(transcript)
+                if not content:
+                    fail_job(job_id, "content generation failed")
+                    st.error("Failed to generate content")
+                    return
+                store_content(video_id, transcript, content, mode=get_speculative_mode())
+            display_results(content, transcript)
+        elif CONTENT_MODE == "combined":
+            # One structured request can't be streamed field by field; this is
+            # the same path (and cache entry) the background queue uses
+            with st.spinner("Generating summary, hashtags and titles..."):
+                content = run_generation(video_id, transcript)
+            if not content:
+                fail_job(job_id, "content generation failed")
+                st.error("Failed to generate content")
+                return
+            display_results(content, transcript)
+        else:
+            content = load_cached_content(video_id, transcript, mode="separate")
+            if content:
+                st.success("✅ Loaded content from cache")
+                display_results(content, transcript)
+            else:
+                # Results fill in as the model streams them
+                content = stream_results(transcript)
+                if not content:
+                    fail_job(job_id, "content generation failed")
+                    st.error("Failed to generate content")
+                    return
+                store_content(video_id, transcript, content, mode="separate")
+        advance_job(job_id, 'generated', content=content)
         
         # Step 4: Save outputs
         status_text.text("💾 Saving outputs...")
         progress_bar.progress(90)
         
-        save_outputs(content, transcript)
+        run = save_outputs(content, transcript, video_id=video_id, metadata={'url': url}, segments=segments)
+        if run:
+            advance_job(job_id, 'saved', run_id=run['run_id'])
+        else:
+            fail_job(job_id, "save: could not write outputs")
         
         progress_bar.progress(100)
         status_text.text("🎉 Processing completed!")
         
-        # Display results
-        display_results(content, transcript)
+        if run:
+            display_downloads(run)
         
-        # Cleanup temporary audio file
-        if os.path.exists(audio_path):
+        # Cleanup temporary audio file (cached audio is kept for later runs)
+        if audio_path and not video_id and os.path.exists(audio_path):
             os.remove(audio_path)
             
     except Exception as e:
+        if job_id:
+            fail_job(job_id, str(e))
         st.error(f"An error occurred: {str(e)}")
         progress_bar.empty()
         status_text.empty()
+    finally:
+        if job_id:
+            # A run stopped by a rerun or closed tab is not left for the scheduler
+            # to pick up silently; it can be retried from the job panel
+            job = get_job(job_id)
+            if job and job['state'] != 'saved' and not job['error']:
+                fail_job(job_id, "interrupted before it finished")
+            release_job(job_id)
+
+def display_hashtags(hashtags):
+    """Show hashtags as tags with a copyable block"""
+    if hashtags:
+        hashtag_text = " ".join([f"#{tag.strip('#')}" for tag in hashtags])
+        st.markdown(f"**{hashtag_text}**")
+        
+        # Copy button
+        st.code(hashtag_text, language="text")
+    else:
+        st.write("No hashtags generated")
+
+def display_titles(titles):
+    """Show numbered title suggestions"""
+    if titles:
+        for i, title in enumerate(titles, 1):
+            st.markdown(f"**{i}.** {title}")
+    else:
+        st.write("No titles generated")
+
+def stream_results(transcript):
+    """
+    Show the result tabs right away and fill them in as tokens arrive
+
+    Hashtags and titles are requested in the background while the summary
+    streams. For transcripts over the token budget they are generated from
+    the finished summary instead, as in generate_content.
+
+    Returns:
+        dict: Generated content (failed fields are omitted)
+    """
+    st.header("📊 Results")
+    tab1, tab2, tab3, tab4 = st.tabs(["📝 Summary", "🏷️ Hashtags", "📰 Titles", "📜 Transcript"])
+    
+    with tab4:
+        st.subheader("Full Transcript")
+        st.text_area("Transcript", transcript, height=300, disabled=True)
+    
+    client = get_gemini_client()
+    content = {}
+    
+    long_transcript = needs_map_reduce(transcript)
+    if not long_transcript:
+        hashtag_stream = prefetch_stream(stream_hashtags(transcript, client))
+        title_stream = prefetch_stream(stream_titles(transcript, client))
+    
+    with tab1:
+        st.subheader("Video Summary")
+        try:
+            content['summary'] = st.write_stream(stream_summary(transcript, client)).strip()
+        except GeminiError as e:
+            st.warning(f"Skipping summary: {type(e).__name__}: {str(e)}")
+    
+    if long_transcript:
+        if 'summary' not in content:
+            return content
+        hashtag_stream = prefetch_stream(stream_hashtags(content['summary'], client))
+        title_stream = prefetch_stream(stream_titles(content['summary'], client))
+    
+    with tab3:
+        st.subheader("Title Suggestions")
+        draft = st.empty()
+        try:
+            # Raw text streams in, then is replaced by the parsed list
+            with draft.container():
+                text = st.write_stream(title_stream)
+            draft.empty()
+            content['titles'] = parse_titles(text)
+            display_titles(content['titles'])
+        except GeminiError as e:
+            st.warning(f"Skipping titles: {type(e).__name__}: {str(e)}")
+    
+    with tab2:
+        st.subheader("SEO Hashtags")
+        try:
+            content['hashtags'] = parse_hashtags("".join(hashtag_stream))
+            display_hashtags(content['hashtags'])
+        except GeminiError as e:
+            st.warning(f"Skipping hashtags: {type(e).__name__}: {str(e)}")
+    
+    return content
 
 def display_results(content, transcript):
     """Display the generated content results"""
@@ -108,63 +572,33 @@ def display_results(content, transcript):
         
     with tab2:
         st.subheader("SEO Hashtags")
-        hashtags = content.get('hashtags', [])
-        if hashtags:
-            # Display hashtags as tags
-            hashtag_text = " ".join([f"#{tag.strip('#')}" for tag in hashtags])
-            st.markdown(f"**{hashtag_text}**")
-            
-            # Copy button
-            st.code(hashtag_text, language="text")
-        else:
-            st.write("No hashtags generated")
+        display_hashtags(content.get('hashtags', []))
             
     with tab3:
         st.subheader("Title Suggestions")
-        titles = content.get('titles', [])
-        if titles:
-            for i, title in enumerate(titles, 1):
-                st.markdown(f"**{i}.** {title}")
-        else:
-            st.write("No titles generated")
+        display_titles(content.get('titles', []))
             
     with tab4:
         st.subheader("Full Transcript")
         st.text_area("Transcript", transcript, height=300, disabled=True)
+
+def display_downloads(run):
+    """Offer the output files of a saved run for download"""
     
     # Download section
     st.header("💾 Download Files")
     col1, col2, col3 = st.columns(3)
     
-    with col1:
-        if os.path.exists("outputs/video_summary.md"):
-            with open("outputs/video_summary.md", "r") as f:
-                st.download_button(
-                    "📝 Download Summary",
-                    f.read(),
-                    "video_summary.md",
-                    "text/markdown"
-                )
-    
-    with col2:
-        if os.path.exists("outputs/hashtags.txt"):
-            with open("outputs/hashtags.txt", "r") as f:
-                st.download_button(
-                    "🏷️ Download Hashtags",
-                    f.read(),
-                    "hashtags.txt",
-                    "text/plain"
-                )
-    
-    with col3:
-        if os.path.exists("outputs/titles.txt"):
-            with open("outputs/titles.txt", "r") as f:
-                st.download_button(
-                    "📰 Download Titles",
-                    f.read(),
-                    "titles.txt",
-                    "text/plain"
-                )
+    files = [
+        (col1, "📝 Download Summary", "video_summary.md", "text/markdown"),
+        (col2, "🏷️ Download Hashtags", "hashtags.txt", "text/plain"),
+        (col3, "📰 Download Titles", "titles.txt", "text/plain")
+    ]
+    for column, label, name, mime in files:
+        path = run_file(run, name)
+        if path:
+            with column, open(path, "r", encoding="utf-8") as f:
+                st.download_button(label, f.read(), name, mime)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,67 @@
+"""
+Time clean_transcript on synthetic transcripts of growing size
+
+Usage:
+    python -m benchmarks.bench_clean_transcript --words 500000
+
+Time per word should stay flat as the transcript grows. The previous
+replace-per-filler implementation is timed alongside for comparison;
+speedup above 1 means clean_transcript is the faster of the two.
+"""
+import argparse
+import random
+import time
+from processing.transcribe import clean_transcript, FILLER_WORDS
+
+VOCABULARY = (
+    "the video shows how we build a small model and then test it on real data "
+    "so you can see what works and what does not in practice today"
+).split()
+
+def make_transcript(words, seed=0):
+    """Build a transcript with roughly one filler every eight words"""
+    rng = random.Random(seed)
+    tokens = []
+    for _ in range(words):
+        if rng.random() < 0.125:
+            tokens.append(rng.choice(FILLER_WORDS) + rng.choice(["", ",", ""]))
+        else:
+            tokens.append(rng.choice(VOCABULARY) + rng.choice(["", "", "", "."]))
+    return " ".join(tokens)
+
+def legacy_clean(transcript):
+    """The original cleaner: one str.replace pass per filler plus a double-space loop"""
+    cleaned = " ".join(transcript.split())
+    for filler in [" um ", " uh ", " ah ", " er ", " like ", " you know ", " I mean ",
+                   " basically ", " actually ", " literally "]:
+        cleaned = cleaned.replace(filler, " ")
+    while "  " in cleaned:
+        cleaned = cleaned.replace("  ", " ")
+    return cleaned.strip().capitalize()
+
+def best_of(function, text, repeat):
+    """Best wall time of several runs"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(text)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--words", type=int, default=500000, help="Largest transcript size")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    sizes = [args.words // 8, args.words // 4, args.words // 2, args.words]
+    print(f"{'words':>9} {'clean (s)':>10} {'ns/word':>8} {'legacy (s)':>11} {'ns/word':>8} {'speedup':>8}")
+    for size in sizes:
+        text = make_transcript(size)
+        current = best_of(clean_transcript, text, args.repeat)
+        legacy = best_of(legacy_clean, text, args.repeat)
+        print(f"{size:>9} {current:>10.3f} {current / size * 1e9:>8.0f} "
+              f"{legacy:>11.3f} {legacy / size * 1e9:>8.0f} {legacy / current:>7.2f}x")
+
+if __name__ == "__main__":
+    main()
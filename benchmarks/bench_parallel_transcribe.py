@@ -0,0 +1,40 @@
+"""
+Compare sequential and chunked parallel transcription on one audio file
+
+Usage:
+    python -m benchmarks.bench_parallel_transcribe audio.mp3 --workers 4 --threads 2
+"""
+import argparse
+import os
+import time
+from faster_whisper import decode_audio
+from processing.transcribe import stream_transcript
+from processing.parallel_transcribe import SAMPLE_RATE, stream_transcript_parallel
+
+def run(label, segments, duration):
+    """Consume a segment stream and report wall time and real-time factor"""
+    start = time.perf_counter()
+    count = sum(1 for _ in segments)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<12} {elapsed:8.1f}s  RTF {elapsed / duration:.3f}  segments {count}")
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("audio_path")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() // 2 or 1)
+    parser.add_argument("--threads", type=int, default=2, help="CPU threads per worker")
+    args = parser.parse_args()
+
+    duration = len(decode_audio(args.audio_path, sampling_rate=SAMPLE_RATE)) / SAMPLE_RATE
+    print(f"Audio: {duration:.0f}s, {args.workers} workers x {args.threads} threads")
+
+    sequential = run("sequential", stream_transcript(args.audio_path, workers=1), duration)
+    parallel = run("parallel", stream_transcript_parallel(
+        args.audio_path, workers=args.workers, cpu_threads=args.threads
+    ), duration)
+
+    print(f"Speedup: {sequential / parallel:.2f}x")
+
+if __name__ == "__main__":
+    main()
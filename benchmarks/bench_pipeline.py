@@ -0,0 +1,195 @@
+"""
+End-to-end pipeline benchmark with offline fakes and a stored baseline
+
+Usage:
+    python -m benchmarks.bench_pipeline
+    python -m benchmarks.bench_pipeline --sizes 1,10 --repeat 9
+    python -m benchmarks.bench_pipeline --save-baseline
+    python -m benchmarks.bench_pipeline --whisper-model tiny
+
+Each stage (extract_audio_from_file, transcribe_audio, clean_transcript,
+generate_content, save_outputs) runs on synthetic 1, 10 and 60 minute
+inputs. Gemini is replaced by a local stub server and Whisper by a fake
+model unless --whisper-model names a real one. Each stage gets one
+untimed warm-up call so caches and first-call setup stay out of the
+numbers. Latency percentiles, throughput and peak Python allocations are
+reported per stage. The fastest run (min), which is the least affected
+by machine noise, is compared against benchmarks/baseline_pipeline.json
+and the run exits non-zero when a stage is slower than the baseline by
+more than the tolerance. Baselines are machine-specific: save one on the machine that
+runs the comparison.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+
+# Settings read at import time by the pipeline modules
+_WORKDIR = tempfile.mkdtemp(prefix="bench-pipeline-")
+os.environ.update({
+    'GEMINI_RPM': "0",
+    'GEMINI_TPM': "0",
+    'METRICS_ENABLED': "0",
+    'TRANSCRIBE_WORKER_ADDRESS': "",
+    'TRANSCRIBE_WORKERS': "1",
+    'OUTPUT_DIR': os.path.join(_WORKDIR, "outputs"),
+    'WORKSPACE_DIR': os.path.join(_WORKDIR, "jobs"),
+})
+
+import streamlit.logger
+from streamlit import config
+from benchmarks.fakes import StubGeminiServer, FakeWhisperModel, make_transcript, write_audio
+from processing import transcribe
+from processing.extract_audio import extract_audio_from_file
+from processing.summarize_and_generate import generate_content
+from utils.file_manager import save_outputs
+from utils.metrics import peak_rss_bytes
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline_pipeline.json")
+
+def percentile(values, fraction):
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def measure(function, repeat):
+    """
+    Time repeated calls after an untimed warm-up, then one more under
+    tracemalloc for peak allocations
+
+    Returns:
+        dict: p50, p95, min and peak_alloc_mb
+    """
+    function()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'p50': percentile(timings, 0.5),
+        'p95': percentile(timings, 0.95),
+        'min': min(timings),
+        'peak_alloc_mb': peak / 1024 ** 2
+    }
+
+def run_size(minutes, repeat):
+    """Benchmark every stage on one input size"""
+    seconds = minutes * 60
+    audio_path = os.path.join(_WORKDIR, f"audio_{minutes}m.wav")
+    if not os.path.exists(audio_path):
+        write_audio(audio_path, seconds)
+
+    samples = extract_audio_from_file(audio_path, as_array=True)
+    transcript = transcribe.transcribe_audio(samples)
+    raw_transcript = make_transcript(seconds)
+    content = generate_content(transcript)
+    words = len(raw_transcript.split())
+
+    stages = [
+        ("extract_audio", lambda: extract_audio_from_file(audio_path, as_array=True), seconds, "audio s"),
+        ("transcribe", lambda: transcribe.transcribe_audio(samples), seconds, "audio s"),
+        ("clean_transcript", lambda: transcribe.clean_transcript(raw_transcript), words, "words"),
+        ("generate_content", lambda: generate_content(transcript), 1, "videos"),
+        ("save_outputs", lambda: save_outputs(content, transcript), 1, "runs"),
+    ]
+
+    results = {}
+    for name, function, units, unit_name in stages:
+        result = measure(function, repeat)
+        result['throughput'] = units / result['p50'] if result['p50'] else float('inf')
+        result['unit'] = unit_name
+        results[f"{name}/{minutes}m"] = result
+    return results
+
+def compare(results, baseline, tolerance, min_delta):
+    """
+    Find stages whose fastest run regressed beyond the tolerance
+
+    Slowdowns smaller than min_delta seconds are ignored so sub-millisecond
+    stages don't fail on timer noise.
+
+    Returns:
+        list: (key, baseline min, current min) for each regression
+    """
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        before = baseline[key]['min']
+        if result['min'] > before * (1 + tolerance) and result['min'] - before > min_delta:
+            regressions.append((key, before, result['min']))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="1,10,60", help="Input lengths in minutes")
+    parser.add_argument("--repeat", type=int, default=7, help="Timed runs per stage after the warm-up")
+    parser.add_argument("--gemini-latency", type=float, default=0.05, help="Stub response delay in seconds")
+    parser.add_argument("--whisper-model", default=None, help="Real model name (e.g. tiny) instead of the fake")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed min slowdown (0.25 = 25%%)")
+    parser.add_argument("--min-delta", type=float, default=0.005, help="Ignore slowdowns below this many seconds")
+    parser.add_argument("--fake-rtf", type=float, default=0.0, help="Seconds the fake model sleeps per audio second")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    args = parser.parse_args()
+
+    config.get_option("logger.level")
+    streamlit.logger.set_log_level("error")
+
+    if args.whisper_model:
+        from faster_whisper import WhisperModel
+        model = WhisperModel(args.whisper_model, device="cpu", compute_type=transcribe.WHISPER_COMPUTE_TYPE)
+    else:
+        model = FakeWhisperModel(realtime_factor=args.fake_rtf)
+    transcribe.load_whisper_model = lambda profile=None: model
+
+    results = {}
+    try:
+        with StubGeminiServer(latency=args.gemini_latency) as server:
+            os.environ['GEMINI_BASE_URL'] = server.base_url
+            for minutes in [int(size) for size in args.sizes.split(",")]:
+                results.update(run_size(minutes, args.repeat))
+    finally:
+        shutil.rmtree(_WORKDIR, ignore_errors=True)
+
+    print(f"{'stage':<22} {'min (s)':>9} {'p50 (s)':>9} {'p95 (s)':>9} {'throughput':>18} {'peak alloc':>11}")
+    for key, result in results.items():
+        throughput = f"{result['throughput']:.1f} {result['unit']}/s"
+        print(f"{key:<22} {result['min']:>9.4f} {result['p50']:>9.4f} {result['p95']:>9.4f} {throughput:>18} "
+              f"{result['peak_alloc_mb']:>9.1f}MB")
+    peak = peak_rss_bytes()
+    if peak:
+        print(f"Peak RSS: {peak / 1024 ** 2:.0f} MB")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"Saved baseline to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print("No baseline to compare against; run with --save-baseline first")
+        return
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance, args.min_delta)
+    for key, before, after in regressions:
+        print(f"REGRESSION {key}: min {before:.4f}s -> {after:.4f}s ({after / before - 1:+.0%})")
+    if regressions:
+        sys.exit(1)
+    print(f"No regressions beyond {args.tolerance:.0%} of baseline")
+
+if __name__ == "__main__":
+    main()
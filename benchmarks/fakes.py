@@ -0,0 +1,221 @@
+"""
+Offline stand-ins for Gemini and Whisper used by the benchmarks
+
+StubGeminiServer answers the generateContent and streamGenerateContent
+REST calls the google-genai client makes, after a fixed latency. It can
+also inject throttling and server errors (429, 503, Retry-After) to
+exercise the client's retry handling, and slow down or fail prompts that
+mention a keyword to exercise concurrent field generation.
+FakeWhisperModel has the WhisperModel.transcribe interface and emits one
+segment per few seconds of audio, optionally sleeping to mimic decoding.
+"""
+import json
+import math
+import time
+import wave
+import random
+import threading
+from collections import namedtuple, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+# Speaking rate used for synthetic transcripts
+WORDS_PER_MINUTE = 150
+
+VOCABULARY = (
+    "the video shows how we build a small model and then test it on real data "
+    "so you can see what works and what does not in practice today um uh like"
+).split()
+
+FakeSegment = namedtuple("FakeSegment", "start end text words")
+FakeInfo = namedtuple("FakeInfo", "duration language language_probability")
+
+def make_words(count, seed=0):
+    """Return count pseudo-random spoken words, fillers included"""
+    rng = random.Random(seed)
+    return [rng.choice(VOCABULARY) for _ in range(count)]
+
+def make_transcript(seconds, seed=0):
+    """Synthetic transcript for seconds of speech at WORDS_PER_MINUTE"""
+    return " ".join(make_words(int(seconds / 60 * WORDS_PER_MINUTE), seed))
+
+def write_audio(path, seconds, seed=0):
+    """
+    Write a 16 kHz mono WAV of tone bursts separated by short silences
+
+    Args:
+        path (str): Output path
+        seconds (float): Duration
+        seed (int): Random seed for burst lengths
+    """
+    rng = np.random.default_rng(seed)
+    samples = np.zeros(int(seconds * SAMPLE_RATE), dtype=np.float32)
+    position = 0
+    while position < len(samples):
+        burst = int(rng.uniform(2, 8) * SAMPLE_RATE)
+        t = np.arange(min(burst, len(samples) - position)) / SAMPLE_RATE
+        samples[position:position + len(t)] = 0.3 * np.sin(2 * math.pi * rng.uniform(150, 300) * t)
+        position += burst + int(rng.uniform(0.3, 1.0) * SAMPLE_RATE)
+
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes((samples * 32767).astype(np.int16).tobytes())
+
+class FakeWhisperModel:
+    """WhisperModel look-alike producing deterministic segments"""
+
+    def __init__(self, segment_seconds=5.0, realtime_factor=0.0):
+        self.segment_seconds = segment_seconds
+        self.realtime_factor = realtime_factor
+
+    def transcribe(self, audio, **kwargs):
+        if isinstance(audio, np.ndarray):
+            duration = len(audio) / SAMPLE_RATE
+        else:
+            with wave.open(audio, 'rb') as f:
+                duration = f.getnframes() / f.getframerate()
+
+        words_per_segment = max(1, int(self.segment_seconds / 60 * WORDS_PER_MINUTE))
+
+        def segments():
+            start, index = 0.0, 0
+            while start < duration:
+                end = min(start + self.segment_seconds, duration)
+                if self.realtime_factor:
+                    time.sleep((end - start) * self.realtime_factor)
+                text = " " + " ".join(make_words(words_per_segment, seed=index))
+                yield FakeSegment(start, end, text, [])
+                start, index = end, index + 1
+
+        return segments(), FakeInfo(duration, "en", 1.0)
+
+class _StubGeminiHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', "application/json")
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        prompt = body['contents'][0]['parts'][0]['text']
+        config = body.get('generationConfig', {})
+        stub = self.server.stub
+        fault = stub.next_fault(prompt)
+        started = time.monotonic()
+        time.sleep(stub.latency + stub.delay_for(prompt))
+        stub.log_call(prompt, started)
+
+        if fault:
+            status, retry_after = fault
+            headers = {'Retry-After': str(retry_after)} if retry_after is not None else None
+            error = {'code': status, 'message': f"Injected {status}", 'status': _FAULT_STATUS.get(status, "UNKNOWN")}
+            self._send_json(status, {'error': error}, headers)
+            return
+
+        if config.get('responseMimeType') == "application/json":
+            text = json.dumps({'summary': "Stub summary.", 'hashtags': ["#stub", "#bench"], 'titles': ["Stub title"]})
+        elif "hashtag" in prompt.lower():
+            text = "#stub\n#bench"
+        elif "title" in prompt.lower():
+            text = "1. Stub title\n2. Another stub title"
+        else:
+            text = "Stub summary of the transcript."
+
+        usage = {'promptTokenCount': len(prompt) // 4, 'candidatesTokenCount': len(text) // 4,
+                 'totalTokenCount': (len(prompt) + len(text)) // 4}
+
+        if "streamGenerateContent" in self.path:
+            self.send_response(200)
+            self.send_header('Content-Type', "text/event-stream")
+            self.end_headers()
+            for word in text.split(" "):
+                chunk = {'candidates': [{'content': {'role': "model", 'parts': [{'text': word + " "}]}}]}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+            final = {'candidates': [{'content': {'role': "model", 'parts': [{'text': ""}]}, 'finishReason': "STOP"}],
+                     'usageMetadata': usage}
+            self.wfile.write(f"data: {json.dumps(final)}\n\n".encode('utf-8'))
+            return
+
+        self._send_json(200, {
+            'candidates': [{'content': {'role': "model", 'parts': [{'text': text}]}, 'finishReason': "STOP"}],
+            'usageMetadata': usage
+        })
+
+# Error status names Gemini returns alongside the HTTP code
+_FAULT_STATUS = {400: "INVALID_ARGUMENT", 429: "RESOURCE_EXHAUSTED", 500: "INTERNAL", 503: "UNAVAILABLE"}
+
+class StubGeminiServer:
+    """
+    Local Gemini REST stub; use as a context manager and read base_url
+
+    Args:
+        latency (float): Seconds to wait before every response
+        faults (list): Errors for the next requests, in order, each an
+            HTTP status or a (status, retry_after) pair; later requests
+            succeed. Add more with inject().
+        delays (dict): Extra seconds for prompts containing a keyword
+        failing (dict): HTTP status always returned for prompts containing a keyword
+
+    Attributes:
+        requests (int): Requests received
+        calls (list): (prompt, started, finished) per answered request,
+            in time.monotonic() seconds
+    """
+
+    def __init__(self, latency=0.05, faults=(), delays=None, failing=None):
+        self.latency = latency
+        self.delays = dict(delays or {})
+        self.failing = dict(failing or {})
+        self.requests = 0
+        self.calls = []
+        self._faults = deque()
+        self._lock = threading.Lock()
+        self.inject(*faults)
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _StubGeminiHandler)
+        self.server.stub = self
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def inject(self, *faults):
+        """Fail the next requests with these statuses or (status, retry_after) pairs"""
+        with self._lock:
+            for fault in faults:
+                self._faults.append(fault if isinstance(fault, tuple) else (fault, None))
+
+    def next_fault(self, prompt):
+        """Count a request and return the fault to answer it with, if any"""
+        with self._lock:
+            self.requests += 1
+            if self._faults:
+                return self._faults.popleft()
+        status = next((status for keyword, status in self.failing.items() if keyword in prompt), None)
+        return (status, None) if status else None
+
+    def delay_for(self, prompt):
+        """Extra latency for a prompt"""
+        return sum(delay for keyword, delay in self.delays.items() if keyword in prompt)
+
+    def log_call(self, prompt, started):
+        """Record when a request was answered"""
+        with self._lock:
+            self.calls.append((prompt, started, time.monotonic()))
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,277 @@
+"""
+Process many YouTube videos headlessly
+
+Usage:
+    python -m processing.batch urls.txt
+    python -m processing.batch "https://www.youtube.com/playlist?list=..." --output-dir batch_outputs
+
+Download, transcription and generation run as separate worker pools
+joined by bounded queues, so network downloads overlap with CPU-bound
+transcription and Gemini calls. Each video gets a run in the run store
+under the output directory and one line in manifest.jsonl.
+"""
+import os
+import json
+import time
+import queue
+import argparse
+import threading
+from datetime import datetime
+import yt_dlp
+import streamlit.logger
+from streamlit import config
+from processing.extract_audio import get_video_id
+from processing.pipeline import load_cached_transcript, fetch_audio, run_transcription, run_generation
+from processing.transcribe import choose_profile
+from utils.file_manager import save_outputs, cleanup_temp_files
+from utils.run_store import get_runs_dir
+from utils.metrics import start_metrics_server
+
+# Marks the end of a stage's input
+STOP = object()
+
+def expand_sources(sources):
+    """
+    Expand URL files, playlists and channels into individual video URLs
+
+    Args:
+        sources (list): Video URLs, playlist/channel URLs or paths to text files with one URL per line
+
+    Returns:
+        list: Video URLs in order, without duplicates
+    """
+    urls = []
+    for source in sources:
+        if os.path.isfile(source):
+            with open(source, 'r', encoding='utf-8') as f:
+                lines = [line.strip() for line in f]
+            urls.extend(line for line in lines if line and not line.startswith('#'))
+        else:
+            urls.append(source)
+
+    videos = []
+    for url in urls:
+        if get_video_id(url) and "list=" not in url:
+            videos.append(url)
+        else:
+            videos.extend(list_playlist(url))
+
+    seen = set()
+    return [url for url in videos if not (url in seen or seen.add(url))]
+
+def list_playlist(url):
+    """
+    List the video URLs of a playlist or channel without downloading them
+
+    Args:
+        url (str): Playlist or channel URL
+
+    Returns:
+        list: Video URLs
+    """
+    ydl_opts = {'extract_flat': 'in_playlist', 'quiet': True, 'no_warnings': True}
+    try:
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            info = ydl.extract_info(url, download=False)
+    except Exception as e:
+        print(f"Error listing {url}: {str(e)}")
+        return []
+
+    entries = info.get('entries') or [info]
+    return [
+        f"https://www.youtube.com/watch?v={entry['id']}"
+        for entry in entries
+        if entry and entry.get('id')
+    ]
+
+def download_stage(job):
+    """Fetch audio unless the transcript is already cached"""
+    job['transcript'] = load_cached_transcript(job['video_id'])
+    if not job['transcript']:
+        job['audio_path'] = fetch_audio(job['url'], job['video_id'])
+        if not job['audio_path']:
+            raise RuntimeError("audio extraction failed")
+
+def transcribe_stage(job):
+    """Transcribe the downloaded audio with a profile suited to the backlog"""
+    if not job['transcript']:
+        profile = choose_profile(job['audio_path'], queue_depth=job['waiting'])
+        job['whisper_profile'] = profile.name
+        job['transcript'] = run_transcription(
+            job['video_id'], job['audio_path'], on_segment=job['segments'].append, profile=profile
+        )
+        if not job['transcript']:
+            raise RuntimeError("transcription failed")
+
+def generate_stage(job):
+    """Generate summary, hashtags and titles"""
+    job['content'] = run_generation(job['video_id'], job['transcript'])
+    if not job['content']:
+        raise RuntimeError("content generation failed")
+
+class BatchRunner:
+    """Staged pipeline of bounded worker pools joined by queues"""
+
+    def __init__(self, output_dir, download_workers=2, transcribe_workers=1,
+                 generate_workers=2, queue_size=4):
+        self.output_dir = output_dir
+        self.manifest_path = os.path.join(output_dir, "manifest.jsonl")
+        self.manifest_lock = threading.Lock()
+        self.stages = [
+            ("download", download_stage, download_workers),
+            ("transcribe", transcribe_stage, transcribe_workers),
+            ("generate", generate_stage, generate_workers),
+        ]
+        # One queue in front of each stage plus one for finished jobs
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in self.stages]
+        self.queues.append(queue.Queue(maxsize=queue_size))
+
+    def run(self, urls):
+        """
+        Process all URLs and wait for the pipeline to drain
+
+        Args:
+            urls (list): Video URLs
+
+        Returns:
+            int: Number of videos that failed
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        self.failures = 0
+        pools = []
+        for index, (name, work, workers) in enumerate(self.stages):
+            threads = [
+                threading.Thread(
+                    target=self._stage_worker,
+                    args=(name, work, self.queues[index], self.queues[index + 1]),
+                    name=f"{name}-{n}",
+                    daemon=True
+                )
+                for n in range(workers)
+            ]
+            for thread in threads:
+                thread.start()
+            pools.append(threads)
+
+        writer = threading.Thread(target=self._writer, args=(self.queues[-1],), name="writer", daemon=True)
+        writer.start()
+
+        for url in urls:
+            job = {
+                'url': url,
+                'video_id': get_video_id(url),
+                'audio_path': None,
+                'transcript': None,
+                'segments': [],
+                'whisper_profile': None,
+                'waiting': 0,
+                'content': None,
+                'error': None,
+                'timings': {}
+            }
+            self.queues[0].put(job)
+
+        # Shut stages down in order so every job drains through the pipeline
+        for index, threads in enumerate(pools):
+            for _ in threads:
+                self.queues[index].put(STOP)
+            for thread in threads:
+                thread.join()
+        self.queues[-1].put(STOP)
+        writer.join()
+
+        return self.failures
+
+    def _stage_worker(self, name, work, inbox, outbox):
+        """Run one stage on jobs from inbox until STOP"""
+        while True:
+            job = inbox.get()
+            if job is STOP:
+                return
+
+            if not job['error']:
+                # Jobs queued behind this one, which the Whisper policy weighs in
+                job['waiting'] = inbox.qsize()
+                started = time.perf_counter()
+                try:
+                    work(job)
+                except Exception as e:
+                    job['error'] = f"{name}: {str(e)}"
+                job['timings'][name] = round(time.perf_counter() - started, 3)
+
+            outbox.put(job)
+
+    def _writer(self, inbox):
+        """Write result directories and manifest lines for finished jobs"""
+        while True:
+            job = inbox.get()
+            if job is STOP:
+                return
+
+            run = None
+            if not job['error']:
+                run = save_outputs(
+                    job['content'], job['transcript'],
+                    video_id=job['video_id'],
+                    metadata={'url': job['url']},
+                    output_dir=self.output_dir,
+                    segments=job['segments']
+                )
+                if not run:
+                    job['error'] = "save: could not write outputs"
+            if job['error']:
+                self.failures += 1
+
+            record = {
+                'url': job['url'],
+                'video_id': job['video_id'],
+                'status': "failed" if job['error'] else "ok",
+                'error': job['error'],
+                'run_dir': os.path.join(get_runs_dir(self.output_dir), run['path']) if run else None,
+                'whisper_profile': job['whisper_profile'],
+                'timings': job['timings'],
+                'finished': datetime.now().isoformat(timespec='seconds')
+            }
+            with self.manifest_lock, open(self.manifest_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+            print(f"[{record['status']}] {job['url']} {job['error'] or ''}".rstrip())
+
+def main():
+    parser = argparse.ArgumentParser(description="Process YouTube videos, playlists and channels headlessly")
+    parser.add_argument("sources", nargs="+", help="Video/playlist/channel URLs or text files with one URL per line")
+    parser.add_argument("--output-dir", default="batch_outputs")
+    parser.add_argument("--download-workers", type=int, default=2)
+    parser.add_argument("--transcribe-workers", type=int, default=1)
+    parser.add_argument("--generate-workers", type=int, default=2)
+    parser.add_argument("--queue-size", type=int, default=4, help="Jobs buffered between stages")
+    parser.add_argument("--metrics-port", type=int, default=None, help="Serve Prometheus metrics on this port")
+    args = parser.parse_args()
+
+    # Streamlit calls made outside a script run only produce context warnings.
+    # Load the config first, otherwise parsing it later resets the log level.
+    config.get_option("logger.level")
+    streamlit.logger.set_log_level("error")
+
+    port = start_metrics_server(args.metrics_port)
+    if port:
+        print(f"Serving metrics on http://127.0.0.1:{port}/metrics")
+
+    cleanup_temp_files()
+    urls = expand_sources(args.sources)
+    print(f"Processing {len(urls)} videos into {args.output_dir}")
+
+    runner = BatchRunner(
+        args.output_dir,
+        download_workers=args.download_workers,
+        transcribe_workers=args.transcribe_workers,
+        generate_workers=args.generate_workers,
+        queue_size=args.queue_size
+    )
+    failures = runner.run(urls)
+    print(f"Done: {len(urls) - failures} succeeded, {failures} failed")
+    raise SystemExit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+import os
+import re
+import math
+from collections import Counter
+
+# Segments are grouped into windows of about this many seconds before comparing
+CHAPTER_WINDOW_SECONDS = float(os.environ.get("CHAPTER_WINDOW_SECONDS", "30"))
+
+# Windows compared on each side of a candidate boundary
+CHAPTER_BLOCK_WINDOWS = int(os.environ.get("CHAPTER_BLOCK_WINDOWS", "4"))
+
+# Shortest chapter (YouTube itself requires at least 10 seconds)
+CHAPTER_MIN_SECONDS = float(os.environ.get("CHAPTER_MIN_SECONDS", "60"))
+
+# Smallest similarity dip treated as a topic change, whatever the cutoff says
+CHAPTER_MIN_DEPTH = float(os.environ.get("CHAPTER_MIN_DEPTH", "0.1"))
+
+MAX_CHAPTERS = int(os.environ.get("MAX_CHAPTERS", "20"))
+
+# Keywords kept per chapter for titling
+CHAPTER_KEYWORDS = 6
+
+WORD_PATTERN = re.compile(r"[a-z0-9']+")
+
+# Words that say nothing about the topic of a passage
+STOPWORDS = frozenset("""
+about above after again against all also and any are aren't because been before being below between both but
+can can't could couldn't did didn't does doesn't doing don't down during each few for from further get gets
+going gonna got had hadn't has hasn't have haven't having her here hers herself him himself his how i'm i've
+into isn't it's its itself just know let's like made make many may more most much must need not now off once
+one only other our ours ourselves out over own really right said same say says see she should shouldn't some
+such than that that's the their theirs them themselves then there there's these they they're thing things
+think this those through too under until very want was wasn't way we'll we're we've well were weren't what
+what's when where which while who whom why will with won't would wouldn't yeah yes you you'll you're you've
+your yours yourself yourselves actually basically okay right so um uh
+""".split())
+
+def _terms(text):
+    """Lowercase content words with plural endings folded"""
+    terms = []
+    for word in WORD_PATTERN.findall(text.lower()):
+        if len(word) < 3 or word in STOPWORDS or word.isdigit():
+            continue
+        if len(word) > 4 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        terms.append(word)
+    return terms
+
+def make_windows(segments, window_seconds=CHAPTER_WINDOW_SECONDS):
+    """
+    Group consecutive segments into fixed-length windows
+
+    Args:
+        segments (list): Segment dicts with start, end and text
+        window_seconds (float): Window length
+
+    Returns:
+        list: (start seconds, term Counter) per window
+    """
+    windows = []
+    for segment in segments:
+        if not windows or segment['start'] - windows[-1][0] >= window_seconds:
+            windows.append((segment['start'], Counter()))
+        windows[-1][1].update(_terms(segment['text']))
+    return windows
+
+def _cosine(left, right):
+    """Cosine similarity of two term Counters"""
+    if not left or not right:
+        return 0.0
+    if len(left) > len(right):
+        left, right = right, left
+    dot = sum(count * right[term] for term, count in left.items())
+    norm = math.sqrt(sum(c * c for c in left.values())) * math.sqrt(sum(c * c for c in right.values()))
+    return dot / norm if norm else 0.0
+
+def gap_scores(windows, block=CHAPTER_BLOCK_WINDOWS):
+    """
+    Lexical similarity across each gap between windows (TextTiling block comparison)
+
+    Args:
+        windows (list): Windows from make_windows
+        block (int): Windows summed on each side of the gap
+
+    Returns:
+        list: Smoothed similarity for the gap before windows[1:]
+    """
+    scores = []
+    for index in range(1, len(windows)):
+        left = Counter()
+        for _, terms in windows[max(0, index - block):index]:
+            left.update(terms)
+        right = Counter()
+        for _, terms in windows[index:index + block]:
+            right.update(terms)
+        scores.append(_cosine(left, right))
+
+    # A three-gap moving average keeps single odd windows from looking like topic shifts
+    return [
+        sum(scores[max(0, index - 1):index + 2]) / len(scores[max(0, index - 1):index + 2])
+        for index in range(len(scores))
+    ]
+
+def depth_scores(scores):
+    """
+    How far similarity dips at each gap relative to the peaks around it
+
+    Args:
+        scores (list): Gap similarities
+
+    Returns:
+        list: Depth per gap (higher means a clearer topic change)
+    """
+    depths = []
+    for index, score in enumerate(scores):
+        left = index
+        while left > 0 and scores[left - 1] >= scores[left]:
+            left -= 1
+        right = index
+        while right < len(scores) - 1 and scores[right + 1] >= scores[right]:
+            right += 1
+        depths.append(scores[left] - score + scores[right] - score)
+    return depths
+
+def find_chapter_spans(segments, max_chapters=MAX_CHAPTERS, min_seconds=CHAPTER_MIN_SECONDS):
+    """
+    Split timestamped segments into topical chapters without calling a model
+
+    Valleys in the similarity curve whose depth clears the TextTiling
+    cutoff (mean minus half a standard deviation) and CHAPTER_MIN_DEPTH
+    become boundaries, deepest first, as long as no chapter gets shorter
+    than min_seconds. The first chapter starts at 0.
+
+    Args:
+        segments (list): Segment dicts with start, end and text
+        max_chapters (int): Upper limit on chapters
+        min_seconds (float): Shortest chapter
+
+    Returns:
+        list: Chapter dicts with start, end, text and keywords
+    """
+    segments = [segment for segment in segments if segment['text'].strip()]
+    if not segments:
+        return []
+
+    duration = segments[-1]['end']
+    windows = make_windows(segments)
+    scores = gap_scores(windows)
+    depths = depth_scores(scores)
+
+    boundaries = []
+    if depths:
+        mean = sum(depths) / len(depths)
+        cutoff = mean - math.sqrt(sum((depth - mean) ** 2 for depth in depths) / len(depths)) / 2
+        cutoff = max(cutoff, CHAPTER_MIN_DEPTH)
+
+        # Only the bottom of a dip is a candidate, not the slopes leading into it
+        valleys = [
+            index for index in range(len(scores))
+            if (index == 0 or scores[index] <= scores[index - 1])
+            and (index == len(scores) - 1 or scores[index] <= scores[index + 1])
+        ]
+        candidates = sorted(valleys, key=lambda index: depths[index], reverse=True)
+        for index in candidates:
+            if len(boundaries) >= max_chapters - 1 or depths[index] <= cutoff:
+                break
+            start = windows[index + 1][0]
+            if start < min_seconds or duration - start < min_seconds:
+                continue
+            if all(abs(start - boundary) >= min_seconds for boundary in boundaries):
+                boundaries.append(start)
+    boundaries.sort()
+
+    starts = [0.0] + boundaries
+    chapters = [
+        {'start': start, 'end': end, 'texts': []}
+        for start, end in zip(starts, starts[1:] + [duration])
+    ]
+    current = 0
+    for segment in segments:
+        while current < len(chapters) - 1 and segment['start'] >= chapters[current + 1]['start']:
+            current += 1
+        chapters[current]['texts'].append(segment['text'].strip())
+    for chapter in chapters:
+        chapter['text'] = " ".join(chapter.pop('texts'))
+
+    # Keywords weighted by how specific they are to one chapter
+    counts = [Counter(_terms(chapter['text'])) for chapter in chapters]
+    document_frequency = Counter(term for terms in counts for term in terms)
+    for chapter, terms in zip(chapters, counts):
+        weights = {
+            term: count * math.log((1 + len(chapters)) / document_frequency[term])
+            for term, count in terms.items()
+        }
+        ranked = sorted(weights, key=lambda term: (-weights[term], -terms[term], term))
+        chapter['keywords'] = ranked[:CHAPTER_KEYWORDS]
+    return chapters
+
+def format_chapter_time(seconds):
+    """Format seconds as m:ss or h:mm:ss, as YouTube chapter lists expect"""
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
+
+def format_chapters(chapters):
+    """
+    Render chapters as lines for a video description
+
+    Args:
+        chapters (list): Chapter dicts with start and title
+
+    Returns:
+        list: Lines like "0:00 - Introduction"
+    """
+    return [f"{format_chapter_time(chapter['start'])} - {chapter['title']}" for chapter in chapters]
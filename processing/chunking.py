@@ -0,0 +1,79 @@
+import re
+
+# Rough average for English text with Gemini's tokenizer
+CHARS_PER_TOKEN = 4
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+def estimate_tokens(text):
+    """
+    Estimate the token count of a piece of text
+
+    Args:
+        text (str): Text to measure
+
+    Returns:
+        int: Approximate number of tokens
+    """
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def _split_long_piece(piece, max_tokens):
+    """Split a single over-budget piece on word boundaries"""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    parts = []
+    current = []
+    size = 0
+    for word in piece.split():
+        if current and size + len(word) + 1 > max_chars:
+            parts.append(" ".join(current))
+            current = []
+            size = 0
+        current.append(word)
+        size += len(word) + 1
+    if current:
+        parts.append(" ".join(current))
+    return parts
+
+def split_transcript(transcript, max_tokens, segments=None):
+    """
+    Split a transcript into chunks that fit a token budget
+
+    Chunks are cut along segment boundaries when segments are given,
+    otherwise along sentence boundaries.
+
+    Args:
+        transcript (str): Transcript text
+        max_tokens (int): Token budget per chunk
+        segments (list): Optional segment dicts with a "text" key
+
+    Returns:
+        list: Transcript chunks in order
+    """
+    if segments:
+        pieces = [segment["text"] for segment in segments]
+    else:
+        pieces = SENTENCE_END.split(transcript)
+
+    chunks = []
+    current = []
+    current_tokens = 0
+    for piece in pieces:
+        piece_tokens = estimate_tokens(piece)
+        if piece_tokens > max_tokens:
+            sub_pieces = _split_long_piece(piece, max_tokens)
+        else:
+            sub_pieces = [piece]
+
+        for sub_piece in sub_pieces:
+            sub_tokens = estimate_tokens(sub_piece)
+            if current and current_tokens + sub_tokens > max_tokens:
+                chunks.append(" ".join(current))
+                current = []
+                current_tokens = 0
+            current.append(sub_piece)
+            current_tokens += sub_tokens
+
+    if current:
+        chunks.append(" ".join(current))
+
+    return chunks
@@ -0,0 +1,291 @@
+import json
+from array import array
+from collections.abc import Sequence
+import numpy as np
+
+# Bumped whenever the saved layout changes
+FORMAT_VERSION = 1
+
+# Stored timestamps are float32; Whisper's own resolution is 20 ms
+TIME_DECIMALS = 3
+
+class CompactTranscript:
+    """
+    Word-level transcript held in flat arrays instead of one dict per word
+
+    Segments and words are columns: float32 start, end and probability
+    arrays, plus int64 offsets into one UTF-8 buffer per text column.
+    segment_words holds, for each segment, the index of its first word
+    (with one trailing entry for the end), so a segment's words are
+    words[segment_words[i]:segment_words[i + 1]].
+    """
+
+    def __init__(self, segment_start, segment_end, segment_offsets, segment_text, segment_words,
+                 word_start, word_end, word_probability, word_offsets, word_text,
+                 language=None, language_probability=None):
+        self.segment_start = segment_start
+        self.segment_end = segment_end
+        self.segment_offsets = segment_offsets
+        self.segment_text = segment_text
+        self.segment_words = segment_words
+        self.word_start = word_start
+        self.word_end = word_end
+        self.word_probability = word_probability
+        self.word_offsets = word_offsets
+        self.word_text = word_text
+        self.language = language
+        self.language_probability = language_probability
+
+    @classmethod
+    def from_segments(cls, segments, language=None, language_probability=None):
+        """
+        Build from faster-whisper segments as they are decoded
+
+        Nothing per-word is kept as a Python object, so peak memory stays
+        close to the size of the final arrays.
+
+        Args:
+            segments (iterable): faster-whisper Segment objects (or dicts in
+                the transcribe_with_timestamps format)
+            language (str): Detected language
+            language_probability (float): Language detection confidence
+
+        Returns:
+            CompactTranscript: Transcript
+        """
+        segment_start, segment_end = array('f'), array('f')
+        segment_offsets, segment_words = array('q', [0]), array('q', [0])
+        word_start, word_end, word_probability = array('f'), array('f'), array('f')
+        word_offsets = array('q', [0])
+        segment_text, word_text = bytearray(), bytearray()
+
+        for segment in segments:
+            if isinstance(segment, dict):
+                start, end, text, words = segment['start'], segment['end'], segment['text'], segment.get('words') or []
+                words = [(word['start'], word['end'], word['word'], word['probability']) for word in words]
+            else:
+                start, end, text = segment.start, segment.end, segment.text
+                words = [(word.start, word.end, word.word, word.probability) for word in segment.words or []]
+
+            segment_start.append(start)
+            segment_end.append(end)
+            segment_text += text.encode('utf-8')
+            segment_offsets.append(len(segment_text))
+            for start, end, word, probability in words:
+                word_start.append(start)
+                word_end.append(end)
+                word_probability.append(probability)
+                word_text += word.encode('utf-8')
+                word_offsets.append(len(word_text))
+            segment_words.append(len(word_start))
+
+        return cls(
+            np.frombuffer(segment_start, dtype=np.float32),
+            np.frombuffer(segment_end, dtype=np.float32),
+            np.frombuffer(segment_offsets, dtype=np.int64),
+            bytes(segment_text),
+            np.frombuffer(segment_words, dtype=np.int64),
+            np.frombuffer(word_start, dtype=np.float32),
+            np.frombuffer(word_end, dtype=np.float32),
+            np.frombuffer(word_probability, dtype=np.float32),
+            np.frombuffer(word_offsets, dtype=np.int64),
+            bytes(word_text),
+            language, language_probability
+        )
+
+    def __len__(self):
+        return len(self.segment_start)
+
+    @property
+    def word_count(self):
+        return len(self.word_start)
+
+    @property
+    def duration(self):
+        return float(self.segment_end[-1]) if len(self) else 0.0
+
+    @property
+    def nbytes(self):
+        """Memory held by the columns and text buffers"""
+        columns = (
+            self.segment_start, self.segment_end, self.segment_offsets, self.segment_words,
+            self.word_start, self.word_end, self.word_probability, self.word_offsets
+        )
+        return sum(column.nbytes for column in columns) + len(self.segment_text) + len(self.word_text)
+
+    def segment_text_at(self, index):
+        """Text of one segment"""
+        return self.segment_text[self.segment_offsets[index]:self.segment_offsets[index + 1]].decode('utf-8')
+
+    def word_at(self, index):
+        """Text of one word"""
+        return self.word_text[self.word_offsets[index]:self.word_offsets[index + 1]].decode('utf-8')
+
+    @property
+    def text(self):
+        """Full transcript text"""
+        return self.segment_text[self.segment_offsets[0]:self.segment_offsets[-1]].decode('utf-8')
+
+    def slice(self, start=None, end=None):
+        """
+        Segments overlapping a time range, with only their words inside it
+
+        The result shares the numeric columns with this transcript where
+        it can; only the text buffers are copied.
+
+        Args:
+            start (float): Range start in seconds (defaults to the beginning)
+            end (float): Range end in seconds (defaults to the end)
+
+        Returns:
+            CompactTranscript: Transcript of the range
+        """
+        start = -np.inf if start is None else start
+        end = np.inf if end is None else end
+
+        # Segments and words are in time order, so both ranges are contiguous
+        first = int(np.searchsorted(self.segment_end, start, side='right'))
+        last = int(np.searchsorted(self.segment_start, end, side='left'))
+        last = max(first, last)
+
+        words = self.segment_words[first:last + 1].copy()
+        word_first, word_last = int(words[0]), int(words[-1])
+        word_first += int(np.searchsorted(self.word_end[word_first:word_last], start, side='right'))
+        word_last = word_first + int(np.searchsorted(self.word_start[word_first:word_last], end, side='left'))
+        np.clip(words, word_first, word_last, out=words)
+
+        segment_offsets = self.segment_offsets[first:last + 1]
+        word_offsets = self.word_offsets[word_first:word_last + 1]
+        return CompactTranscript(
+            self.segment_start[first:last],
+            self.segment_end[first:last],
+            segment_offsets - segment_offsets[0],
+            self.segment_text[segment_offsets[0]:segment_offsets[-1]],
+            words - word_first,
+            self.word_start[word_first:word_last],
+            self.word_end[word_first:word_last],
+            self.word_probability[word_first:word_last],
+            word_offsets - word_offsets[0],
+            self.word_text[word_offsets[0]:word_offsets[-1]],
+            self.language, self.language_probability
+        )
+
+    def save(self, path):
+        """
+        Write the columns to an uncompressed .npz file
+
+        Args:
+            path (str): Output path
+        """
+        with open(path, 'wb') as f:
+            np.savez(
+                f,
+                meta=np.frombuffer(json.dumps({
+                    'version': FORMAT_VERSION,
+                    'language': self.language,
+                    'language_probability': self.language_probability
+                }).encode('utf-8'), dtype=np.uint8),
+                segment_start=self.segment_start,
+                segment_end=self.segment_end,
+                segment_offsets=self.segment_offsets,
+                segment_text=np.frombuffer(self.segment_text, dtype=np.uint8),
+                segment_words=self.segment_words,
+                word_start=self.word_start,
+                word_end=self.word_end,
+                word_probability=self.word_probability,
+                word_offsets=self.word_offsets,
+                word_text=np.frombuffer(self.word_text, dtype=np.uint8)
+            )
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read a transcript written by save
+
+        Args:
+            path (str): Path to the .npz file
+
+        Returns:
+            CompactTranscript: Transcript
+
+        Raises:
+            ValueError: The file was written in an unknown format version
+        """
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(data['meta'].tobytes().decode('utf-8'))
+            if meta.get('version') != FORMAT_VERSION:
+                raise ValueError(f"Unsupported transcript format version {meta.get('version')}")
+            return cls(
+                data['segment_start'], data['segment_end'], data['segment_offsets'],
+                data['segment_text'].tobytes(), data['segment_words'],
+                data['word_start'], data['word_end'], data['word_probability'],
+                data['word_offsets'], data['word_text'].tobytes(),
+                meta.get('language'), meta.get('language_probability')
+            )
+
+    def segment_dict(self, index, with_words=True):
+        """
+        One segment in the transcribe_with_timestamps dict format
+
+        Args:
+            index (int): Segment index
+            with_words (bool): Include the word list
+
+        Returns:
+            dict: Segment with start, end, text and words
+        """
+        segment = {
+            "start": round(float(self.segment_start[index]), TIME_DECIMALS),
+            "end": round(float(self.segment_end[index]), TIME_DECIMALS),
+            "text": self.segment_text_at(index)
+        }
+        if with_words:
+            segment["words"] = [
+                {
+                    "start": round(float(self.word_start[word]), TIME_DECIMALS),
+                    "end": round(float(self.word_end[word]), TIME_DECIMALS),
+                    "word": self.word_at(word),
+                    "probability": round(float(self.word_probability[word]), 4)
+                }
+                for word in range(self.segment_words[index], self.segment_words[index + 1])
+            ]
+        return segment
+
+    def to_dict(self, lazy=False, with_words=True):
+        """
+        Convert to the dict format transcribe_with_timestamps used to return
+
+        Args:
+            lazy (bool): Build segment dicts only when they are accessed
+                (the segments value is then a read-only sequence, not a
+                JSON-serializable list)
+            with_words (bool): Include word lists in segments
+
+        Returns:
+            dict: segments, language and language_probability
+        """
+        segments = SegmentList(self, with_words)
+        return {
+            "segments": segments if lazy else list(segments),
+            "language": self.language,
+            "language_probability": self.language_probability
+        }
+
+class SegmentList(Sequence):
+    """Read-only list of segment dicts materialized on access"""
+
+    def __init__(self, transcript, with_words=True):
+        self.transcript = transcript
+        self.with_words = with_words
+
+    def __len__(self):
+        return len(self.transcript)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("segment index out of range")
+        return self.transcript.segment_dict(index, self.with_words)
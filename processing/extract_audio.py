@@ -1,9 +1,40 @@
 import os
-import tempfile
+import re
+import subprocess
+import numpy as np
 from pytube import YouTube
 import yt_dlp
 import streamlit as st
+from utils.workspace import workspace_key, get_workspace, partial_path, commit_file, find_output
+from utils.metrics import timed, add_metrics
 
+# Whisper works on 16 kHz mono audio
+SAMPLE_RATE = 16000
+
+# Smallest audio-only stream that is still good enough for speech, falling
+# back to any audio-only stream. There is deliberately no fallback to a full
+# video stream: a video without audio-only formats fails with a clear error.
+AUDIO_FORMAT = "ba[abr>=32]/ba"
+AUDIO_FORMAT_SORT = ["+abr", "+size"]
+
+VIDEO_ID_PATTERN = re.compile(
+    r"(?:youtube\.com/(?:watch\?(?:.*&)?v=|shorts/|embed/|live/)|youtu\.be/)([A-Za-z0-9_-]{11})"
+)
+
+def get_video_id(url):
+    """
+    Extract the YouTube video ID from a URL
+    
+    Args:
+        url (str): YouTube video URL
+        
+    Returns:
+        str: 11 character video ID or None if not found
+    """
+    match = VIDEO_ID_PATTERN.search(url or "")
+    return match.group(1) if match else None
+
+@timed("extract_audio")
 def extract_audio_from_url(url):
     """
     Extract audio from YouTube URL using yt-dlp only
@@ -27,19 +58,21 @@ def extract_audio_with_ytdlp(url):
         str: Path to extracted audio file or None if failed
     """
     try:
-        # Create temporary directory
-        temp_dir = tempfile.gettempdir()
+        # Each video gets its own workspace with a known output name
+        workspace = get_workspace(workspace_key(get_video_id(url), url))
+        audio_path = find_output(workspace, "audio")
+        if audio_path:
+            return audio_path
         
-        # Generate unique filename
-        filename = f"audio_ytdlp_{abs(hash(url)) % 10000}"
-        output_path = os.path.join(temp_dir, f"{filename}.%(ext)s")
+        # Download under a per-job name, renamed into place when complete
+        output_path = partial_path(workspace, "download") + ".%(ext)s"
         
-        # Configure yt-dlp options
+        # Configure yt-dlp options. The compressed audio stream is kept as
+        # downloaded; Whisper decodes and resamples it once when transcribing.
         ydl_opts = {
-            'format': 'bestaudio/best',
+            'format': AUDIO_FORMAT,
+            'format_sort': AUDIO_FORMAT_SORT,
             'outtmpl': output_path,
-            'extractaudio': True,
-            'audioformat': 'mp3',
             'embed_subs': False,
             'writesubtitles': False,
             'writeautomaticsub': False,
@@ -49,45 +82,78 @@ def extract_audio_with_ytdlp(url):
         
         # Download audio
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            ydl.download([url])
-        
-        # Find the downloaded file
-        for file in os.listdir(temp_dir):
-            if file.startswith(f"audio_ytdlp_{abs(hash(url)) % 10000}"):
-                return os.path.join(temp_dir, file)
-        
+            info = ydl.extract_info(url, download=True)
+        
+        downloaded = info['requested_downloads'][0]['filepath']
+        add_metrics(bytes_downloaded=os.path.getsize(downloaded), audio_seconds=info.get('duration'))
+        extension = os.path.splitext(downloaded)[1]
+        return commit_file(downloaded, os.path.join(workspace, f"audio{extension}"))
+        
+    except yt_dlp.utils.DownloadError as e:
+        if "Requested format is not available" in str(e):
+            st.error("This video has no audio-only stream to download")
+        else:
+            st.error(f"Error extracting audio with yt-dlp: {str(e)}")
         return None
-        
     except Exception as e:
         st.error(f"Error extracting audio with yt-dlp: {str(e)}")
         return None
 
-def extract_audio_from_file(file_path):
+def load_audio_array(file_path):
+    """
+    Decode any audio or video file to 16 kHz mono samples
+    
+    FFmpeg output is piped straight into memory so no intermediate file
+    is written. Falls back to PyAV (bundled with faster-whisper) when
+    FFmpeg is not installed.
+    
+    Args:
+        file_path (str): Path to audio or video file
+        
+    Returns:
+        numpy.ndarray: float32 samples in [-1, 1]
+    """
+    try:
+        result = subprocess.run([
+            'ffmpeg', '-nostdin', '-i', file_path,
+            '-vn', '-f', 's16le', '-acodec', 'pcm_s16le',
+            '-ar', str(SAMPLE_RATE), '-ac', '1', '-'
+        ], check=True, capture_output=True)
+        return np.frombuffer(result.stdout, np.int16).astype(np.float32) / 32768.0
+    except FileNotFoundError:
+        from faster_whisper import decode_audio
+        return decode_audio(file_path, sampling_rate=SAMPLE_RATE)
+
+def extract_audio_from_file(file_path, as_array=False):
     """
     Extract audio from local video file using FFmpeg
     
     Args:
         file_path (str): Path to video file
+        as_array (bool): Return samples in memory instead of writing a WAV file
         
     Returns:
-        str: Path to extracted audio file or None if failed
+        str or numpy.ndarray: Path to extracted 16 kHz mono audio file
+            (or the samples when as_array is set), None if failed
     """
     try:
-        import subprocess
+        if as_array:
+            return load_audio_array(file_path)
         
-        # Save audio to temporary file
-        temp_dir = tempfile.gettempdir()
-        audio_path = os.path.join(temp_dir, "extracted_audio.wav")
+        # Save audio to the file's workspace, renamed into place when complete
+        workspace = get_workspace(workspace_key(source=os.path.abspath(file_path)))
+        audio_path = os.path.join(workspace, "audio.wav")
+        partial = partial_path(workspace, "audio") + ".wav"
         
         # Use FFmpeg to extract audio (if available)
         try:
             subprocess.run([
-                'ffmpeg', '-i', file_path, 
-                '-vn', '-acodec', 'pcm_s16le', 
-                '-ar', '44100', '-ac', '2', 
-                audio_path, '-y'
+                'ffmpeg', '-nostdin', '-i', file_path,
+                '-vn', '-acodec', 'pcm_s16le',
+                '-ar', str(SAMPLE_RATE), '-ac', '1',
+                partial, '-y'
             ], check=True, capture_output=True)
-            return audio_path
+            return commit_file(partial, audio_path)
         except (subprocess.CalledProcessError, FileNotFoundError):
             st.error("FFmpeg not available. Cannot extract audio from local video files.")
             st.info("For local video files, please use the YouTube URL option instead.")
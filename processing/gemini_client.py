@@ -0,0 +1,289 @@
+import os
+import time
+import random
+import threading
+import httpx
+from google import genai
+from google.genai import types, errors
+from processing.chunking import estimate_tokens
+from utils.metrics import add_metrics
+
+GEMINI_MODEL = "gemini-2.5-flash"
+
+# Seconds each Gemini call may take before its result is dropped
+GENERATION_TIMEOUT = float(os.environ.get("GEMINI_TIMEOUT", "120"))
+
+# Client-side rate limits (0 disables a limit)
+GEMINI_RPM = float(os.environ.get("GEMINI_RPM", "60"))
+GEMINI_TPM = float(os.environ.get("GEMINI_TPM", "1000000"))
+
+# Attempts per request, including the first
+GEMINI_MAX_ATTEMPTS = int(os.environ.get("GEMINI_MAX_ATTEMPTS", "5"))
+
+# Exponential backoff with full jitter, in seconds
+BACKOFF_BASE = float(os.environ.get("GEMINI_BACKOFF_BASE", "1"))
+BACKOFF_MAX = float(os.environ.get("GEMINI_BACKOFF_MAX", "30"))
+
+# Retries may add at most this fraction of traffic, beyond a small reserve
+RETRY_BUDGET_RATIO = float(os.environ.get("GEMINI_RETRY_BUDGET_RATIO", "0.2"))
+RETRY_BUDGET_RESERVE = 10
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+class GeminiError(Exception):
+    """Base class for failed Gemini requests"""
+
+class GeminiRateLimitError(GeminiError):
+    """Gemini kept throttling the request (HTTP 429) after all retries"""
+
+class GeminiUnavailableError(GeminiError):
+    """Gemini kept failing with server errors or timeouts after all retries"""
+
+class GeminiRequestError(GeminiError):
+    """Gemini rejected the request; retrying will not help"""
+
+class GeminiEmptyResponseError(GeminiError):
+    """Gemini answered without any text"""
+
+class GeminiDeadlineError(GeminiError):
+    """The caller's deadline passed before Gemini answered"""
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at rate per second"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount=1):
+        """Block until amount tokens are available, then take them"""
+        # Requests larger than the bucket only wait for a full bucket
+        amount = min(amount, self.capacity)
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def consume(self, amount):
+        """Take tokens without waiting; the balance may go negative"""
+        with self.lock:
+            self._refill()
+            self.tokens -= amount
+
+class RetryBudget:
+    """Caps retries to a fraction of requests so outages don't multiply traffic"""
+
+    def __init__(self, ratio, reserve):
+        self.ratio = ratio
+        self.reserve = reserve
+        self.balance = reserve
+        self.lock = threading.Lock()
+
+    def deposit(self):
+        """Credit the budget for one request"""
+        with self.lock:
+            self.balance = min(self.reserve + 100, self.balance + self.ratio)
+
+    def withdraw(self):
+        """Take one retry from the budget; False when it is exhausted"""
+        with self.lock:
+            if self.balance < 1:
+                return False
+            self.balance -= 1
+            return True
+
+_client = None
+_client_lock = threading.Lock()
+
+_request_bucket = TokenBucket(GEMINI_RPM / 60, max(GEMINI_RPM / 6, 1)) if GEMINI_RPM else None
+_token_bucket = TokenBucket(GEMINI_TPM / 60, GEMINI_TPM / 6) if GEMINI_TPM else None
+_retry_budget = RetryBudget(RETRY_BUDGET_RATIO, RETRY_BUDGET_RESERVE)
+
+# Initialize Gemini client
+def get_gemini_client():
+    """
+    Return the shared Gemini client, creating it on first use
+
+    Set GEMINI_BASE_URL to point the client at another endpoint
+    (for example a local fake Gemini server).
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            api_key = os.environ.get("GEMINI_API_KEY", "default_key")
+            http_options = types.HttpOptions(
+                base_url=os.environ.get("GEMINI_BASE_URL") or None,
+                timeout=int(GENERATION_TIMEOUT * 1000)
+            )
+            _client = genai.Client(api_key=api_key, http_options=http_options)
+        return _client
+
+def _classify(error):
+    """Map a client exception to a typed error and whether it is worth retrying"""
+    if isinstance(error, errors.APIError):
+        if error.code == 429:
+            return GeminiRateLimitError(str(error)), True
+        if error.code in RETRYABLE_STATUS_CODES:
+            return GeminiUnavailableError(str(error)), True
+        return GeminiRequestError(str(error)), False
+    if isinstance(error, (httpx.TimeoutException, httpx.TransportError)):
+        return GeminiUnavailableError(str(error)), True
+    return GeminiRequestError(str(error)), False
+
+def _backoff(attempt, error):
+    """Full-jitter exponential backoff for a retry attempt (1-based), honouring Retry-After"""
+    delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempt - 1)))
+    response = getattr(error, 'response', None)
+    retry_after = response.headers.get('retry-after') if isinstance(response, httpx.Response) else None
+    try:
+        return max(delay, min(float(retry_after), BACKOFF_MAX)) if retry_after else delay
+    except ValueError:
+        return delay
+
+def _record_usage(usage, attempts):
+    """Add token counts and retries to the current metrics stage"""
+    add_metrics(
+        gemini_calls=1,
+        retries=attempts - 1,
+        prompt_tokens=usage.prompt_token_count if usage else None,
+        response_tokens=usage.candidates_token_count if usage else None
+    )
+
+def _with_deadline(config, deadline):
+    """Config whose HTTP timeout ends at the deadline"""
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise GeminiDeadlineError("Deadline passed before the request was sent")
+    http_options = types.HttpOptions(timeout=max(int(remaining * 1000), 1))
+    if config is None:
+        return types.GenerateContentConfig(http_options=http_options)
+    return config.model_copy(update={'http_options': http_options})
+
+def call_gemini(contents, config=None, client=None, model=GEMINI_MODEL, deadline=None):
+    """
+    Send one generate_content request with rate limiting and retries
+
+    With a deadline, each attempt's HTTP timeout ends at the deadline and
+    no retry is started that could not finish before it, so callers that
+    stop waiting also stop the request from using the retry budget.
+
+    Args:
+        contents (str): Prompt
+        config (types.GenerateContentConfig): Optional generation config
+        client (genai.Client): Optional client (defaults to the shared client)
+        model (str): Model name
+        deadline (float): Optional time.monotonic() value to give up at
+
+    Returns:
+        GenerateContentResponse: Response with non-empty text
+
+    Raises:
+        GeminiRateLimitError: Still throttled after the last retry
+        GeminiUnavailableError: Server errors or timeouts after the last retry
+        GeminiRequestError: Request rejected (not retried)
+        GeminiEmptyResponseError: Response contained no text
+        GeminiDeadlineError: The deadline passed before an attempt could start
+    """
+    client = client or get_gemini_client()
+    prompt_tokens = estimate_tokens(contents)
+    _retry_budget.deposit()
+
+    attempt = 0
+    while True:
+        attempt += 1
+        if _request_bucket:
+            _request_bucket.acquire()
+        if _token_bucket:
+            _token_bucket.acquire(prompt_tokens)
+
+        try:
+            request_config = _with_deadline(config, deadline) if deadline else config
+            response = client.models.generate_content(model=model, contents=contents, config=request_config)
+        except GeminiDeadlineError:
+            raise
+        except Exception as e:
+            error, retryable = _classify(e)
+            delay = _backoff(attempt, e)
+            if deadline and time.monotonic() + delay >= deadline:
+                retryable = False
+            if not retryable or attempt >= GEMINI_MAX_ATTEMPTS or not _retry_budget.withdraw():
+                raise error from e
+            time.sleep(delay)
+            continue
+
+        # Charge the bucket for tokens beyond the estimate, including the reply
+        usage = getattr(response, 'usage_metadata', None)
+        if _token_bucket and usage and usage.total_token_count:
+            _token_bucket.consume(max(usage.total_token_count - prompt_tokens, 0))
+        _record_usage(usage, attempt)
+
+        if not response.text:
+            raise GeminiEmptyResponseError("Gemini returned an empty response")
+        return response
+
+def stream_gemini(contents, config=None, client=None, model=GEMINI_MODEL):
+    """
+    Stream one generate_content request, yielding text as it arrives
+
+    Rate limiting matches call_gemini. Failures before the first chunk
+    are retried; once text has been yielded a failure is raised, since
+    the caller has already shown part of the answer.
+
+    Args:
+        contents (str): Prompt
+        config (types.GenerateContentConfig): Optional generation config
+        client (genai.Client): Optional client (defaults to the shared client)
+        model (str): Model name
+
+    Yields:
+        str: Text chunks in order
+
+    Raises:
+        GeminiError: Same cases as call_gemini
+    """
+    client = client or get_gemini_client()
+    prompt_tokens = estimate_tokens(contents)
+    _retry_budget.deposit()
+
+    attempt = 0
+    received = False
+    while True:
+        attempt += 1
+        if _request_bucket:
+            _request_bucket.acquire()
+        if _token_bucket:
+            _token_bucket.acquire(prompt_tokens)
+
+        usage = None
+        try:
+            for chunk in client.models.generate_content_stream(model=model, contents=contents, config=config):
+                usage = getattr(chunk, 'usage_metadata', None) or usage
+                if chunk.text:
+                    received = True
+                    yield chunk.text
+        except Exception as e:
+            error, retryable = _classify(e)
+            if received or not retryable or attempt >= GEMINI_MAX_ATTEMPTS or not _retry_budget.withdraw():
+                raise error from e
+            time.sleep(_backoff(attempt, e))
+            continue
+
+        if _token_bucket and usage and usage.total_token_count:
+            _token_bucket.consume(max(usage.total_token_count - prompt_tokens, 0))
+        _record_usage(usage, attempt)
+
+        if not received:
+            raise GeminiEmptyResponseError("Gemini returned an empty response")
+        return
@@ -0,0 +1,279 @@
+"""
+Background scheduler for queued video jobs
+
+Usage:
+    python -m processing.job_queue
+    python -m processing.job_queue --status
+
+Jobs submitted from the app are stored in the job store (utils/jobs.py)
+and picked up here stage by stage: download, transcribe, generate and
+save each have their own worker limit, so a burst of downloads cannot
+take the CPU from transcription. Within a stage, higher priority goes
+first, then users with fewer running jobs. The app starts a scheduler
+in its own process unless JOB_QUEUE_IN_APP=0, in which case this
+command runs it separately.
+"""
+import os
+import math
+import time
+import argparse
+import threading
+from statistics import median
+from processing.pipeline import load_cached_transcript, fetch_audio, run_transcription, run_generation
+from processing.transcribe import choose_profile
+from utils.file_manager import save_outputs
+from utils.jobs import (
+    JOB_STATES, advance_job, fail_job, claim_next_job, release_job, release_stale_claims,
+    list_jobs, load_segments
+)
+
+# Start a scheduler inside the Streamlit process
+JOB_QUEUE_IN_APP = os.environ.get("JOB_QUEUE_IN_APP", "1") == "1"
+
+# Concurrent jobs per stage
+STAGE_LIMITS = {
+    'download': int(os.environ.get("JOB_DOWNLOAD_WORKERS", "2")),
+    'transcribe': int(os.environ.get("JOB_TRANSCRIBE_WORKERS", "1")),
+    'generate': int(os.environ.get("JOB_GENERATE_WORKERS", "2")),
+    'save': int(os.environ.get("JOB_SAVE_WORKERS", "1")),
+}
+
+# State each stage picks jobs up from
+STAGE_INPUTS = {
+    'download': 'queued',
+    'transcribe': 'downloaded',
+    'generate': 'transcribed',
+    'save': 'generated',
+}
+
+# Seconds an idle worker waits before looking for work again
+POLL_SECONDS = float(os.environ.get("JOB_POLL_SECONDS", "1.0"))
+
+# Stage durations assumed for ETAs until finished jobs have been timed
+DEFAULT_STAGE_SECONDS = {'download': 30.0, 'transcribe': 180.0, 'generate': 30.0, 'save': 1.0}
+
+# Finished jobs whose timings feed the ETA estimates
+ETA_HISTORY = 50
+
+def download_stage(job):
+    """Fetch audio, or skip straight to the transcript when it is cached"""
+    transcript = load_cached_transcript(job['video_id'])
+    if transcript:
+        advance_job(job['job_id'], 'transcribed', transcript=transcript)
+        return
+
+    audio_path = job['audio_path'] if job['audio_path'] and os.path.exists(job['audio_path']) else None
+    audio_path = audio_path or fetch_audio(job['url'], job['video_id'])
+    if not audio_path:
+        raise RuntimeError("audio extraction failed")
+    advance_job(job['job_id'], 'downloaded', audio_path=audio_path)
+
+def transcribe_stage(job):
+    """Transcribe with checkpoints and a Whisper profile suited to the backlog"""
+    waiting = sum(1 for other in list_jobs(states=('downloaded',)) if not other['claimed_by'] and not other['foreground'])
+    profile = choose_profile(job['audio_path'], queue_depth=waiting)
+    transcript = run_transcription(job['video_id'], job['audio_path'], profile=profile, job_id=job['job_id'])
+    if not transcript:
+        raise RuntimeError("transcription failed")
+
+def generate_stage(job):
+    """Generate summary, hashtags and titles"""
+    content = run_generation(job['video_id'], job['transcript'])
+    if not content:
+        raise RuntimeError("content generation failed")
+    advance_job(job['job_id'], 'generated', content=content)
+
+def save_stage(job):
+    """Write the run to the run store and search index"""
+    run = save_outputs(
+        job['content'], job['transcript'],
+        video_id=job['video_id'],
+        metadata={'url': job['url']},
+        segments=load_segments(job['job_id'])
+    )
+    if not run:
+        raise RuntimeError("save: could not write outputs")
+    advance_job(job['job_id'], 'saved', run_id=run['run_id'])
+
+STAGE_FUNCTIONS = {
+    'download': download_stage,
+    'transcribe': transcribe_stage,
+    'generate': generate_stage,
+    'save': save_stage,
+}
+
+class Scheduler:
+    """Worker threads per stage that claim jobs from the job store"""
+
+    def __init__(self, limits=None):
+        self.limits = {**STAGE_LIMITS, **(limits or {})}
+        self.stopping = threading.Event()
+        self.threads = []
+
+    def start(self):
+        """Free claims left by crashed processes and start the workers"""
+        release_stale_claims()
+        for stage, limit in self.limits.items():
+            for index in range(limit):
+                thread = threading.Thread(
+                    target=self._work, args=(stage,), name=f"job-{stage}-{index}", daemon=True
+                )
+                thread.start()
+                self.threads.append(thread)
+
+    def stop(self, timeout=None):
+        """Stop taking new jobs and wait for running stages to finish"""
+        self.stopping.set()
+        for thread in self.threads:
+            thread.join(timeout)
+
+    def _work(self, stage):
+        """Run one stage on claimed jobs until stopped"""
+        while not self.stopping.is_set():
+            job = claim_next_job(STAGE_INPUTS[stage], stage)
+            if not job:
+                self.stopping.wait(POLL_SECONDS)
+                continue
+
+            started = time.perf_counter()
+            try:
+                STAGE_FUNCTIONS[stage](job)
+            except Exception as e:
+                fail_job(job['job_id'], f"{stage}: {str(e)}")
+            finally:
+                release_job(job['job_id'], time.perf_counter() - started)
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def start_scheduler():
+    """
+    Start the in-process scheduler once per process
+
+    Returns:
+        Scheduler: Running scheduler or None if JOB_QUEUE_IN_APP is off
+    """
+    global _scheduler
+    if not JOB_QUEUE_IN_APP:
+        return None
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = Scheduler()
+            _scheduler.start()
+        return _scheduler
+
+def stage_durations(jobs):
+    """
+    Typical seconds per stage from finished jobs
+
+    Args:
+        jobs (list): Jobs from list_jobs
+
+    Returns:
+        dict: Stage -> median seconds (defaults where nothing was timed)
+    """
+    samples = {}
+    for job in jobs:
+        if job['state'] == 'saved':
+            for stage, seconds in job['timings'].items():
+                samples.setdefault(stage, []).append(seconds)
+    durations = dict(DEFAULT_STAGE_SECONDS)
+    for stage, values in samples.items():
+        durations[stage] = median(values[:ETA_HISTORY])
+    return durations
+
+def queue_status(limit=200):
+    """
+    Queue depth, running jobs and ETAs for the jobs dashboard
+
+    The ETA of a waiting job counts the jobs ahead of it in its next
+    stage, spread over that stage's workers, plus the typical time of
+    each stage it still has to pass. A running transcription uses its
+    progress instead of the typical time.
+
+    Args:
+        limit (int): Jobs to include
+
+    Returns:
+        dict: stages (per-stage waiting, running, limit and typical
+            seconds) and jobs (newest first, each with an eta in seconds)
+    """
+    jobs = list_jobs(limit)
+    durations = stage_durations(jobs)
+    now = time.time()
+
+    stages = {}
+    waiting_by_stage = {}
+    for stage, state in STAGE_INPUTS.items():
+        waiting = [job for job in jobs if job['state'] == state and not job['claimed_by'] and not job['error']
+                   and not job['foreground']]
+        waiting.sort(key=lambda job: (-job['priority'], job['created']))
+        waiting_by_stage[stage] = [job['job_id'] for job in waiting]
+        stages[stage] = {
+            'waiting': len(waiting),
+            'running': sum(1 for job in jobs if job['stage'] == stage),
+            'limit': STAGE_LIMITS[stage],
+            'typical_seconds': round(durations[stage], 1)
+        }
+
+    stage_names = list(STAGE_INPUTS)
+    for job in jobs:
+        job['eta'] = None
+        if job['state'] == 'saved' or (job['error'] and not job['claimed_by']):
+            continue
+
+        # Stages still to run, starting with the one after the job's state
+        remaining = stage_names[JOB_STATES.index(job['state']):]
+        eta = 0.0
+        for position, stage in enumerate(remaining):
+            typical = durations[stage]
+            if position == 0 and job['stage'] == stage:
+                elapsed = now - (job['stage_started'] or now)
+                if job['progress']:
+                    eta += elapsed / job['progress'] - elapsed
+                else:
+                    eta += max(typical - elapsed, 0.0)
+            elif position == 0:
+                ahead = waiting_by_stage[stage].index(job['job_id']) if job['job_id'] in waiting_by_stage[stage] else 0
+                eta += math.floor(ahead / max(STAGE_LIMITS[stage], 1)) * typical + typical
+            else:
+                eta += typical
+        job['eta'] = round(eta)
+
+    return {'stages': stages, 'jobs': jobs}
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the background job scheduler")
+    parser.add_argument("--status", action="store_true", help="Print the queue and exit")
+    args = parser.parse_args()
+
+    if args.status:
+        status = queue_status()
+        for stage, counts in status['stages'].items():
+            print(f"{stage:<11} waiting {counts['waiting']:>3}  running {counts['running']}/{counts['limit']}"
+                  f"  typical {counts['typical_seconds']}s")
+        for job in status['jobs']:
+            if job['state'] != 'saved':
+                eta = f"eta {job['eta']}s" if job['eta'] is not None else job['error'] or ""
+                print(f"{job['job_id']:<14} {job['state']:<11} {job['stage'] or '':<10} {eta}")
+        return
+
+    # Streamlit calls made outside a script run only produce context warnings.
+    # Load the config first, otherwise parsing it later resets the log level.
+    import streamlit.logger
+    from streamlit import config
+    config.get_option("logger.level")
+    streamlit.logger.set_log_level("error")
+
+    scheduler = Scheduler()
+    scheduler.start()
+    print(f"Scheduler running with limits {scheduler.limits}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print("Stopping after running stages finish...")
+        scheduler.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import os
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from faster_whisper import decode_audio
+from faster_whisper.vad import VadOptions, get_speech_timestamps
+from processing.transcribe import clean_transcript, create_whisper_model
+from processing.whisper_policy import default_profile
+from processing.vad import VAD_ENABLED, trim_silence
+from utils.metrics import add_metrics
+
+SAMPLE_RATE = 16000
+
+# Worker processes used for chunked transcription (1 keeps the sequential path)
+TRANSCRIBE_WORKERS = int(os.environ.get("TRANSCRIBE_WORKERS", "1"))
+
+# CTranslate2 threads inside each worker process
+THREADS_PER_WORKER = int(os.environ.get("TRANSCRIBE_THREADS_PER_WORKER", "2"))
+
+# Target chunk length; chunks are cut at the nearest silence
+CHUNK_SECONDS = float(os.environ.get("TRANSCRIBE_CHUNK_SECONDS", "300"))
+
+# Model loaded once per worker process
+_worker_model = None
+
+def _init_worker(profile):
+    """Load the Whisper model in a pool worker"""
+    global _worker_model
+    _worker_model = create_whisper_model(profile)
+
+def _transcribe_chunk(samples, offset, beam_size, language):
+    """Transcribe one chunk and shift its timestamps by offset seconds"""
+    segments, info = _worker_model.transcribe(samples, beam_size=beam_size, language=language)
+    return [
+        (segment.start + offset, segment.end + offset, segment.text)
+        for segment in segments
+    ]
+
+def find_chunk_boundaries(audio, chunk_seconds=CHUNK_SECONDS, cuts=None):
+    """
+    Pick chunk boundaries in the middle of silences detected by VAD
+
+    Args:
+        audio (numpy.ndarray): 16 kHz mono samples
+        chunk_seconds (float): Target chunk length
+        cuts (list): Known safe cut points in samples, e.g. where trim_silence
+            removed a silence (VAD is run when omitted)
+
+    Returns:
+        list: Sample offsets (start, end) for each chunk
+    """
+    if cuts is not None:
+        silences = list(cuts)
+    else:
+        speech = get_speech_timestamps(audio, VadOptions(min_silence_duration_ms=500))
+
+        # Midpoints of the gaps between speech regions are safe places to cut
+        silences = [
+            (previous["end"] + current["start"]) // 2
+            for previous, current in zip(speech, speech[1:])
+        ]
+
+    target = int(chunk_seconds * SAMPLE_RATE)
+    boundaries = [0]
+    for cut in silences + [len(audio)]:
+        # Long stretches without silence (music, crosstalk) are cut hard
+        while cut - boundaries[-1] > 2 * target:
+            boundaries.append(boundaries[-1] + target)
+        if target <= cut - boundaries[-1] and cut < len(audio):
+            boundaries.append(cut)
+
+    # Fold a short tail into the previous chunk
+    if len(boundaries) > 1 and len(audio) - boundaries[-1] < target // 4:
+        boundaries.pop()
+    boundaries.append(len(audio))
+
+    return list(zip(boundaries, boundaries[1:]))
+
+def _normalize(text):
+    """Lowercase text without punctuation for boundary comparisons"""
+    return "".join(char for char in text.lower() if char.isalnum() or char.isspace()).split()
+
+def _dedupe_boundary(previous, segments):
+    """Drop segments at the start of a chunk that repeat the previous chunk's tail"""
+    if not previous:
+        return segments
+
+    last_start, last_end, last_text = previous
+    deduped = []
+    for start, end, text in segments:
+        if not deduped and start < last_end + 1.0 and _normalize(text) == _normalize(last_text):
+            continue
+        deduped.append((max(start, last_end), max(end, last_end), text))
+    return deduped
+
+def stream_transcript_parallel(audio_path, workers=None, cpu_threads=None, profile=None):
+    """
+    Transcribe audio in silence-aligned chunks across a process pool
+
+    Segments are yielded in order as soon as every earlier chunk has
+    finished, with timestamps relative to the whole file.
+
+    Args:
+        audio_path (str or numpy.ndarray): Path to audio file or 16 kHz mono samples
+        workers (int): Worker processes (defaults to TRANSCRIBE_WORKERS)
+        cpu_threads (int): Threads per worker (defaults to THREADS_PER_WORKER)
+        profile (WhisperProfile): Model and decoding settings (defaults to default_profile())
+
+    Yields:
+        dict: Segment with start, end, text and progress (0.0-1.0)
+    """
+    workers = workers or TRANSCRIBE_WORKERS
+    cpu_threads = cpu_threads or THREADS_PER_WORKER
+    profile = (profile or default_profile())._replace(cpu_threads=cpu_threads)
+
+    if isinstance(audio_path, np.ndarray):
+        audio = audio_path
+    else:
+        audio = decode_audio(audio_path, sampling_rate=SAMPLE_RATE)
+    duration = len(audio) / SAMPLE_RATE
+
+    # Trim silence once up front; the cut-out spots double as chunk boundaries
+    offset_map = None
+    if VAD_ENABLED:
+        audio, offset_map = trim_silence(audio)
+        add_metrics(vad_skipped_seconds=round(offset_map.skipped_seconds, 2))
+        chunks = find_chunk_boundaries(audio, cuts=offset_map.joins())
+    else:
+        chunks = find_chunk_boundaries(audio)
+
+    # Spawn keeps CTranslate2 thread pools out of forked children
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(chunks)),
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(profile,)
+    ) as executor:
+        futures = [
+            executor.submit(
+                _transcribe_chunk, audio[start:end], start / SAMPLE_RATE, profile.beam_size, profile.language
+            )
+            for start, end in chunks
+        ]
+
+        previous = None
+        for future in futures:
+            segments = _dedupe_boundary(previous, future.result())
+            for start, end, text in segments:
+                text = clean_transcript(text, capitalize=False)
+                if not text:
+                    continue
+                if offset_map:
+                    start, end = offset_map.to_original(start), offset_map.to_original(end, is_end=True)
+                yield {
+                    "start": start,
+                    "end": end,
+                    "text": text,
+                    "progress": min(end / duration, 1.0) if duration else 0.0
+                }
+            if segments:
+                previous = segments[-1]
@@ -0,0 +1,167 @@
+from processing.extract_audio import extract_audio_from_url
+from processing.transcribe import transcribe_audio, choose_profile
+from processing.whisper_policy import WhisperProfile, cached_profiles
+from processing.summarize_and_generate import generate_content, get_prompt_fingerprint, GEMINI_MODEL
+from utils.jobs import SegmentCheckpointer, advance_job, get_job, load_segments, set_job_profile
+from utils.cache import (
+    get_cached_audio, cache_audio,
+    get_cached_transcript, cache_transcript,
+    get_cached_content, cache_content
+)
+
+CONTENT_KEYS = ('summary', 'hashtags', 'titles')
+
+def _transcript_settings(profile):
+    """Settings a cached transcript depends on"""
+    return profile.model, profile.compute_type, profile.beam_size
+
+def load_cached_transcript(video_id):
+    """
+    Return the most accurate cached transcript for a video, if any
+
+    Transcripts are cached per Whisper profile, so a video transcribed
+    with a fast profile under load is not transcribed again later.
+
+    Args:
+        video_id (str): YouTube video ID (None disables the cache)
+
+    Returns:
+        str: Cached transcript or None
+    """
+    if not video_id:
+        return None
+    for profile in cached_profiles():
+        transcript = get_cached_transcript(video_id, *_transcript_settings(profile))
+        if transcript:
+            return transcript
+    return None
+
+def fetch_audio(url, video_id):
+    """
+    Return cached audio for a video or download and cache it
+
+    Args:
+        url (str): YouTube video URL
+        video_id (str): YouTube video ID (None disables the cache)
+
+    Returns:
+        str: Path to the audio file or None if failed
+    """
+    audio_path = get_cached_audio(video_id) if video_id else None
+    if audio_path:
+        return audio_path
+
+    audio_path = extract_audio_from_url(url)
+    if audio_path and video_id:
+        audio_path = cache_audio(video_id, audio_path)
+    return audio_path
+
+def job_profile(job_id):
+    """
+    Whisper profile a job's transcription started with
+
+    Args:
+        job_id (str): Job ID
+
+    Returns:
+        WhisperProfile: Profile or None if the job has not started transcribing
+    """
+    job = get_job(job_id) if job_id else None
+    if not job or not job['whisper_profile']:
+        return None
+    return WhisperProfile(**job['whisper_profile'])
+
+def run_transcription(video_id, audio_path, on_segment=None, profile=None, job_id=None):
+    """
+    Transcribe audio and cache the transcript
+
+    With a job, segments are checkpointed every CHECKPOINT_SEGMENTS as
+    they are decoded. A job that was interrupted replays its checkpointed
+    segments to on_segment and only transcribes the rest of the audio,
+    with the profile it started with, so the transcript is cached under
+    the settings that actually produced all of it.
+
+    Args:
+        video_id (str): YouTube video ID (None disables the cache)
+        audio_path (str): Path to the audio file
+        on_segment (callable): Optional callback receiving each segment dict
+        profile (WhisperProfile): Whisper settings (chosen by choose_profile when
+            omitted; ignored when the job already started with a profile)
+        job_id (str): Job to checkpoint into and resume from
+
+    Returns:
+        str: Transcript or None if failed
+    """
+    profile = job_profile(job_id) or profile or choose_profile(audio_path)
+    resume = None
+    callback = on_segment
+    if job_id:
+        set_job_profile(job_id, profile._asdict())
+        resume = load_segments(job_id)
+        if on_segment:
+            for segment in resume:
+                on_segment(segment)
+        callback = SegmentCheckpointer(job_id, on_segment, first_seq=len(resume))
+
+    try:
+        transcript = transcribe_audio(audio_path, on_segment=callback, profile=profile, resume=resume)
+    finally:
+        # Keep what was decoded even when the run is stopped part way
+        if job_id:
+            callback.flush()
+
+    if transcript and video_id:
+        cache_transcript(video_id, *_transcript_settings(profile), transcript)
+    if transcript and job_id:
+        advance_job(job_id, 'transcribed', transcript=transcript)
+    return transcript
+
+def load_cached_content(video_id, transcript, mode=None):
+    """
+    Return cached content for a transcript, if any
+
+    Args:
+        video_id (str): YouTube video ID (None disables the cache)
+        transcript (str): Video transcript
+        mode (str): Generation mode the content was made with (defaults to CONTENT_MODE)
+
+    Returns:
+        dict: Cached content or None
+    """
+    if not video_id:
+        return None
+    return get_cached_content(video_id, transcript, get_prompt_fingerprint(mode), GEMINI_MODEL)
+
+def store_content(video_id, transcript, content, mode=None):
+    """
+    Cache generated content when every field is present
+
+    Partial results are not cached so the next run retries them.
+
+    Args:
+        video_id (str): YouTube video ID (None disables the cache)
+        transcript (str): Video transcript
+        content (dict): Generated content
+        mode (str): Generation mode the content was made with (defaults to CONTENT_MODE)
+    """
+    if video_id and all(key in content for key in CONTENT_KEYS):
+        cache_content(video_id, transcript, get_prompt_fingerprint(mode), GEMINI_MODEL, content)
+
+def run_generation(video_id, transcript):
+    """
+    Return cached content for a transcript or generate and cache it
+
+    Args:
+        video_id (str): YouTube video ID (None disables the cache)
+        transcript (str): Video transcript
+
+    Returns:
+        dict: Generated content (empty if generation failed)
+    """
+    content = load_cached_content(video_id, transcript)
+    if content:
+        return content
+
+    content = generate_content(transcript)
+    store_content(video_id, transcript, content)
+    return content
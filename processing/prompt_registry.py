@@ -0,0 +1,226 @@
+import os
+import glob
+import time
+import hashlib
+import threading
+from collections import namedtuple
+import streamlit as st
+from processing.chunking import estimate_tokens
+
+# Seconds between checks of the prompt files for edits (0 checks on every use)
+PROMPT_RELOAD_SECONDS = float(os.environ.get("PROMPT_RELOAD_SECONDS", "2"))
+
+# A/B variants as "name=variant:percent" pairs, e.g. "summary=v2:50,titles=short:20".
+# A variant without a percent gets all traffic. Variant files sit next to
+# the base template: prompts/summary_prompt.v2.txt for variant "v2".
+PROMPT_VARIANTS = os.environ.get("PROMPT_VARIANTS", "")
+
+BASE_VARIANT = "base"
+
+PromptTemplate = namedtuple("PromptTemplate", "name variant path text fingerprint tokens")
+
+def parse_variants(spec):
+    """
+    Parse a PROMPT_VARIANTS setting
+
+    Args:
+        spec (str): Comma-separated "name=variant:percent" pairs
+
+    Returns:
+        dict: Prompt name -> list of (variant, percent)
+
+    Raises:
+        ValueError: A pair is malformed or a prompt's shares exceed 100
+    """
+    variants = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, choice = item.partition("=")
+        variant, _, percent = choice.partition(":")
+        if not name or not variant or variant == BASE_VARIANT:
+            raise ValueError(f"Invalid prompt variant '{item}'")
+        variants.setdefault(name.strip(), []).append((variant.strip(), float(percent) if percent else 100.0))
+    for name, shares in variants.items():
+        if sum(percent for _, percent in shares) > 100:
+            raise ValueError(f"Variant shares for '{name}' add up to more than 100%")
+    return variants
+
+def make_template(name, variant, path, text):
+    """Build a template with its fingerprint and token count"""
+    fingerprint = hashlib.sha256(f"{name}:{variant}\0{text}".encode('utf-8')).hexdigest()
+    return PromptTemplate(name, variant, path, text, fingerprint, estimate_tokens(text))
+
+def _read(path):
+    """Read and validate one template file"""
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read().strip()
+    if not text:
+        raise ValueError("template is empty")
+    return text
+
+class PromptRegistry:
+    """
+    Prompt templates loaded once and reloaded when their files change
+
+    Each prompt has a base template file and optional variant files. The
+    variant a request gets is chosen from a hash of the text it prompts
+    about, so the same input always gets the same variant and cached
+    results stay valid for as long as the variant setup is unchanged.
+    """
+
+    def __init__(self, files, fallbacks=None, variants=None):
+        self.files = dict(files)
+        self.fallbacks = dict(fallbacks or {})
+        if variants is None:
+            try:
+                variants = parse_variants(PROMPT_VARIANTS)
+            except ValueError as e:
+                st.warning(f"Ignoring PROMPT_VARIANTS: {str(e)}")
+                variants = {}
+        self.variants = variants
+        self._templates = {}
+        self._mtimes = {}
+        self._fingerprint = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        self.reload()
+
+    def _variant_paths(self, name):
+        """Base template path and every variant file next to it"""
+        base = self.files[name]
+        stem, extension = os.path.splitext(base)
+        paths = {BASE_VARIANT: base}
+        for path in glob.glob(f"{glob.escape(stem)}.*{extension}"):
+            paths[path[len(stem) + 1:-len(extension)]] = path
+        return paths
+
+    def _mtime(self, path):
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def reload(self, force=True):
+        """
+        Reload templates whose files were added, edited or removed
+
+        A file that fails to load keeps its last good version, or the
+        built-in fallback, so a half-saved edit never takes a prompt down.
+
+        Args:
+            force (bool): Check now even if checked recently
+
+        Returns:
+            bool: Whether any template changed
+        """
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._checked < PROMPT_RELOAD_SECONDS:
+                return False
+            self._checked = now
+
+            changed = False
+            seen = set()
+            for name in self.files:
+                for variant, path in self._variant_paths(name).items():
+                    key = (name, variant)
+                    seen.add(key)
+                    mtime = self._mtime(path)
+                    if key in self._mtimes and self._mtimes[key] == mtime:
+                        continue
+                    self._mtimes[key] = mtime
+                    changed = True
+                    try:
+                        self._templates[key] = make_template(name, variant, path, _read(path))
+                    except (OSError, UnicodeDecodeError, ValueError) as e:
+                        if key not in self._templates and variant == BASE_VARIANT and name in self.fallbacks:
+                            self._templates[key] = make_template(name, variant, None, self.fallbacks[name])
+                        st.warning(f"Error loading prompt from {path}: {str(e)}")
+
+            for key in set(self._templates) - seen:
+                del self._templates[key]
+                self._mtimes.pop(key, None)
+                changed = True
+
+            if changed:
+                self._fingerprint = None
+            return changed
+
+    def variant_for(self, name, key=""):
+        """
+        Variant of a prompt for one input
+
+        Args:
+            name (str): Prompt name
+            key (str): Text the prompt is about (e.g. the transcript)
+
+        Returns:
+            str: Variant name (BASE_VARIANT when no variant applies)
+        """
+        shares = self.variants.get(name)
+        if not shares:
+            return BASE_VARIANT
+        point = int(hashlib.sha256(f"{name}\0{key}".encode('utf-8')).hexdigest()[:8], 16) % 10000 / 100
+        for variant, percent in shares:
+            if point < percent:
+                return variant
+            point -= percent
+        return BASE_VARIANT
+
+    def get(self, name, key=""):
+        """
+        Template for a prompt, picking its A/B variant for the given input
+
+        Args:
+            name (str): Prompt name
+            key (str): Text the prompt is about (e.g. the transcript)
+
+        Returns:
+            PromptTemplate: Template or None if neither the file nor a fallback is available
+        """
+        self.reload(force=False)
+        variant = self.variant_for(name, key)
+        template = self._templates.get((name, variant))
+        if template is None and variant != BASE_VARIANT:
+            # A configured variant without a file falls back to the base template
+            template = self._templates.get((name, BASE_VARIANT))
+        return template
+
+    def tokens(self, name):
+        """
+        Largest token count among a prompt's active templates, for budgeting
+
+        Args:
+            name (str): Prompt name
+
+        Returns:
+            int: Estimated tokens (0 if the prompt is unavailable)
+        """
+        self.reload(force=False)
+        variants = [BASE_VARIANT] + [variant for variant, _ in self.variants.get(name, [])]
+        return max((self._templates[(name, variant)].tokens
+                    for variant in variants if (name, variant) in self._templates), default=0)
+
+    def fingerprint(self, names=None):
+        """
+        Fingerprint of the active templates and variant shares for cache keys
+
+        Args:
+            names (list): Prompts to include (defaults to all)
+
+        Returns:
+            str: Hex digest that changes whenever a template or share changes
+        """
+        self.reload(force=False)
+        with self._lock:
+            if names is None and self._fingerprint:
+                return self._fingerprint
+            digest = hashlib.sha256()
+            for name in names or self.files:
+                shares = self.variants.get(name, [])
+                for variant in [BASE_VARIANT] + [variant for variant, _ in shares]:
+                    template = self._templates.get((name, variant))
+                    digest.update(f"{name}:{variant}:{template.fingerprint if template else ''}\n".encode('utf-8'))
+                digest.update(repr(shares).encode('utf-8'))
+            if names is None:
+                self._fingerprint = digest.hexdigest()
+            return digest.hexdigest()
@@ -0,0 +1,180 @@
+import os
+import threading
+from concurrent.futures import wait
+import streamlit as st
+from processing.chunking import estimate_tokens
+from processing.gemini_client import GENERATION_TIMEOUT, get_gemini_client
+from processing.summarize_and_generate import (
+    MAP_WORKERS, chunk_token_budget, make_executor, summarize_chunk, reduce_summaries,
+    generate_summary, generate_hashtags, generate_titles, needs_map_reduce, map_reduce_threshold
+)
+
+# Minutes of transcript after which hashtags and titles are requested
+SPECULATIVE_HEAD_MINUTES = float(os.environ.get("SPECULATIVE_HEAD_MINUTES", "5"))
+
+# Default for the app's "overlap generation with transcription" toggle
+SPECULATIVE_GENERATION = os.environ.get("SPECULATIVE_GENERATION", "0") == "1"
+
+def get_speculative_mode(head_minutes=None):
+    """
+    Name the speculative mode for prompt fingerprints
+
+    Content built from a partial transcript differs from the normal modes,
+    so it is cached under its own key.
+
+    Args:
+        head_minutes (float): Minutes used for hashtags and titles
+
+    Returns:
+        str: Mode name
+    """
+    head_minutes = SPECULATIVE_HEAD_MINUTES if head_minutes is None else head_minutes
+    return f"speculative:{head_minutes:g}"
+
+class SpeculativeGenerator:
+    """
+    Start content generation while transcription is still running
+
+    Feed each transcribed segment to on_segment. Once the first
+    head_minutes of audio are transcribed, hashtags and titles are
+    requested from that opening. Once the transcript is long enough to
+    need map-reduce, every map-step chunk of transcript is summarized as
+    soon as it is complete, so finish only has to summarize the tail and
+    combine the chunk summaries. Shorter transcripts are summarized whole
+    by finish, as in generate_content.
+    """
+
+    def __init__(self, head_minutes=None, client=None):
+        head_minutes = SPECULATIVE_HEAD_MINUTES if head_minutes is None else head_minutes
+        self.head_seconds = head_minutes * 60
+        self.client = client or get_gemini_client()
+        self.executor = make_executor(MAP_WORKERS + 2)
+        self.lock = threading.Lock()
+        self.texts = []
+        self.chunk = []
+        self.chunk_tokens = 0
+        self.chunk_budget = chunk_token_budget()
+        self.tokens = 0
+        self.threshold = map_reduce_threshold()
+        # Complete chunks wait here until the transcript is known to need map-reduce
+        self.held_chunks = []
+        self.chunk_futures = []
+        self.field_futures = {}
+
+    def _start_fields(self, source):
+        """Request hashtags and titles from the transcript so far"""
+        self.field_futures = {
+            'hashtags': self.executor.submit(generate_hashtags, source, self.client),
+            'titles': self.executor.submit(generate_titles, source, self.client)
+        }
+
+    def _send_chunks(self):
+        """Summarize the held chunks"""
+        for chunk in self.held_chunks:
+            self.chunk_futures.append(self.executor.submit(summarize_chunk, chunk, self.client))
+        self.held_chunks = []
+
+    def on_segment(self, segment):
+        """
+        Take one transcribed segment
+
+        Args:
+            segment (dict): Segment with start, end and text
+        """
+        with self.lock:
+            self.texts.append(segment['text'])
+            self.chunk.append(segment['text'])
+            tokens = estimate_tokens(segment['text'])
+            self.chunk_tokens += tokens
+            self.tokens += tokens
+
+            if not self.field_futures and segment['end'] >= self.head_seconds:
+                self._start_fields(" ".join(self.texts))
+
+            # Counted per segment so the chunk is joined only once, when it is complete
+            if self.chunk_tokens >= self.chunk_budget:
+                self.held_chunks.append(" ".join(self.chunk))
+                self.chunk = []
+                self.chunk_tokens = 0
+            if self.tokens > self.threshold:
+                self._send_chunks()
+
+    def cancel(self):
+        """Drop queued requests, e.g. when transcription failed"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def finish(self, transcript, timeout=None):
+        """
+        Complete generation once the full transcript is available
+
+        Args:
+            transcript (str): Full transcript
+            timeout (float): Seconds to wait for outstanding calls
+                (defaults to GENERATION_TIMEOUT)
+
+        Returns:
+            dict: Generated content (failed fields are omitted)
+        """
+        timeout = GENERATION_TIMEOUT if timeout is None else timeout
+        content = {}
+
+        with self.lock:
+            # Videos shorter than the head get hashtags and titles from everything
+            if not self.field_futures:
+                self._start_fields(transcript)
+
+            # Transcripts within the budget are summarized whole, as in generate_content
+            if not needs_map_reduce(transcript):
+                for future in self.chunk_futures:
+                    future.cancel()
+                self.chunk_futures = []
+                summary_future = self.executor.submit(generate_summary, transcript, self.client)
+            else:
+                if self.chunk:
+                    self.held_chunks.append(" ".join(self.chunk))
+                    self.chunk = []
+                    self.chunk_tokens = 0
+                self._send_chunks()
+                summary_future = None
+
+        try:
+            if summary_future:
+                futures = {summary_future: 'summary', **{f: k for k, f in self.field_futures.items()}}
+            else:
+                futures = {f: k for k, f in self.field_futures.items()}
+                futures.update({f: f"transcript part {i}" for i, f in enumerate(self.chunk_futures, 1)})
+
+            done, not_done = wait(futures, timeout=timeout)
+            results = {}
+            for future in done:
+                try:
+                    results[futures[future]] = future.result()
+                except Exception as e:
+                    # One failed field never discards the ones that succeeded
+                    st.warning(f"Skipping {futures[future]}: {type(e).__name__}: {str(e)}")
+            for future in not_done:
+                future.cancel()
+                st.warning(f"Skipping {futures[future]}: timed out after {timeout:.0f}s")
+
+            if summary_future:
+                if 'summary' in results:
+                    content['summary'] = results['summary']
+            else:
+                summaries = [
+                    results[f"transcript part {i}"]
+                    for i in range(1, len(self.chunk_futures) + 1)
+                    if results.get(f"transcript part {i}")
+                ]
+                if len(summaries) < len(self.chunk_futures):
+                    st.warning(f"Summarized {len(summaries)} of {len(self.chunk_futures)} transcript parts")
+                summary = reduce_summaries(summaries, self.client) if summaries else None
+                if summary:
+                    content['summary'] = summary
+
+            for key in ('hashtags', 'titles'):
+                if key in results:
+                    content[key] = results[key]
+        finally:
+            self.cancel()
+
+        return content
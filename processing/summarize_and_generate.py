@@ -1,182 +1,680 @@
 import os
-from google import genai
+import json
+import time
+import queue
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 from google.genai import types
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from processing.chunking import estimate_tokens, split_transcript
+from processing.chapters import find_chapter_spans, format_chapter_time
+from processing.compact_transcript import CompactTranscript
+from processing.prompt_registry import PromptRegistry
+from processing.gemini_client import (
+    GEMINI_MODEL, GENERATION_TIMEOUT, GeminiError, GeminiRequestError,
+    call_gemini, stream_gemini, get_gemini_client
+)
+from utils.metrics import timed, add_metrics
 
-# Initialize Gemini client
-def get_gemini_client():
-    """Initialize and return Gemini client"""
-    api_key = os.environ.get("GEMINI_API_KEY", "default_key")
-    return genai.Client(api_key=api_key)
+# "separate" sends one request per field, "combined" asks for all fields at once
+CONTENT_MODE = os.environ.get("CONTENT_MODE", "separate")
 
-def load_prompt(prompt_file):
-    """Load prompt template from file"""
-    try:
-        with open(prompt_file, 'r', encoding='utf-8') as f:
-            return f.read().strip()
-    except Exception as e:
-        st.error(f"Error loading prompt from {prompt_file}: {str(e)}")
+PROMPT_FILES = {
+    'summary': "prompts/summary_prompt.txt",
+    'hashtags': "prompts/hashtags_prompt.txt",
+    'titles': "prompts/titles_prompt.txt"
+}
+
+# Prompts used to summarize transcripts that exceed TRANSCRIPT_TOKEN_BUDGET
+MAP_REDUCE_PROMPT_FILES = {
+    'chunk_summary': "prompts/chunk_summary_prompt.txt",
+    'reduce': "prompts/reduce_prompt.txt"
+}
+
+CHAPTER_PROMPT_FILE = "prompts/chapter_titles_prompt.txt"
+
+# Words of each chapter sent along with its keywords when titling
+CHAPTER_EXCERPT_WORDS = int(os.environ.get("CHAPTER_EXCERPT_WORDS", "80"))
+
+# Transcripts above this estimate are summarized chunk by chunk first
+TRANSCRIPT_TOKEN_BUDGET = int(os.environ.get("TRANSCRIPT_TOKEN_BUDGET", "30000"))
+
+# Token budget for each chunk in the map step
+CHUNK_TOKENS = int(os.environ.get("CHUNK_TOKENS", "8000"))
+
+# Concurrent Gemini calls in the map step
+MAP_WORKERS = int(os.environ.get("MAP_WORKERS", "4"))
+
+MAX_HASHTAGS = 10
+MAX_TITLES = 5
+
+CONTENT_SCHEMA = types.Schema(
+    type=types.Type.OBJECT,
+    properties={
+        'summary': types.Schema(type=types.Type.STRING),
+        'hashtags': types.Schema(
+            type=types.Type.ARRAY,
+            items=types.Schema(type=types.Type.STRING)
+        ),
+        'titles': types.Schema(
+            type=types.Type.ARRAY,
+            items=types.Schema(type=types.Type.STRING)
+        )
+    },
+    required=['summary', 'hashtags', 'titles']
+)
+
+# Used when a prompt file is missing
+FALLBACK_PROMPTS = {
+    'summary': """Given the following transcript of a YouTube video, write a concise summary in 3–4 sentences.
+
+Transcript:
+""",
+    'hashtags': """Extract the top 10 SEO-optimized hashtags from this YouTube video transcript. Focus on relevancy, search trends, and audience discoverability. Return only the hashtags, one per line, with # prefix.
+
+Transcript:
+""",
+    'titles': """Generate 5 catchy, YouTube-optimized video titles based on this transcript. Include curiosity, clarity, and trending language. Make them engaging and click-worthy.
+
+Transcript:
+"""
+}
+
+# Templates are read once and reloaded when their files change
+_prompts = PromptRegistry(
+    {**PROMPT_FILES, **MAP_REDUCE_PROMPT_FILES, 'chapter_titles': CHAPTER_PROMPT_FILE},
+    fallbacks={key: text.strip() for key, text in FALLBACK_PROMPTS.items()}
+)
+
+def get_prompt(name, key=""):
+    """
+    Prompt template text for one request, recording its A/B variant
+
+    Args:
+        name (str): Prompt name (a PROMPT_FILES or MAP_REDUCE_PROMPT_FILES key, or 'chapter_titles')
+        key (str): Text the prompt is about, which picks the variant
+
+    Returns:
+        str: Template text or None if it could not be loaded
+    """
+    template = _prompts.get(name, key)
+    if not template:
         return None
+    add_metrics(prompt_variant=template.variant)
+    return template.text
 
-def generate_summary(transcript):
+def get_prompt_fingerprint(mode=None):
     """
-    Generate video summary using Gemini Flash
-    
+    Fingerprint the prompt templates and generation mode for cache keys
+
+    Args:
+        mode (str): Generation mode (defaults to CONTENT_MODE)
+
+    Returns:
+        str: Hex digest that changes whenever a template or variant share changes
+    """
+    digest = hashlib.sha256((mode or CONTENT_MODE).encode('utf-8'))
+    digest.update(f"{TRANSCRIPT_TOKEN_BUDGET}:{CHUNK_TOKENS}".encode('utf-8'))
+    digest.update(_prompts.fingerprint([*PROMPT_FILES, *MAP_REDUCE_PROMPT_FILES]).encode('utf-8'))
+    return digest.hexdigest()
+
+def needs_map_reduce(transcript):
+    """
+    Whether a transcript plus the largest field prompt exceeds TRANSCRIPT_TOKEN_BUDGET
+
     Args:
         transcript (str): Video transcript
-        
+
     Returns:
-        str: Generated summary
+        bool: Summarize chunk by chunk first
     """
-    try:
-        client = get_gemini_client()
-        
-        # Load summary prompt
-        prompt_template = load_prompt("prompts/summary_prompt.txt")
-        if not prompt_template:
-            prompt_template = """Given the following transcript of a YouTube video, write a concise summary in 3–4 sentences.
+    return estimate_tokens(transcript) > map_reduce_threshold()
 
-Transcript:
-"""
+def map_reduce_threshold():
+    """Transcript tokens above which needs_map_reduce is true"""
+    return TRANSCRIPT_TOKEN_BUDGET - max(_prompts.tokens(key) for key in PROMPT_FILES)
 
-        prompt = f"{prompt_template}\n\"\"\"\n{transcript}\n\"\"\""
-        
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=prompt
-        )
+def chunk_token_budget():
+    """Transcript tokens per map-step chunk, leaving room for the chunk prompt"""
+    return max(CHUNK_TOKENS - _prompts.tokens('chunk_summary'), CHUNK_TOKENS // 2)
+
+def build_prompt(key, transcript):
+    """
+    Build the prompt for one content field
+
+    Args:
+        key (str): 'summary', 'hashtags' or 'titles'
+        transcript (str): Video transcript
+
+    Returns:
+        str: Prompt
+    """
+    prompt_template = get_prompt(key, transcript)
+    return f"{prompt_template}\n\"\"\"\n{transcript}\n\"\"\""
+
+def parse_hashtags(text):
+    """
+    Parse hashtags from a model response, one per line
+
+    Args:
+        text (str): Response text
+
+    Returns:
+        list: Hashtags with # prefix
+    """
+    hashtags = []
+    for line in text.split('\n'):
+        line = line.strip()
+        if line and (line.startswith('#') or line.startswith('-')):
+            # Clean up hashtag
+            hashtag = line.replace('-', '').strip()
+            if not hashtag.startswith('#'):
+                hashtag = '#' + hashtag
+            hashtags.append(hashtag)
+    
+    return hashtags[:MAX_HASHTAGS]
+
+def parse_titles(text):
+    """
+    Parse title suggestions from a model response
+
+    Args:
+        text (str): Response text
+
+    Returns:
+        list: Titles without numbering
+    """
+    titles = []
+    for line in text.split('\n'):
+        line = line.strip()
+        if line and (line[0].isdigit() or line.startswith('-')):
+            # Clean up title
+            title = line
+            # Remove numbering
+            if line[0].isdigit():
+                title = '. '.join(line.split('. ')[1:])
+            elif line.startswith('-'):
+                title = line[1:].strip()
+            
+            if title:
+                titles.append(title)
+        elif line and not any(x in line.lower() for x in ['title', 'suggestion', 'here are']):
+            # Handle plain titles without numbering
+            titles.append(line)
+    
+    return titles[:MAX_TITLES]
+
+@timed("generate_summary")
+def generate_summary(transcript, client=None, deadline=None):
+    """
+    Generate video summary using Gemini Flash
+    
+    Args:
+        transcript (str): Video transcript
+        client (genai.Client): Optional client to reuse across calls
+        deadline (float): Optional time.monotonic() value to stop retrying at
         
-        return response.text or "Failed to generate summary"
+    Returns:
+        str: Generated summary
         
-    except Exception as e:
-        st.error(f"Error generating summary: {str(e)}")
-        return "Error generating summary"
+    Raises:
+        GeminiError: The request failed after retries
+    """
+    response = call_gemini(build_prompt('summary', transcript), client=client, deadline=deadline)
+    return response.text.strip()
 
-def generate_hashtags(transcript):
+@timed("generate_hashtags")
+def generate_hashtags(transcript, client=None, deadline=None):
     """
     Generate SEO hashtags using Gemini Flash
     
     Args:
         transcript (str): Video transcript
+        client (genai.Client): Optional client to reuse across calls
+        deadline (float): Optional time.monotonic() value to stop retrying at
         
     Returns:
         list: List of hashtags
+        
+    Raises:
+        GeminiError: The request failed after retries
     """
-    try:
-        client = get_gemini_client()
+    response = call_gemini(build_prompt('hashtags', transcript), client=client, deadline=deadline)
+    return parse_hashtags(response.text)
+
+@timed("generate_titles")
+def generate_titles(transcript, client=None, deadline=None):
+    """
+    Generate title suggestions using Gemini Flash
+    
+    Args:
+        transcript (str): Video transcript
+        client (genai.Client): Optional client to reuse across calls
+        deadline (float): Optional time.monotonic() value to stop retrying at
+        
+    Returns:
+        list: List of title suggestions
         
-        # Load hashtags prompt
-        prompt_template = load_prompt("prompts/hashtags_prompt.txt")
-        if not prompt_template:
-            prompt_template = """Extract the top 10 SEO-optimized hashtags from this YouTube video transcript. Focus on relevancy, search trends, and audience discoverability. Return only the hashtags, one per line, with # prefix.
+    Raises:
+        GeminiError: The request failed after retries
+    """
+    response = call_gemini(build_prompt('titles', transcript), client=client, deadline=deadline)
+    return parse_titles(response.text)
 
-Transcript:
-"""
+@timed("generate_summary", streamed=True)
+def stream_summary(transcript, client=None, segments=None):
+    """
+    Stream the video summary as it is generated
+    
+    Transcripts over TRANSCRIPT_TOKEN_BUDGET are summarized chunk by
+    chunk first and only the final combining step is streamed.
+    
+    Args:
+        transcript (str): Video transcript
+        client (genai.Client): Optional client to reuse across calls
+        segments (list): Optional segment dicts used to chunk long transcripts
+        
+    Yields:
+        str: Summary text chunks
+        
+    Raises:
+        GeminiError: The request failed
+    """
+    if needs_map_reduce(transcript):
+        summaries = summarize_chunks(split_transcript(transcript, chunk_token_budget(), segments), client)
+        yield from stream_gemini(build_reduce_prompt(summaries), client=client)
+    else:
+        yield from stream_gemini(build_prompt('summary', transcript), client=client)
 
-        prompt = f"{prompt_template}\n\"\"\"\n{transcript}\n\"\"\""
+@timed("generate_titles", streamed=True)
+def stream_titles(transcript, client=None):
+    """
+    Stream the raw title suggestions as they are generated
+    
+    Join the chunks and pass them to parse_titles for the final list.
+    
+    Args:
+        transcript (str): Video transcript (or summary of a long one)
+        client (genai.Client): Optional client to reuse across calls
         
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=prompt
-        )
+    Yields:
+        str: Response text chunks
         
-        if response.text:
-            # Parse hashtags from response
-            hashtags = []
-            for line in response.text.split('\n'):
-                line = line.strip()
-                if line and (line.startswith('#') or line.startswith('-')):
-                    # Clean up hashtag
-                    hashtag = line.replace('-', '').strip()
-                    if not hashtag.startswith('#'):
-                        hashtag = '#' + hashtag
-                    hashtags.append(hashtag)
-            
-            return hashtags[:10]  # Return max 10 hashtags
+    Raises:
+        GeminiError: The request failed
+    """
+    yield from stream_gemini(build_prompt('titles', transcript), client=client)
+
+@timed("generate_hashtags", streamed=True)
+def stream_hashtags(transcript, client=None):
+    """
+    Stream the raw hashtag response as it is generated
+    
+    Join the chunks and pass them to parse_hashtags for the final list.
+    
+    Args:
+        transcript (str): Video transcript (or summary of a long one)
+        client (genai.Client): Optional client to reuse across calls
         
-        return []
+    Yields:
+        str: Response text chunks
         
-    except Exception as e:
-        st.error(f"Error generating hashtags: {str(e)}")
+    Raises:
+        GeminiError: The request failed
+    """
+    yield from stream_gemini(build_prompt('hashtags', transcript), client=client)
+
+def prefetch_stream(stream):
+    """
+    Start consuming a stream in the background and replay it on demand
+
+    Lets a second stream run while the first one is being displayed.
+
+    Args:
+        stream (iterator): Text chunk iterator
+
+    Returns:
+        iterator: Chunks in order; errors are re-raised when reached
+    """
+    chunks = queue.Queue()
+    
+    def consume():
+        try:
+            for chunk in stream:
+                chunks.put(chunk)
+            chunks.put(None)
+        except Exception as e:
+            chunks.put(e)
+    
+    threading.Thread(target=consume, daemon=True).start()
+    
+    def replay():
+        while True:
+            chunk = chunks.get()
+            if chunk is None:
+                return
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+    
+    return replay()
+
+def make_executor(max_workers):
+    """Create a thread pool whose workers share the script context so st.error still renders"""
+    return ThreadPoolExecutor(
+        max_workers=max_workers,
+        initializer=add_script_run_ctx,
+        initargs=(None, get_script_run_ctx(suppress_warning=True))
+    )
+
+@timed("summarize_chunk")
+def summarize_chunk(chunk, client=None):
+    """
+    Summarize one transcript chunk
+
+    Args:
+        chunk (str): Transcript chunk
+        client (genai.Client): Optional client to reuse across calls
+
+    Returns:
+        str: Chunk summary
+
+    Raises:
+        GeminiError: The request failed or the chunk prompt is missing
+    """
+    prompt_template = get_prompt('chunk_summary', chunk)
+    if not prompt_template:
+        raise GeminiRequestError("Chunk summary prompt is missing")
+    
+    response = call_gemini(f"{prompt_template}\n\"\"\"\n{chunk}\n\"\"\"", client=client)
+    return response.text.strip()
+
+def summarize_chunks(chunks, client=None):
+    """
+    Summarize transcript chunks concurrently (map step)
+
+    Args:
+        chunks (list): Transcript chunks in order
+        client (genai.Client): Optional client to reuse across calls
+
+    Returns:
+        list: Chunk summaries in order (failed chunks are skipped)
+    """
+    client = client or get_gemini_client()
+    if not _prompts.get('chunk_summary'):
         return []
+    
+    summaries = []
+    executor = make_executor(MAP_WORKERS)
+    try:
+        futures = [executor.submit(summarize_chunk, chunk, client) for chunk in chunks]
+        for index, future in enumerate(futures, 1):
+            try:
+                summary = future.result(timeout=GENERATION_TIMEOUT)
+                if summary:
+                    summaries.append(summary)
+            except Exception as e:
+                st.warning(f"Skipping transcript part {index}: {type(e).__name__}: {str(e)}")
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    
+    return summaries
 
-def generate_titles(transcript):
+def build_reduce_prompt(summaries):
     """
-    Generate title suggestions using Gemini Flash
+    Build the prompt that combines chunk summaries
+
+    Args:
+        summaries (list): Chunk summaries in order
+
+    Returns:
+        str: Prompt
+
+    Raises:
+        GeminiRequestError: Nothing to combine or the reduce prompt is missing
+    """
+    parts = "\n\n".join(
+        f"Part {index}:\n{summary}" for index, summary in enumerate(summaries, 1)
+    )
+    prompt_template = get_prompt('reduce', parts)
+    if not prompt_template or not summaries:
+        raise GeminiRequestError("No chunk summaries to combine")
+    
+    return f"{prompt_template}\n\"\"\"\n{parts}\n\"\"\""
+
+@timed("reduce_summaries")
+def reduce_summaries(summaries, client=None):
+    """
+    Combine chunk summaries into one summary of the whole video (reduce step)
+
+    Args:
+        summaries (list): Chunk summaries in order
+        client (genai.Client): Optional client to reuse across calls
+
+    Returns:
+        str: Combined summary or None if failed
+    """
+    try:
+        response = call_gemini(build_reduce_prompt(summaries), client=client)
+        return response.text.strip() or None
+        
+    except GeminiError as e:
+        st.error(f"Error combining summaries: {type(e).__name__}: {str(e)}")
+        return None
+
+def map_reduce_summary(transcript, client=None, segments=None):
+    """
+    Summarize a long transcript by summarizing chunks and combining them
     
     Args:
         transcript (str): Video transcript
+        client (genai.Client): Optional client to reuse across calls
+        segments (list): Optional segment dicts to chunk along
         
     Returns:
-        list: List of title suggestions
+        str: Summary of the whole transcript or None if failed
     """
-    try:
-        client = get_gemini_client()
+    client = client or get_gemini_client()
+    chunks = split_transcript(transcript, chunk_token_budget(), segments)
+    summaries = summarize_chunks(chunks, client)
+    if len(summaries) < len(chunks):
+        st.warning(f"Summarized {len(summaries)} of {len(chunks)} transcript parts")
+    return reduce_summaries(summaries, client)
+
+def build_combined_prompt(transcript):
+    """
+    Build a single prompt asking for summary, hashtags and titles
+
+    Args:
+        transcript (str): Video transcript
+
+    Returns:
+        str: Combined prompt or None if a template could not be loaded
+    """
+    sections = []
+    for key in PROMPT_FILES:
+        template = get_prompt(key, transcript)
+        if not template:
+            return None
         
-        # Load titles prompt
-        prompt_template = load_prompt("prompts/titles_prompt.txt")
-        if not prompt_template:
-            prompt_template = """Generate 5 catchy, YouTube-optimized video titles based on this transcript. Include curiosity, clarity, and trending language. Make them engaging and click-worthy.
+        # Each template ends with a "Transcript:" header, shared once below
+        if template.endswith("Transcript:"):
+            template = template[:-len("Transcript:")].rstrip()
+        sections.append(f"## {key}\n{template}")
+    
+    instructions = "\n\n".join(sections)
+    return (
+        "Complete each of the following tasks for the same YouTube video transcript. "
+        "Answer with a JSON object holding the \"summary\" text, the \"hashtags\" list "
+        "and the \"titles\" list.\n\n"
+        f"{instructions}\n\nTranscript:\n\"\"\"\n{transcript}\n\"\"\""
+    )
 
-Transcript:
-"""
+def validate_content(data):
+    """
+    Validate a structured content response
+
+    Args:
+        data (dict): Decoded JSON response
 
-        prompt = f"{prompt_template}\n\"\"\"\n{transcript}\n\"\"\""
+    Returns:
+        dict: Fields that passed validation (missing keys failed)
+    """
+    content = {}
+    if not isinstance(data, dict):
+        return content
+    
+    summary = data.get('summary')
+    if isinstance(summary, str) and summary.strip():
+        content['summary'] = summary.strip()
+    
+    hashtags = data.get('hashtags')
+    if isinstance(hashtags, list) and all(isinstance(tag, str) for tag in hashtags):
+        hashtags = ['#' + tag.strip().lstrip('#') for tag in hashtags if tag.strip().lstrip('#')]
+        if hashtags:
+            content['hashtags'] = hashtags[:MAX_HASHTAGS]
+    
+    titles = data.get('titles')
+    if isinstance(titles, list) and all(isinstance(title, str) for title in titles):
+        titles = [title.strip() for title in titles if title.strip()]
+        if titles:
+            content['titles'] = titles[:MAX_TITLES]
+    
+    return content
+
+@timed("generate_combined")
+def generate_combined(transcript, client=None):
+    """
+    Generate summary, hashtags and titles with one structured-output call
+    
+    Args:
+        transcript (str): Video transcript
+        client (genai.Client): Optional client to reuse across calls
+        
+    Returns:
+        dict: Validated fields (fields that failed validation are omitted)
+    """
+    try:
+        prompt = build_combined_prompt(transcript)
+        if not prompt:
+            return {}
         
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=prompt
+        client = client or get_gemini_client()
+        response = call_gemini(
+            prompt,
+            config=types.GenerateContentConfig(
+                response_mime_type="application/json",
+                response_schema=CONTENT_SCHEMA
+            ),
+            client=client
         )
         
-        if response.text:
-            # Parse titles from response
-            titles = []
-            for line in response.text.split('\n'):
-                line = line.strip()
-                if line and (line[0].isdigit() or line.startswith('-')):
-                    # Clean up title
-                    title = line
-                    # Remove numbering
-                    if line[0].isdigit():
-                        title = '. '.join(line.split('. ')[1:])
-                    elif line.startswith('-'):
-                        title = line[1:].strip()
-                    
-                    if title:
-                        titles.append(title)
-                elif line and not any(x in line.lower() for x in ['title', 'suggestion', 'here are']):
-                    # Handle plain titles without numbering
-                    titles.append(line)
-            
-            return titles[:5]  # Return max 5 titles
+        return validate_content(json.loads(response.text))
         
-        return []
+    except (GeminiError, ValueError) as e:
+        st.warning(f"Combined generation failed, falling back to separate calls: {type(e).__name__}: {str(e)}")
+        return {}
+
+def generate_fields(transcript, keys, client=None, timeout=None):
+    """
+    Generate the requested content fields concurrently
+
+    Calls that fail or run past the timeout are left out of the result
+    instead of failing the whole step. The timeout is also passed on as
+    a deadline, so calls that are given up on stop retrying.
+
+    Args:
+        transcript (str): Video transcript
+        keys (list): Fields to generate ('summary', 'hashtags', 'titles')
+        client (genai.Client): Optional client to reuse across calls
+        timeout (float): Seconds to wait for each call (defaults to GENERATION_TIMEOUT)
+
+    Returns:
+        dict: Generated fields
+    """
+    content = {}
+    if not keys:
+        return content
+    
+    client = client or get_gemini_client()
+    timeout = GENERATION_TIMEOUT if timeout is None else timeout
+    
+    generators = {
+        'summary': generate_summary,
+        'hashtags': generate_hashtags,
+        'titles': generate_titles
+    }
+    
+    deadline = time.monotonic() + timeout
+    executor = make_executor(len(keys))
+    try:
+        futures = {
+            executor.submit(generators[key], transcript, client, deadline): key
+            for key in keys
+        }
+        done, not_done = wait(futures, timeout=timeout)
         
-    except Exception as e:
-        st.error(f"Error generating titles: {str(e)}")
-        return []
+        for future in done:
+            key = futures[future]
+            try:
+                content[key] = future.result()
+            except Exception as e:
+                # Failures are left out so error text never ends up saved as content,
+                # and one bad field never discards the ones that succeeded
+                st.warning(f"Skipping {key}: {type(e).__name__}: {str(e)}")
+        
+        for future in not_done:
+            future.cancel()
+            st.warning(f"Skipping {futures[future]}: timed out after {timeout:.0f}s")
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    
+    return content
 
-def generate_content(transcript):
+def generate_content(transcript, timeout=None, mode=None, segments=None):
     """
     Generate all content types (summary, hashtags, titles)
+
+    In "separate" mode the three requests are sent concurrently over one
+    shared client, so the step takes about as long as the slowest call.
+    In "combined" mode a single structured-output request is sent and
+    only the fields that fail validation are regenerated separately.
+    Transcripts over TRANSCRIPT_TOKEN_BUDGET are summarized with
+    map_reduce_summary and the other fields are generated from that
+    summary instead of the raw transcript; if that summary fails nothing
+    is generated, since the raw transcript is over budget.
     
     Args:
         transcript (str): Video transcript
+        timeout (float): Seconds to wait for each call (defaults to GENERATION_TIMEOUT)
+        mode (str): "separate" or "combined" (defaults to CONTENT_MODE)
+        segments (list): Optional segment dicts used to chunk long transcripts
         
     Returns:
         dict: Dictionary containing all generated content
     """
     try:
-        content = {}
-        
-        # Generate summary
-        content['summary'] = generate_summary(transcript)
+        client = get_gemini_client()
+        mode = mode or CONTENT_MODE
         
-        # Generate hashtags
-        content['hashtags'] = generate_hashtags(transcript)
+        content = {}
+        source = transcript
+        if needs_map_reduce(transcript):
+            # Hashtags and titles are generated from the reduced summary
+            summary = map_reduce_summary(transcript, client, segments)
+            if not summary:
+                # The transcript is over budget, so it is never sent as a fallback
+                st.warning("Skipping hashtags and titles: the transcript could not be summarized")
+                return {}
+            content['summary'] = summary
+            source = summary
+        elif mode == "combined":
+            content = generate_combined(transcript, client)
         
-        # Generate titles
-        content['titles'] = generate_titles(transcript)
+        missing = [key for key in PROMPT_FILES if key not in content]
+        content.update(generate_fields(source, missing, client, timeout))
         
         return content
         
@@ -184,45 +682,90 @@ def generate_content(transcript):
         st.error(f"Error generating content: {str(e)}")
         return {}
 
-def generate_chapters(transcript):
+def build_chapter_prompt(spans):
+    """
+    Build the prompt asking for one title per precomputed chapter
+
+    Only keywords and an excerpt of each chapter are sent, so the prompt
+    stays small for multi-hour videos.
+
+    Args:
+        spans (list): Chapters from find_chapter_spans
+
+    Returns:
+        str: Prompt
+
+    Raises:
+        GeminiRequestError: The chapter prompt is missing
     """
-    Generate suggested video chapters/timestamps
+    parts = "\n\n".join(
+        f"Chapter {index} ({format_chapter_time(span['start'])})\n"
+        f"Keywords: {', '.join(span['keywords'])}\n"
+        f"Excerpt: {' '.join(span['text'].split()[:CHAPTER_EXCERPT_WORDS])}"
+        for index, span in enumerate(spans, 1)
+    )
+    prompt_template = get_prompt('chapter_titles', parts)
+    if not prompt_template:
+        raise GeminiRequestError("Chapter titles prompt is missing")
+    
+    return f"{prompt_template}\n\"\"\"\n{parts}\n\"\"\""
+
+@timed("generate_chapters")
+def generate_chapters(segments, client=None):
+    """
+    Generate video chapters with timestamps taken from the transcript
+    
+    Chapter boundaries are found locally from the segment text; Gemini
+    only titles each span. If titling fails the chapters keep keyword
+    titles, so the timestamps are still usable.
     
     Args:
-        transcript (str): Video transcript with timestamps
+        segments (list, dict or CompactTranscript): Segment dicts with start,
+            end and text, or the result of transcribe_with_timestamps
+        client (genai.Client): Optional client to reuse across calls
         
     Returns:
-        list: List of chapter suggestions
+        list: Chapter dicts with start, end and title
     """
+    if isinstance(segments, CompactTranscript):
+        segments = segments.to_dict(lazy=True, with_words=False)
+    if isinstance(segments, dict):
+        segments = segments.get('segments', [])
+    spans = find_chapter_spans(segments)
+    if not spans:
+        return []
+    
+    titles = []
     try:
-        client = get_gemini_client()
-        
-        prompt = f"""Based on this video transcript, suggest 5-8 chapter divisions with descriptive titles. Format as:
-        
-0:00 - Introduction
-2:30 - Main Topic
-5:15 - Key Points
-etc.
-
-Transcript:
-\"\"\"{transcript}\"\"\""""
-        
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=prompt
+        response = call_gemini(
+            build_chapter_prompt(spans),
+            config=types.GenerateContentConfig(
+                response_mime_type="application/json",
+                response_schema=types.Schema(
+                    type=types.Type.ARRAY,
+                    items=types.Schema(type=types.Type.STRING)
+                )
+            ),
+            client=client
         )
-        
-        if response.text:
-            chapters = []
-            for line in response.text.split('\n'):
-                line = line.strip()
-                if ':' in line and any(char.isdigit() for char in line):
-                    chapters.append(line)
-            
-            return chapters
-        
-        return []
-        
-    except Exception as e:
-        st.error(f"Error generating chapters: {str(e)}")
-        return []
+        if not response.text:
+            raise ValueError("empty or blocked response")
+        titles = json.loads(response.text)
+        if not isinstance(titles, list):
+            raise ValueError("response is not a list of titles")
+        titles = [str(title).strip() for title in titles]
+        if len(titles) != len(spans):
+            raise ValueError(f"expected {len(spans)} titles, got {len(titles)}")
+    except (GeminiError, ValueError, TypeError) as e:
+        st.warning(f"Chapter titling failed, using keywords instead: {type(e).__name__}: {str(e)}")
+        titles = []
+    
+    return [
+        {
+            'start': span['start'],
+            'end': span['end'],
+            'title': (titles[index] if titles and titles[index] else
+                      ", ".join(span['keywords'][:3]).capitalize() or f"Part {index + 1}")
+        }
+        for index, span in enumerate(spans)
+    ]
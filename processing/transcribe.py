@@ -1,81 +1,332 @@
-from faster_whisper import WhisperModel
+from faster_whisper import decode_audio
 import os
+import re
+import numpy as np
+from functools import lru_cache
 import streamlit as st
 import tempfile
+from processing.compact_transcript import CompactTranscript
+from processing.vad import SAMPLE_RATE, VAD_ENABLED, trim_silence
+from processing.whisper_policy import (
+    WHISPER_COMPUTE_TYPE, ModelCache, create_model, default_profile, select_profile,
+    audio_duration, track_transcription, active_transcriptions
+)
+from utils.metrics import timed, add_metrics
 
-@st.cache_resource
-def load_whisper_model():
-    """Load and cache the Whisper model"""
+# Removed from transcripts as whole tokens, case-insensitively
+FILLER_WORDS = tuple(
+    word.strip() for word in os.environ.get(
+        "FILLER_WORDS",
+        "um,uh,ah,er,like,you know,I mean,basically,actually,literally"
+    ).split(",") if word.strip()
+)
+
+# Models loaded in this process, shared by every in-process transcription
+_models = ModelCache()
+
+def create_whisper_model(profile=None, cpu_threads=None):
+    """
+    Create a Whisper model for a profile
+    
+    Args:
+        profile (WhisperProfile): Model settings (defaults to default_profile())
+        cpu_threads (int): Overrides the profile's CTranslate2 threads
+        
+    Returns:
+        WhisperModel: Loaded model
+    """
+    profile = profile or default_profile()
+    if cpu_threads is not None:
+        profile = profile._replace(cpu_threads=cpu_threads)
+    return create_model(profile)
+
+def load_whisper_model(profile=None):
+    """Load a Whisper model through the in-process LRU of models"""
     try:
-        model = WhisperModel("base", device="cpu", compute_type="int8")
-        return model
+        return _models.get(profile or default_profile())
     except Exception as e:
         st.error(f"Error loading Whisper model: {str(e)}")
         return None
 
-def transcribe_audio(audio_path):
+def choose_profile(audio_path, queue_depth=None, language=None):
+    """
+    Pick the Whisper profile for transcribing audio now
+    
+    Args:
+        audio_path (str or numpy.ndarray): Path to audio file or 16 kHz mono samples
+        queue_depth (int): Jobs waiting besides this one (defaults to the
+            transcription worker's queue, or other transcriptions in this process)
+        language (str): Spoken language, if known
+        
+    Returns:
+        WhisperProfile: Chosen profile
+    """
+    from processing.transcription_worker import WORKER_ADDRESS, get_worker_status
+    
+    if queue_depth is None:
+        status = get_worker_status() if WORKER_ADDRESS else None
+        queue_depth = status['queue_depth'] if status else active_transcriptions()
+    return select_profile(audio_duration(audio_path), language, queue_depth)
+
+def stream_transcript(audio_path, workers=None, profile=None, start=0.0):
+    """
+    Transcribe audio file and yield cleaned segments as they are decoded
+    
+    Args:
+        audio_path (str or numpy.ndarray): Path to audio file or 16 kHz mono samples
+        workers (int): Worker processes for chunked transcription
+            (defaults to TRANSCRIBE_WORKERS, 1 transcribes sequentially)
+        profile (WhisperProfile): Model and decoding settings (defaults to default_profile())
+        start (float): Skip audio before this many seconds, e.g. to resume
+            after a checkpoint (timestamps stay relative to the whole file)
+        
+    Yields:
+        dict: Segment with start, end, text and progress (0.0-1.0)
+    """
+    if start:
+        audio = audio_path
+        if not isinstance(audio, np.ndarray):
+            audio = decode_audio(audio_path, sampling_rate=SAMPLE_RATE)
+        duration = len(audio) / SAMPLE_RATE
+        for segment in stream_transcript(audio[int(start * SAMPLE_RATE):], workers, profile):
+            end = segment["end"] + start
+            yield {
+                **segment,
+                "start": segment["start"] + start,
+                "end": end,
+                "progress": min(end / duration, 1.0) if duration else 0.0
+            }
+        return
+    
+    from processing.parallel_transcribe import stream_transcript_parallel, TRANSCRIBE_WORKERS
+    from processing.transcription_worker import WORKER_ADDRESS, WorkerUnavailable, stream_transcript_remote
+    
+    if WORKER_ADDRESS:
+        try:
+            yield from stream_transcript_remote(audio_path, profile=profile)
+            return
+        except WorkerUnavailable as e:
+            st.warning(f"Transcription worker unavailable, transcribing locally: {str(e)}")
+    
+    workers = workers or TRANSCRIBE_WORKERS
+    if workers > 1:
+        yield from stream_transcript_parallel(audio_path, workers=workers, profile=profile)
+        return
+    
+    profile = profile or default_profile()
+    model = load_whisper_model(profile)
+    if not model:
+        return
+    
+    yield from iter_segments(model, audio_path, profile=profile)
+
+def iter_segments(model, audio_path, vad=None, profile=None):
+    """
+    Run a loaded model and yield cleaned segments as they are decoded
+    
+    With VAD on, long silences are cut out before decoding and segment
+    timestamps are mapped back onto the original recording.
+    
+    Args:
+        model (WhisperModel): Loaded model
+        audio_path (str or numpy.ndarray): Path to audio file or 16 kHz mono samples
+        vad (bool): Trim non-speech first (defaults to VAD_ENABLED)
+        profile (WhisperProfile): Decoding settings (defaults to default_profile())
+        
+    Yields:
+        dict: Segment with start, end, text and progress (0.0-1.0)
+    """
+    audio = audio_path
+    offset_map = None
+    if VAD_ENABLED if vad is None else vad:
+        if not isinstance(audio, np.ndarray):
+            audio = decode_audio(audio_path, sampling_rate=SAMPLE_RATE)
+        audio, offset_map = trim_silence(audio)
+        add_metrics(vad_skipped_seconds=round(offset_map.skipped_seconds, 2))
+    
+    # Segments are decoded lazily as the generator is consumed
+    profile = profile or default_profile()
+    segments, info = model.transcribe(audio, beam_size=profile.beam_size, language=profile.language)
+    add_metrics(whisper_language=info.language)
+    
+    duration = offset_map.original_seconds if offset_map else info.duration
+    
+    def to_original(seconds, is_end=False):
+        return offset_map.to_original(seconds, is_end) if offset_map else seconds
+    
+    raw_segments = (
+        {
+            "start": to_original(segment.start),
+            "end": to_original(segment.end, is_end=True),
+            "text": segment.text,
+            "progress": min(to_original(segment.end, is_end=True) / duration, 1.0) if duration else 0.0
+        }
+        for segment in segments
+    )
+    yield from clean_segments(raw_segments)
+
+@timed("transcribe")
+def transcribe_audio(audio_path, on_segment=None, output_path=None, profile=None, resume=None):
     """
     Transcribe audio file to text using faster-whisper
     
+    Segment text is streamed to disk as it is decoded rather than built
+    up in memory, and read back once at the end.
+    
     Args:
-        audio_path (str): Path to audio file
+        audio_path (str or numpy.ndarray): Path to audio file or 16 kHz mono samples
+        on_segment (callable): Optional callback receiving each segment dict
+        output_path (str): Optional file to keep the transcript in
+        profile (WhisperProfile): Model and decoding settings (chosen by
+            choose_profile when omitted)
+        resume (list): Segments already transcribed (e.g. from a checkpoint);
+            their text is kept and decoding starts where the last one ended
         
     Returns:
         str: Transcribed text or None if failed
     """
     try:
-        # Load model
-        model = load_whisper_model()
-        if not model:
-            return None
+        profile = profile or choose_profile(audio_path)
+        add_metrics(whisper_profile=profile.name, whisper_model=profile.model)
         
-        # Transcribe audio
-        segments, info = model.transcribe(audio_path, beam_size=5)
+        if output_path:
+            transcript_file = open(output_path, "w+", encoding="utf-8")
+        else:
+            transcript_file = tempfile.TemporaryFile("w+", encoding="utf-8")
         
-        # Extract text from segments
-        transcript = ""
-        for segment in segments:
-            transcript += segment.text + " "
+        with transcript_file:
+            separator = ""
+            segment = None
+            for segment in resume or []:
+                transcript_file.write(separator + segment["text"])
+                separator = " "
+            start = segment["end"] if segment else 0.0
+            
+            with track_transcription():
+                for segment in stream_transcript(audio_path, profile=profile, start=start):
+                    transcript_file.write(separator + segment["text"])
+                    separator = " "
+                    if on_segment:
+                        on_segment(segment)
+            
+            # Progress is end / duration, which gives the audio length back
+            if segment and segment["progress"]:
+                add_metrics(audio_seconds=round(segment["end"] / segment["progress"], 2))
+            
+            transcript_file.seek(0)
+            transcript = transcript_file.read()
         
-        # Clean up transcript
-        cleaned_transcript = clean_transcript(transcript.strip())
+        if not transcript:
+            return None
         
-        return cleaned_transcript
+        # Capitalize first letter
+        return transcript[0].upper() + transcript[1:]
         
     except Exception as e:
         st.error(f"Error transcribing audio: {str(e)}")
         return None
 
-def clean_transcript(transcript):
+def _case_variants(filler):
+    """Spellings a filler is matched in: as given, lower, Capitalized and UPPER"""
+    return {filler, filler.lower(), filler[0].upper() + filler[1:].lower(), filler.upper()}
+
+def _alternation(strings):
+    """
+    Regex matching any of the strings, factored into a prefix tree
+
+    "um|uh" becomes "u(?:h|m)", so the engine tests one branch per
+    leading character instead of one per string.
+    """
+    tree = {}
+    for string in strings:
+        node = tree
+        for char in string:
+            node = node.setdefault(char, {})
+        node[""] = None
+
+    def emit(node):
+        branches = [re.escape(char) + emit(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        return f"(?:{body})?" if "" in node else body
+
+    return emit(tree)
+
+@lru_cache(maxsize=16)
+def compile_filler_pattern(fillers=FILLER_WORDS):
+    """
+    Compile a filler lexicon into one alternation
+    
+    Single words are removed wherever they stand, with the space before
+    them and a comma after them. Phrases such as "you know" are only
+    removed when set off by a comma ("I mean, it works", "it works, you
+    know."), so "you know what I mean" is left alone. Fillers match in
+    lower, Capitalized and UPPER case.
+    
+    The same pattern deletes the separators fillers leave behind: a space
+    before punctuation and a comma before a comma or other punctuation.
+    Because every match is a deletion, filler and separator cleanup take
+    a single pass.
+    
+    Every branch starts with a literal space or comma instead of \\b or
+    IGNORECASE, which lets the regex engine jump between candidate
+    positions instead of trying the alternation at every character. That
+    leading space or comma is also the left word boundary, and a filler
+    must not be followed by a letter, apostrophe or hyphen, so words such
+    as "like-minded" or "basically-free" are left alone. clean_transcript
+    normalizes whitespace to single spaces and prepends one so the first
+    word can match too.
+    
+    Args:
+        fillers (tuple): Filler words and phrases
+        
+    Returns:
+        re.Pattern: Pattern whose matches are deleted
+    """
+    words, phrases = set(), set()
+    for filler in fillers:
+        parts = filler.split()
+        if parts:
+            target = phrases if len(parts) > 1 else words
+            target.update(_case_variants(" ".join(parts)))
+    
+    alternatives = []
+    if phrases:
+        alternatives.append(rf" {_alternation(phrases)}(?![\w'-]) ?,")
+    if words:
+        alternatives.append(rf" {_alternation(words)}(?![\w'-])(?: ?,)?")
+    if words or phrases:
+        # A filler closing a sentence takes the comma before it along
+        alternatives.append(rf", ?{_alternation(words | phrases)}(?![\w'-])(?= ?(?:[.!?;:]|$))")
+    alternatives.append(r" (?=[,.!?;:])|,(?= ?[,.!?;:])")
+    return re.compile("|".join(alternatives))
+
+def clean_transcript(transcript, capitalize=True, fillers=None):
     """
     Clean and format the transcript
     
+    Whitespace is normalized to single spaces, then fillers and the
+    separators they leave behind are deleted in one pass of a precompiled
+    regex, so the cost is linear in the text length. Case is otherwise
+    preserved.
+    
     Args:
         transcript (str): Raw transcript text
+        capitalize (bool): Capitalize the first letter of the result
+        fillers (tuple): Filler lexicon (defaults to FILLER_WORDS)
         
     Returns:
         str: Cleaned transcript
     """
     try:
-        # Remove extra whitespace
-        cleaned = " ".join(transcript.split())
-        
-        # Remove common filler words and artifacts
-        filler_words = [
-            " um ", " uh ", " ah ", " er ", " like ",
-            " you know ", " I mean ", " basically ",
-            " actually ", " literally "
-        ]
-        
-        for filler in filler_words:
-            cleaned = cleaned.replace(filler, " ")
+        pattern = compile_filler_pattern(tuple(fillers) if fillers else FILLER_WORDS)
         
-        # Remove multiple spaces
-        while "  " in cleaned:
-            cleaned = cleaned.replace("  ", " ")
+        cleaned = pattern.sub("", " " + " ".join(transcript.split())).strip(" ,")
         
         # Capitalize first letter
-        cleaned = cleaned.strip().capitalize()
+        if capitalize and cleaned:
+            cleaned = cleaned[0].upper() + cleaned[1:]
         
         return cleaned
         
@@ -83,6 +334,22 @@ def clean_transcript(transcript):
         st.error(f"Error cleaning transcript: {str(e)}")
         return transcript
 
+def clean_segments(segments, fillers=None):
+    """
+    Clean segment text while keeping timestamps
+    
+    Args:
+        segments (iterable): Segment dicts with a "text" key
+        fillers (tuple): Filler lexicon (defaults to FILLER_WORDS)
+        
+    Yields:
+        dict: Segment copies with cleaned text (empty segments are dropped)
+    """
+    for segment in segments:
+        text = clean_transcript(segment["text"], capitalize=False, fillers=fillers)
+        if text:
+            yield {**segment, "text": text}
+
 def save_transcript(transcript, filename="transcript.txt"):
     """
     Save transcript to file
@@ -106,15 +373,22 @@ def save_transcript(transcript, filename="transcript.txt"):
         st.error(f"Error saving transcript: {str(e)}")
         return None
 
-def transcribe_with_timestamps(audio_path):
+def transcribe_with_timestamps(audio_path, compact=False, lazy=False):
     """
     Transcribe audio with timestamp information
     
+    Words are stored in a CompactTranscript as they are decoded. By
+    default it is returned as the plain dict of lists this function has
+    always returned.
+    
     Args:
-        audio_path (str): Path to audio file
+        audio_path (str or numpy.ndarray): Path to audio file or 16 kHz mono samples
+        compact (bool): Return the CompactTranscript itself
+        lazy (bool): Return segments as a read-only sequence whose dicts are
+            built on access (saves memory, but is not JSON-serializable)
         
     Returns:
-        dict: Transcription result with timestamps
+        dict or CompactTranscript: Transcription result with timestamps
     """
     try:
         model = load_whisper_model()
@@ -123,29 +397,9 @@ def transcribe_with_timestamps(audio_path):
         
         # Transcribe with word-level timestamps
         segments, info = model.transcribe(audio_path, word_timestamps=True)
+        transcript = CompactTranscript.from_segments(segments, info.language, info.language_probability)
         
-        # Convert to dict format similar to original whisper
-        result = {
-            "segments": [
-                {
-                    "start": segment.start,
-                    "end": segment.end,
-                    "text": segment.text,
-                    "words": [
-                        {
-                            "start": word.start,
-                            "end": word.end,
-                            "word": word.word,
-                            "probability": word.probability
-                        } for word in segment.words
-                    ] if hasattr(segment, 'words') and segment.words else []
-                } for segment in segments
-            ],
-            "language": info.language,
-            "language_probability": info.language_probability
-        }
-        
-        return result
+        return transcript if compact else transcript.to_dict(lazy=lazy)
         
     except Exception as e:
         st.error(f"Error transcribing with timestamps: {str(e)}")
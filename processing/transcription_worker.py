@@ -0,0 +1,288 @@
+"""
+Standalone transcription worker that keeps Whisper models warm
+
+Usage:
+    python -m processing.transcription_worker --models 2 --port 8766
+
+Point the app at it with TRANSCRIBE_WORKER_ADDRESS=127.0.0.1:8766.
+Worker and app must share a secret in TRANSCRIBE_WORKER_AUTHKEY (e.g.
+from `python -c "import secrets; print(secrets.token_hex(32))"`); the
+worker refuses to start without one, since clients exchange pickles.
+Jobs from all clients share one queue that is served round-robin per
+client, so one user's batch cannot starve another user's single video.
+Each model thread keeps a small LRU of Whisper models so jobs can use
+the profile their client chose (or one picked from this queue's depth).
+"""
+import os
+import argparse
+import threading
+from collections import OrderedDict, deque
+from multiprocessing.connection import Client, Listener
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from utils.metrics import add_metrics
+
+# host:port of a running worker; transcription stays in-process when unset
+WORKER_ADDRESS = os.environ.get("TRANSCRIBE_WORKER_ADDRESS", "")
+
+# Shared secret for worker connections; there is deliberately no default
+WORKER_AUTHKEY = os.environ.get("TRANSCRIBE_WORKER_AUTHKEY", "").encode('utf-8')
+
+# Shortest secret accepted
+MIN_AUTHKEY_BYTES = 16
+
+class WorkerUnavailable(Exception):
+    """Raised when the transcription worker cannot be reached"""
+
+def _parse_address(address):
+    """Split host:port into a Listener/Client address tuple"""
+    host, port = address.rsplit(":", 1)
+    return host, int(port)
+
+class FairQueue:
+    """Job queue served round-robin across clients, FIFO within a client"""
+
+    # Clients whose last turn is remembered for ordering
+    MAX_REMEMBERED_CLIENTS = 1000
+
+    def __init__(self):
+        self._clients = OrderedDict()
+        self._last_served = OrderedDict()
+        self._turn = 0
+        self._condition = threading.Condition()
+        self._depth = 0
+
+    def put(self, client_id, job):
+        """Queue a job and return how many jobs are now waiting"""
+        with self._condition:
+            self._clients.setdefault(client_id, deque()).append(job)
+            self._depth += 1
+            self._condition.notify()
+            return self._depth
+
+    def get(self):
+        """Block until a job is available and return the next one in turn"""
+        with self._condition:
+            while not self._depth:
+                self._condition.wait()
+
+            # The waiting client served longest ago (or never) goes next
+            client_id = min(self._clients, key=lambda client: self._last_served.get(client, 0))
+            jobs = self._clients[client_id]
+            job = jobs.popleft()
+            if not jobs:
+                del self._clients[client_id]
+            self._depth -= 1
+
+            self._turn += 1
+            self._last_served.pop(client_id, None)
+            self._last_served[client_id] = self._turn
+            if len(self._last_served) > self.MAX_REMEMBERED_CLIENTS:
+                self._last_served.popitem(last=False)
+            return job
+
+    def depth(self):
+        """Number of jobs waiting"""
+        with self._condition:
+            return self._depth
+
+    def clients(self):
+        """Number of clients with jobs waiting"""
+        with self._condition:
+            return len(self._clients)
+
+class TranscriptionWorker:
+    """Serve transcription jobs from a pool of warm models"""
+
+    def __init__(self, models=1, cpu_threads=0):
+        self.queue = FairQueue()
+        self.models = models
+        self.cpu_threads = cpu_threads
+        self.active = 0
+        self.completed = 0
+        self.lock = threading.Lock()
+
+    def start_models(self):
+        """Warm up the default model and start one serving thread per model slot"""
+        from processing.whisper_policy import ModelCache, default_profile
+
+        for index in range(self.models):
+            models = ModelCache(cpu_threads=self.cpu_threads)
+            models.get(default_profile())
+            threading.Thread(
+                target=self._serve_jobs, args=(models,), name=f"model-{index}", daemon=True
+            ).start()
+
+    def status(self):
+        """Queue depth and model usage"""
+        with self.lock:
+            active, completed = self.active, self.completed
+        return {
+            'queue_depth': self.queue.depth(),
+            'waiting_clients': self.queue.clients(),
+            'active_jobs': active,
+            'completed_jobs': completed,
+            'models': self.models
+        }
+
+    def _serve_jobs(self, models):
+        """Transcribe queued jobs one at a time with this slot's models"""
+        from processing.transcribe import iter_segments
+        from utils.metrics import collect_metrics
+        from processing.whisper_policy import WhisperProfile, audio_duration, select_profile
+
+        while True:
+            conn, audio, profile = self.queue.get()
+            with self.lock:
+                self.active += 1
+            try:
+                if profile:
+                    profile = WhisperProfile(**profile)
+                else:
+                    profile = select_profile(audio_duration(audio), queue_depth=self.queue.depth())
+                model = models.get(profile)
+                conn.send({'type': "profile", 'profile': profile.name})
+                with collect_metrics() as metrics:
+                    for segment in iter_segments(model, audio, profile=profile):
+                        conn.send({'type': "segment", 'segment': segment})
+                # VAD and language details belong on the client's transcribe record
+                conn.send({'type': "metrics", 'metrics': metrics})
+                conn.send({'type': "done"})
+            except (EOFError, OSError):
+                # Client went away; drop the rest of its job
+                pass
+            except Exception as e:
+                try:
+                    conn.send({'type': "error", 'error': str(e)})
+                except (EOFError, OSError):
+                    pass
+            finally:
+                conn.close()
+                with self.lock:
+                    self.active -= 1
+                    self.completed += 1
+
+    def _handle(self, conn):
+        """Read one request from a client connection"""
+        try:
+            request = conn.recv()
+        except (EOFError, OSError):
+            conn.close()
+            return
+
+        if request.get('op') == "status":
+            conn.send(self.status())
+            conn.close()
+        elif request.get('op') == "transcribe":
+            # Reply before queueing: a serving thread may finish and close conn right away
+            conn.send({'type': "queued", 'position': self.queue.depth() + 1})
+            self.queue.put(request.get('client_id'), (conn, request['audio'], request.get('profile')))
+        else:
+            conn.send({'type': "error", 'error': f"unknown op {request.get('op')!r}"})
+            conn.close()
+
+    def serve(self, address):
+        """
+        Accept client connections until interrupted
+
+        Raises:
+            ValueError: TRANSCRIBE_WORKER_AUTHKEY is unset or too short
+        """
+        if len(WORKER_AUTHKEY) < MIN_AUTHKEY_BYTES:
+            raise ValueError(
+                f"TRANSCRIBE_WORKER_AUTHKEY must be set to a secret of at least {MIN_AUTHKEY_BYTES} bytes"
+            )
+        with Listener(_parse_address(address), authkey=WORKER_AUTHKEY) as listener:
+            print(f"Transcription worker listening on {address} with {self.models} models")
+            while True:
+                conn = listener.accept()
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+def _connect(address):
+    """Open an authenticated connection to the worker"""
+    if not WORKER_AUTHKEY:
+        raise WorkerUnavailable(f"{address}: TRANSCRIBE_WORKER_AUTHKEY is not set")
+    try:
+        return Client(_parse_address(address), authkey=WORKER_AUTHKEY)
+    except (OSError, ValueError) as e:
+        raise WorkerUnavailable(f"{address}: {str(e)}") from e
+
+def _default_client_id():
+    """Use the Streamlit session as the client, or this process outside the app"""
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return ctx.session_id if ctx else f"pid-{os.getpid()}"
+
+def stream_transcript_remote(audio_path, address=None, client_id=None, profile=None):
+    """
+    Transcribe through the worker and yield segments as they arrive
+
+    Args:
+        audio_path (str or numpy.ndarray): Path to audio file or 16 kHz mono samples
+        address (str): Worker host:port (defaults to WORKER_ADDRESS)
+        client_id (str): Identifies the caller for fair scheduling
+            (defaults to the Streamlit session)
+        profile (WhisperProfile): Model and decoding settings (the worker
+            chooses from its own queue when omitted)
+
+    Yields:
+        dict: Segment with start, end, text and progress (0.0-1.0)
+    """
+    if isinstance(audio_path, str):
+        # The worker may run from a different directory
+        audio_path = os.path.abspath(audio_path)
+
+    conn = _connect(address or WORKER_ADDRESS)
+    with conn:
+        conn.send({
+            'op': "transcribe",
+            'audio': audio_path,
+            'client_id': client_id or _default_client_id(),
+            'profile': profile._asdict() if profile else None
+        })
+        while True:
+            message = conn.recv()
+            if message['type'] == "segment":
+                yield message['segment']
+            elif message['type'] == "metrics":
+                add_metrics(**message['metrics'])
+            elif message['type'] == "done":
+                return
+            elif message['type'] == "error":
+                raise RuntimeError(message['error'])
+
+def get_worker_status(address=None):
+    """
+    Ask the worker for its queue depth and model usage
+
+    Args:
+        address (str): Worker host:port (defaults to WORKER_ADDRESS)
+
+    Returns:
+        dict: Status or None if no worker is reachable
+    """
+    address = address or WORKER_ADDRESS
+    if not address:
+        return None
+    try:
+        with _connect(address) as conn:
+            conn.send({'op': "status"})
+            return conn.recv()
+    except (WorkerUnavailable, EOFError, OSError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local transcription worker")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--models", type=int, default=1, help="Warm models serving jobs in parallel")
+    parser.add_argument("--threads", type=int, default=0, help="CPU threads per model (0 lets CTranslate2 decide)")
+    args = parser.parse_args()
+
+    if len(WORKER_AUTHKEY) < MIN_AUTHKEY_BYTES:
+        parser.error(f"set TRANSCRIBE_WORKER_AUTHKEY to a secret of at least {MIN_AUTHKEY_BYTES} bytes")
+
+    worker = TranscriptionWorker(models=args.models, cpu_threads=args.threads)
+    worker.start_models()
+    worker.serve(f"{args.host}:{args.port}")
+
+if __name__ == "__main__":
+    main()
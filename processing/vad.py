@@ -0,0 +1,116 @@
+import os
+from bisect import bisect_left, bisect_right
+import numpy as np
+from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+SAMPLE_RATE = 16000
+
+# Set TRANSCRIBE_VAD=0 to send the full audio to Whisper
+VAD_ENABLED = os.environ.get("TRANSCRIBE_VAD", "1") == "1"
+
+# Silences shorter than this are kept as they are
+VAD_MIN_SILENCE_MS = int(os.environ.get("TRANSCRIBE_VAD_MIN_SILENCE_MS", "1000"))
+
+# Audio kept on each side of a speech region so word edges aren't clipped
+VAD_SPEECH_PAD_MS = int(os.environ.get("TRANSCRIBE_VAD_SPEECH_PAD_MS", "300"))
+
+class OffsetMap:
+    """Maps times in trimmed audio back to the original recording"""
+
+    def __init__(self, regions, total_samples, sample_rate=SAMPLE_RATE):
+        """
+        Args:
+            regions (list): Kept (start, end) sample ranges of the original, in order
+            total_samples (int): Length of the original audio
+            sample_rate (int): Samples per second
+        """
+        self.regions = regions
+        self.sample_rate = sample_rate
+        self.total_samples = total_samples
+        self.trimmed_starts = []
+        position = 0
+        for start, end in regions:
+            self.trimmed_starts.append(position)
+            position += end - start
+        self.kept_samples = position
+
+    @classmethod
+    def identity(cls, total_samples, sample_rate=SAMPLE_RATE):
+        """Map for audio that was not trimmed"""
+        return cls([(0, total_samples)], total_samples, sample_rate)
+
+    @property
+    def original_seconds(self):
+        return self.total_samples / self.sample_rate
+
+    @property
+    def kept_seconds(self):
+        return self.kept_samples / self.sample_rate
+
+    @property
+    def skipped_seconds(self):
+        return self.original_seconds - self.kept_seconds
+
+    def joins(self):
+        """Sample offsets in the trimmed audio where dropped silence used to be"""
+        return self.trimmed_starts[1:]
+
+    def to_original(self, seconds, is_end=False):
+        """
+        Convert a time in the trimmed audio to the original recording
+
+        A time exactly on a join belongs to both neighbouring regions: a
+        start maps to the beginning of the later one and an end to the
+        finish of the earlier one, so no segment spans removed silence.
+
+        Args:
+            seconds (float): Time in the trimmed audio
+            is_end (bool): The time ends a segment or word
+
+        Returns:
+            float: Time in the original audio
+        """
+        if not self.regions:
+            return seconds
+        sample = seconds * self.sample_rate
+        find = bisect_left if is_end else bisect_right
+        index = max(find(self.trimmed_starts, sample) - 1, 0)
+        start, end = self.regions[index]
+        original = start + min(sample - self.trimmed_starts[index], end - start)
+        return original / self.sample_rate
+
+def trim_silence(audio, min_silence_ms=None, speech_pad_ms=None):
+    """
+    Drop long non-speech spans (silence, music intros, dead air)
+
+    Speech regions found by Silero VAD are padded and concatenated.
+    Audio with no detected speech is returned untouched, since it may
+    still hold something Whisper can transcribe (e.g. lyrics).
+
+    Args:
+        audio (numpy.ndarray): 16 kHz mono samples
+        min_silence_ms (int): Shortest silence to drop (defaults to VAD_MIN_SILENCE_MS)
+        speech_pad_ms (int): Padding kept around speech (defaults to VAD_SPEECH_PAD_MS)
+
+    Returns:
+        tuple: (trimmed samples, OffsetMap)
+    """
+    options = VadOptions(
+        min_silence_duration_ms=VAD_MIN_SILENCE_MS if min_silence_ms is None else min_silence_ms,
+        speech_pad_ms=VAD_SPEECH_PAD_MS if speech_pad_ms is None else speech_pad_ms
+    )
+    speech = get_speech_timestamps(audio, options)
+    if not speech:
+        return audio, OffsetMap.identity(len(audio))
+
+    # Padding can make neighbouring regions overlap; merge them
+    regions = []
+    for region in speech:
+        start, end = max(region["start"], 0), min(region["end"], len(audio))
+        if regions and start <= regions[-1][1]:
+            regions[-1] = (regions[-1][0], max(regions[-1][1], end))
+        else:
+            regions.append((start, end))
+
+    trimmed = np.concatenate([audio[start:end] for start, end in regions])
+    return trimmed, OffsetMap(regions, len(audio))
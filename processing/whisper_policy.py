@@ -0,0 +1,252 @@
+import os
+import threading
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+from statistics import median
+import numpy as np
+from faster_whisper import WhisperModel
+from utils.metrics import read_metrics
+
+SAMPLE_RATE = 16000
+
+WHISPER_COMPUTE_TYPE = os.environ.get("WHISPER_COMPUTE_TYPE", "int8")
+
+# "auto" lets the policy choose; a profile name pins every job to it
+WHISPER_PROFILE = os.environ.get("WHISPER_PROFILE", "auto")
+
+# Spoken language when known (e.g. "en"); empty lets Whisper detect it
+WHISPER_LANGUAGE = os.environ.get("WHISPER_LANGUAGE", "")
+
+# Audio up to this long may move to a more accurate profile when
+# WHISPER_TARGET_LATENCY leaves room for it
+WHISPER_SHORT_MINUTES = float(os.environ.get("WHISPER_SHORT_MINUTES", "10"))
+
+# Audio longer than this starts from a greedy profile
+WHISPER_LONG_MINUTES = float(os.environ.get("WHISPER_LONG_MINUTES", "90"))
+
+# Every this many waiting jobs moves the choice one profile faster
+WHISPER_QUEUE_STEP = int(os.environ.get("WHISPER_QUEUE_STEP", "2"))
+
+# Seconds a transcription should finish within, queue wait included (0 for no target)
+WHISPER_TARGET_LATENCY = float(os.environ.get("WHISPER_TARGET_LATENCY", "0"))
+
+# Loaded models kept per cache; older ones are released
+WHISPER_MODEL_CACHE = int(os.environ.get("WHISPER_MODEL_CACHE", "2"))
+
+# CTranslate2 threads for cached models (0 lets it decide). Threads are fixed
+# when a model loads, so they are set per cache rather than per job.
+WHISPER_CPU_THREADS = int(os.environ.get("WHISPER_CPU_THREADS", "0"))
+
+WhisperProfile = namedtuple("WhisperProfile", "name model compute_type beam_size cpu_threads language")
+
+# From most accurate to fastest. Real-time factors are rough single-job CPU
+# figures used until the metrics log has measurements for a profile.
+PROFILES = OrderedDict([
+    ('accurate', {'model': "small", 'beam_size': 5, 'realtime_factor': 0.6}),
+    ('balanced', {'model': "base", 'beam_size': 5, 'realtime_factor': 0.25}),
+    ('fast', {'model': "base", 'beam_size': 1, 'realtime_factor': 0.12}),
+    ('fastest', {'model': "tiny", 'beam_size': 1, 'realtime_factor': 0.06}),
+])
+
+# Profile used when nothing is known about the job
+DEFAULT_PROFILE = "balanced"
+
+# Models with an English-only variant, which is faster to get right on English
+ENGLISH_ONLY_MODELS = ("tiny", "base", "small", "medium")
+
+_active = 0
+_active_lock = threading.Lock()
+
+def make_profile(name, language=None, cpu_threads=0):
+    """
+    Build a profile from the PROFILES table
+
+    Args:
+        name (str): Profile name
+        language (str): Spoken language, if known
+        cpu_threads (int): CTranslate2 threads (0 lets it decide)
+
+    Returns:
+        WhisperProfile: Profile settings
+    """
+    settings = PROFILES[name]
+    model = settings['model']
+    if language == "en" and model in ENGLISH_ONLY_MODELS:
+        model += ".en"
+    return WhisperProfile(name, model, WHISPER_COMPUTE_TYPE, settings['beam_size'], cpu_threads, language or None)
+
+def default_profile():
+    """Profile for jobs the policy has no information about"""
+    name = WHISPER_PROFILE if WHISPER_PROFILE in PROFILES else DEFAULT_PROFILE
+    return make_profile(name, WHISPER_LANGUAGE)
+
+def audio_duration(audio):
+    """
+    Length of audio in seconds without decoding it
+
+    Args:
+        audio (str or numpy.ndarray): Path to audio file or 16 kHz mono samples
+
+    Returns:
+        float: Duration or None if unknown
+    """
+    if isinstance(audio, np.ndarray):
+        return len(audio) / SAMPLE_RATE
+    try:
+        import av
+        with av.open(audio) as container:
+            if container.duration:
+                return container.duration / av.time_base
+    except Exception:
+        pass
+    return None
+
+def observed_realtime_factors(limit=200):
+    """
+    Median measured real-time factor per profile from recent transcribe records
+
+    Returns:
+        dict: Profile name -> real-time factor
+    """
+    samples = {}
+    for record in read_metrics(limit=limit, stage_name="transcribe"):
+        if record.get('status') == "ok" and record.get('realtime_factor') and record.get('whisper_profile'):
+            samples.setdefault(record['whisper_profile'], []).append(record['realtime_factor'])
+    return {name: median(factors) for name, factors in samples.items()}
+
+def select_profile(duration=None, language=None, queue_depth=0, target_latency=None):
+    """
+    Choose model size and decoding for one transcription
+
+    Audio gets the default profile and very long audio a greedy one.
+    Each WHISPER_QUEUE_STEP waiting jobs moves one profile faster. With
+    a target latency, the choice keeps moving faster until the estimated
+    finish time (queue included) fits the target, and short audio moves
+    to more accurate profiles as long as they still fit it.
+
+    Args:
+        duration (float): Audio length in seconds, if known
+        language (str): Spoken language, if known (defaults to WHISPER_LANGUAGE)
+        queue_depth (int): Jobs waiting for transcription besides this one
+        target_latency (float): Seconds to finish within (defaults to WHISPER_TARGET_LATENCY)
+
+    Returns:
+        WhisperProfile: Chosen profile
+    """
+    language = language or WHISPER_LANGUAGE
+    if WHISPER_PROFILE in PROFILES:
+        return make_profile(WHISPER_PROFILE, language)
+
+    names = list(PROFILES)
+    if duration is not None and duration > WHISPER_LONG_MINUTES * 60:
+        index = names.index("fast")
+    else:
+        index = names.index(DEFAULT_PROFILE)
+
+    if WHISPER_QUEUE_STEP > 0:
+        index += queue_depth // WHISPER_QUEUE_STEP
+    index = min(index, len(names) - 1)
+
+    target_latency = WHISPER_TARGET_LATENCY if target_latency is None else target_latency
+    if target_latency and duration:
+        # Waiting jobs are assumed to be about as long as this one
+        factors = {name: settings['realtime_factor'] for name, settings in PROFILES.items()}
+        factors.update(observed_realtime_factors())
+
+        def estimate(name):
+            return duration * factors[name] * (queue_depth + 1)
+
+        while index < len(names) - 1 and estimate(names[index]) > target_latency:
+            index += 1
+        if duration <= WHISPER_SHORT_MINUTES * 60:
+            while index > 0 and estimate(names[index - 1]) <= target_latency:
+                index -= 1
+
+    return make_profile(names[index], language)
+
+def cached_profiles(language=None):
+    """
+    Every profile a stored transcript may have been made with, most accurate first
+
+    Args:
+        language (str): Spoken language, if known (defaults to WHISPER_LANGUAGE)
+
+    Returns:
+        list: WhisperProfile per profile
+    """
+    return [make_profile(name, language or WHISPER_LANGUAGE) for name in PROFILES]
+
+@contextmanager
+def track_transcription():
+    """Count a running in-process transcription for active_transcriptions"""
+    global _active
+    with _active_lock:
+        _active += 1
+    try:
+        yield
+    finally:
+        with _active_lock:
+            _active -= 1
+
+def active_transcriptions():
+    """Number of transcriptions running in this process"""
+    with _active_lock:
+        return _active
+
+def create_model(profile):
+    """
+    Load the Whisper model a profile asks for
+
+    Args:
+        profile (WhisperProfile): Profile settings
+
+    Returns:
+        WhisperModel: Loaded model
+    """
+    return WhisperModel(
+        profile.model, device="cpu", compute_type=profile.compute_type, cpu_threads=profile.cpu_threads
+    )
+
+class ModelCache:
+    """
+    Least recently used Whisper models, keyed by model and compute type
+
+    Every model in a cache loads with the cache's thread count, whatever
+    the profile asks for, so a change in load never reloads a model.
+    """
+
+    def __init__(self, size=None, cpu_threads=None):
+        self.size = max(1, WHISPER_MODEL_CACHE if size is None else size)
+        self.cpu_threads = WHISPER_CPU_THREADS if cpu_threads is None else cpu_threads
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, profile):
+        """
+        Return a loaded model for a profile, loading it on a miss
+
+        Evicted models are freed once the jobs still using them finish.
+
+        Args:
+            profile (WhisperProfile): Profile settings
+
+        Returns:
+            WhisperModel: Loaded model
+        """
+        key = (profile.model, profile.compute_type)
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                return self._models[key]
+
+            # Loads are rare and serialized so two jobs never load the same model twice
+            model = create_model(profile._replace(cpu_threads=self.cpu_threads))
+            self._models[key] = model
+            while len(self._models) > self.size:
+                self._models.popitem(last=False)
+            return model
+
+    def loaded(self):
+        """Keys of the loaded models, least recently used first"""
+        with self._lock:
+            return list(self._models)
@@ -0,0 +1,44 @@
+import pytest
+from processing.transcribe import clean_transcript, clean_segments
+
+@pytest.mark.parametrize("text, expected", [
+    ("um so we start", "So we start"),
+    ("Hello world  , um , there", "Hello world, there"),
+    ("I mean, it works", "It works"),
+    ("it works, you know.", "It works."),
+    ("it works, um.", "It works."),
+    ("you know what I mean.", "You know what I mean."),
+    ("so um, LIKE, yes , , no ,.", "So yes, no."),
+    ("1,000 people um.", "1,000 people."),
+    ("keep the NASA acronym", "Keep the NASA acronym"),
+])
+def test_removes_fillers_and_their_separators(text, expected):
+    assert clean_transcript(text) == expected
+
+@pytest.mark.parametrize("text, expected", [
+    ("we are very like-minded people", "We are very like-minded people"),
+    ("an er-rated film", "An er-rated film"),
+    ("basically-free stuff", "Basically-free stuff"),
+    ("a self-um test", "A self-um test"),
+    ("umbrella likes uh's", "Umbrella likes uh's"),
+])
+def test_keeps_words_that_contain_fillers(text, expected):
+    assert clean_transcript(text) == expected
+
+@pytest.mark.parametrize("text, expected", [
+    ("uh... okay", "... okay"),
+    ("so uh... okay", "So... okay"),
+    ("so, ... okay", "So... okay"),
+])
+def test_ellipsis(text, expected):
+    assert clean_transcript(text) == expected
+
+def test_collapses_all_whitespace():
+    assert clean_transcript("hello\n\nworld\tum  there ") == "Hello world there"
+
+def test_custom_lexicon():
+    assert clean_transcript("so like, right, we go", fillers=("right",)) == "So like, we go"
+
+def test_clean_segments_keeps_timestamps_and_drops_empty():
+    segments = [{'start': 0.0, 'end': 1.0, 'text': " um"}, {'start': 1.0, 'end': 2.5, 'text': " uh, hello"}]
+    assert list(clean_segments(segments)) == [{'start': 1.0, 'end': 2.5, 'text': "hello"}]
@@ -0,0 +1,123 @@
+import time
+import httpx
+import pytest
+from google import genai
+from google.genai import types
+from benchmarks.fakes import StubGeminiServer
+from processing import gemini_client
+from processing.gemini_client import (
+    RetryBudget, TokenBucket, GeminiRateLimitError, GeminiUnavailableError,
+    GeminiRequestError, GeminiDeadlineError, call_gemini, stream_gemini
+)
+
+@pytest.fixture
+def stub(monkeypatch):
+    """Stub server with fast backoff, no rate limits and a fresh retry budget"""
+    monkeypatch.setattr(gemini_client, "BACKOFF_BASE", 0.01)
+    monkeypatch.setattr(gemini_client, "BACKOFF_MAX", 1.0)
+    monkeypatch.setattr(gemini_client, "GEMINI_MAX_ATTEMPTS", 4)
+    monkeypatch.setattr(gemini_client, "_request_bucket", None)
+    monkeypatch.setattr(gemini_client, "_token_bucket", None)
+    monkeypatch.setattr(gemini_client, "_retry_budget", RetryBudget(0.2, 10))
+    with StubGeminiServer(latency=0) as server:
+        server.client = genai.Client(api_key="test", http_options=types.HttpOptions(base_url=server.base_url))
+        yield server
+
+def test_retries_throttling_and_server_errors(stub):
+    stub.inject(429, 503)
+    response = call_gemini("Write a summary", client=stub.client)
+    assert response.text
+    assert stub.requests == 3
+
+def test_stops_after_max_attempts(stub):
+    stub.inject(*[503] * 10)
+    with pytest.raises(GeminiUnavailableError):
+        call_gemini("Write a summary", client=stub.client)
+    assert stub.requests == 4
+
+def test_persistent_throttling_raises_rate_limit_error(stub):
+    stub.inject(*[429] * 10)
+    with pytest.raises(GeminiRateLimitError):
+        call_gemini("Write a summary", client=stub.client)
+    assert stub.requests == 4
+
+def test_rejected_request_is_not_retried(stub):
+    stub.inject(400)
+    with pytest.raises(GeminiRequestError):
+        call_gemini("Write a summary", client=stub.client)
+    assert stub.requests == 1
+
+def test_honours_retry_after(stub):
+    stub.inject((429, 0.5))
+    started = time.monotonic()
+    call_gemini("Write a summary", client=stub.client)
+    assert time.monotonic() - started >= 0.5
+    assert stub.requests == 2
+
+def test_backoff_uses_full_jitter_within_cap(monkeypatch):
+    monkeypatch.setattr(gemini_client, "BACKOFF_BASE", 1.0)
+    monkeypatch.setattr(gemini_client, "BACKOFF_MAX", 8.0)
+    for attempt in range(1, 8):
+        delays = [gemini_client._backoff(attempt, Exception()) for _ in range(200)]
+        cap = min(8.0, 2 ** (attempt - 1))
+        assert all(0 <= delay <= cap for delay in delays)
+        assert max(delays) > cap / 2 and min(delays) < cap / 2
+
+def test_backoff_takes_retry_after_up_to_the_cap(monkeypatch):
+    monkeypatch.setattr(gemini_client, "BACKOFF_MAX", 8.0)
+    error = type("Throttled", (Exception,), {})()
+    error.response = httpx.Response(429, headers={'Retry-After': "5"})
+    assert 5 <= gemini_client._backoff(1, error) <= 8
+    error.response = httpx.Response(429, headers={'Retry-After': "60"})
+    assert gemini_client._backoff(1, error) <= 8
+
+def test_retry_budget_caps_retries(stub, monkeypatch):
+    monkeypatch.setattr(gemini_client, "_retry_budget", RetryBudget(0, 1))
+    stub.inject(*[503] * 10)
+    with pytest.raises(GeminiUnavailableError):
+        call_gemini("Write a summary", client=stub.client)
+    # One retry from the reserve, then the budget is exhausted
+    assert stub.requests == 2
+    with pytest.raises(GeminiUnavailableError):
+        call_gemini("Write a summary", client=stub.client)
+    assert stub.requests == 3
+
+def test_retry_budget_refills_per_request():
+    budget = RetryBudget(0.5, 0)
+    assert not budget.withdraw()
+    budget.deposit()
+    budget.deposit()
+    assert budget.withdraw()
+    assert not budget.withdraw()
+
+def test_deadline_skips_retry_that_cannot_finish(stub):
+    stub.inject((503, 5))
+    started = time.monotonic()
+    with pytest.raises(GeminiUnavailableError):
+        call_gemini("Write a summary", client=stub.client, deadline=time.monotonic() + 1)
+    assert time.monotonic() - started < 1
+    assert stub.requests == 1
+
+def test_deadline_cuts_off_slow_request(stub):
+    stub.latency = 3
+    started = time.monotonic()
+    with pytest.raises((GeminiDeadlineError, GeminiUnavailableError)):
+        call_gemini("Write a summary", client=stub.client, deadline=time.monotonic() + 0.5)
+    assert time.monotonic() - started < 1.5
+
+def test_passed_deadline_sends_nothing(stub):
+    with pytest.raises(GeminiDeadlineError):
+        call_gemini("Write a summary", client=stub.client, deadline=time.monotonic() - 1)
+    assert stub.requests == 0
+
+def test_stream_retries_before_first_chunk(stub):
+    stub.inject(429)
+    assert "".join(stream_gemini("Write a summary", client=stub.client)).strip()
+    assert stub.requests == 2
+
+def test_token_bucket_waits_for_refill():
+    bucket = TokenBucket(rate=20, capacity=1)
+    started = time.monotonic()
+    bucket.acquire()
+    bucket.acquire()
+    assert time.monotonic() - started >= 0.04
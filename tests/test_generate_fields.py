@@ -0,0 +1,64 @@
+import time
+import pytest
+from google import genai
+from google.genai import types
+from benchmarks.fakes import StubGeminiServer
+from processing import gemini_client
+from processing.gemini_client import RetryBudget
+from processing.summarize_and_generate import generate_fields, generate_content
+
+TRANSCRIPT = "Today we build a small model and test it on real data."
+
+@pytest.fixture
+def make_stub(monkeypatch):
+    """Start stub servers wired up as the shared Gemini client, without rate limits"""
+    monkeypatch.setattr(gemini_client, "BACKOFF_BASE", 0.01)
+    monkeypatch.setattr(gemini_client, "_request_bucket", None)
+    monkeypatch.setattr(gemini_client, "_token_bucket", None)
+    monkeypatch.setattr(gemini_client, "_retry_budget", RetryBudget(0.2, 10))
+    servers = []
+
+    def start(**kwargs):
+        server = StubGeminiServer(**kwargs).__enter__()
+        servers.append(server)
+        server.client = genai.Client(api_key="test", http_options=types.HttpOptions(base_url=server.base_url))
+        monkeypatch.setattr(gemini_client, "_client", server.client)
+        return server
+
+    yield start
+    for server in servers:
+        server.__exit__(None, None, None)
+
+def test_fields_are_requested_concurrently(make_stub):
+    stub = make_stub(latency=0.4)
+    started = time.monotonic()
+    content = generate_fields(TRANSCRIPT, ['summary', 'hashtags', 'titles'], stub.client, timeout=10)
+    elapsed = time.monotonic() - started
+
+    assert set(content) == {'summary', 'hashtags', 'titles'}
+    assert len(stub.calls) == 3
+    # Every call started before any of them finished
+    assert max(start for _, start, _ in stub.calls) < min(end for _, _, end in stub.calls)
+    assert elapsed < 1.0
+
+def test_timed_out_field_is_dropped(make_stub):
+    stub = make_stub(latency=0, delays={'hashtag': 3})
+    started = time.monotonic()
+    content = generate_fields(TRANSCRIPT, ['summary', 'hashtags', 'titles'], stub.client, timeout=0.5)
+
+    assert time.monotonic() - started < 1.5
+    assert set(content) == {'summary', 'titles'}
+    assert content['titles'] == ["Stub title", "Another stub title"]
+
+def test_failed_field_is_dropped(make_stub):
+    stub = make_stub(latency=0, failing={'title': 400})
+    content = generate_fields(TRANSCRIPT, ['summary', 'hashtags', 'titles'], stub.client, timeout=5)
+
+    assert set(content) == {'summary', 'hashtags'}
+    assert content['summary'] == "Stub summary of the transcript."
+
+def test_generate_content_returns_partial_results(make_stub):
+    make_stub(latency=0, delays={'hashtag': 3}, failing={'title': 503})
+    content = generate_content(TRANSCRIPT, timeout=0.5, mode="separate")
+
+    assert set(content) == {'summary'}
@@ -0,0 +1,225 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import sqlite3
+from contextlib import closing
+import streamlit as st
+
+CACHE_DIR = os.environ.get("CACHE_DIR", "cache")
+
+# Total bytes kept across all layers before least recently used entries are evicted
+CACHE_MAX_BYTES = int(os.environ.get("CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+
+AUDIO_LAYER = "audio"
+TRANSCRIPT_LAYER = "transcript"
+CONTENT_LAYER = "content"
+
+def _connect():
+    """Open the cache index, creating it on first use"""
+    os.makedirs(os.path.join(CACHE_DIR, AUDIO_LAYER), exist_ok=True)
+    conn = sqlite3.connect(os.path.join(CACHE_DIR, "index.sqlite"), timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS entries (
+            key TEXT PRIMARY KEY,
+            layer TEXT NOT NULL,
+            video_id TEXT NOT NULL,
+            path TEXT,
+            data TEXT,
+            size INTEGER NOT NULL,
+            last_access REAL NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries (last_access)")
+    return conn
+
+def make_key(layer, video_id, *parts):
+    """
+    Build a content-addressed cache key
+
+    Args:
+        layer (str): Cache layer name
+        video_id (str): YouTube video ID
+        *parts: Settings the cached value depends on
+
+    Returns:
+        str: Hex digest identifying the entry
+    """
+    raw = "\x1f".join([layer, video_id] + [str(part) for part in parts])
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+def _get(key):
+    """Return the cached row for key and mark it as recently used"""
+    with closing(_connect()) as conn, conn:
+        row = conn.execute(
+            "SELECT path, data FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row:
+            conn.execute(
+                "UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key)
+            )
+    return row
+
+def _put(key, layer, video_id, size, path=None, data=None):
+    """Insert or replace an entry, then evict down to CACHE_MAX_BYTES"""
+    with closing(_connect()) as conn, conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, layer, video_id, path, data, size, time.time())
+        )
+    evict()
+
+def evict(max_bytes=None):
+    """
+    Evict least recently used entries until the cache fits in max_bytes
+
+    Args:
+        max_bytes (int): Size budget (defaults to CACHE_MAX_BYTES)
+    """
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    try:
+        with closing(_connect()) as conn, conn:
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total <= max_bytes:
+                return
+
+            rows = conn.execute(
+                "SELECT key, path, size FROM entries ORDER BY last_access"
+            ).fetchall()
+            for key, path, size in rows:
+                if total <= max_bytes:
+                    break
+                if path and os.path.exists(path):
+                    os.remove(path)
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                total -= size
+    except Exception as e:
+        st.error(f"Error evicting cache entries: {str(e)}")
+
+def get_cached_audio(video_id):
+    """
+    Look up cached audio for a video
+
+    Args:
+        video_id (str): YouTube video ID
+
+    Returns:
+        str: Path to the cached audio file or None
+    """
+    try:
+        row = _get(make_key(AUDIO_LAYER, video_id))
+        if row and row[0] and os.path.exists(row[0]):
+            return row[0]
+        return None
+    except Exception as e:
+        st.error(f"Error reading audio cache: {str(e)}")
+        return None
+
+def cache_audio(video_id, audio_path):
+    """
+    Move an extracted audio file into the cache
+
+    Args:
+        video_id (str): YouTube video ID
+        audio_path (str): Path to the extracted audio file
+
+    Returns:
+        str: Path to the cached copy (or audio_path if caching failed)
+    """
+    try:
+        extension = os.path.splitext(audio_path)[1]
+        cached_path = os.path.join(CACHE_DIR, AUDIO_LAYER, f"{video_id}{extension}")
+        os.makedirs(os.path.dirname(cached_path), exist_ok=True)
+        shutil.move(audio_path, cached_path)
+
+        _put(
+            make_key(AUDIO_LAYER, video_id), AUDIO_LAYER, video_id,
+            os.path.getsize(cached_path), path=cached_path
+        )
+        return cached_path
+    except Exception as e:
+        st.error(f"Error caching audio: {str(e)}")
+        return audio_path
+
+def get_cached_transcript(video_id, model_name, compute_type, beam_size):
+    """
+    Look up a cached transcript
+
+    Args:
+        video_id (str): YouTube video ID
+        model_name (str): Whisper model name
+        compute_type (str): Whisper compute type
+        beam_size (int): Decoding beam size
+
+    Returns:
+        str: Cached transcript or None
+    """
+    try:
+        row = _get(make_key(TRANSCRIPT_LAYER, video_id, model_name, compute_type, beam_size))
+        return row[1] if row else None
+    except Exception as e:
+        st.error(f"Error reading transcript cache: {str(e)}")
+        return None
+
+def cache_transcript(video_id, model_name, compute_type, beam_size, transcript):
+    """
+    Store a transcript in the cache
+
+    Args:
+        video_id (str): YouTube video ID
+        model_name (str): Whisper model name
+        compute_type (str): Whisper compute type
+        beam_size (int): Decoding beam size
+        transcript (str): Transcript text
+    """
+    try:
+        _put(
+            make_key(TRANSCRIPT_LAYER, video_id, model_name, compute_type, beam_size),
+            TRANSCRIPT_LAYER, video_id, len(transcript.encode('utf-8')), data=transcript
+        )
+    except Exception as e:
+        st.error(f"Error caching transcript: {str(e)}")
+
+def get_cached_content(video_id, transcript, prompt_hash, model_name):
+    """
+    Look up cached generated content
+
+    Args:
+        video_id (str): YouTube video ID
+        transcript (str): Transcript the content was generated from
+        prompt_hash (str): Fingerprint of the prompt templates and mode
+        model_name (str): Gemini model name
+
+    Returns:
+        dict: Cached content or None
+    """
+    try:
+        transcript_hash = hashlib.sha256(transcript.encode('utf-8')).hexdigest()
+        row = _get(make_key(CONTENT_LAYER, video_id, transcript_hash, prompt_hash, model_name))
+        return json.loads(row[1]) if row else None
+    except Exception as e:
+        st.error(f"Error reading content cache: {str(e)}")
+        return None
+
+def cache_content(video_id, transcript, prompt_hash, model_name, content):
+    """
+    Store generated content in the cache
+
+    Args:
+        video_id (str): YouTube video ID
+        transcript (str): Transcript the content was generated from
+        prompt_hash (str): Fingerprint of the prompt templates and mode
+        model_name (str): Gemini model name
+        content (dict): Generated content
+    """
+    try:
+        transcript_hash = hashlib.sha256(transcript.encode('utf-8')).hexdigest()
+        data = json.dumps(content, ensure_ascii=False)
+        _put(
+            make_key(CONTENT_LAYER, video_id, transcript_hash, prompt_hash, model_name),
+            CONTENT_LAYER, video_id, len(data.encode('utf-8')), data=data
+        )
+    except Exception as e:
+        st.error(f"Error caching content: {str(e)}")
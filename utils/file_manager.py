@@ -2,6 +2,11 @@ import os
 import json
 from datetime import datetime
 import streamlit as st
+from utils.workspace import evict_workspaces
+from utils.jobs import prune_jobs
+from utils.run_store import write_run, iter_runs, latest_run, load_run
+from utils.search_index import index_run
+from utils.metrics import timed
 
 def create_directories():
     """Create necessary directories for the application"""
@@ -16,105 +21,92 @@ def create_directories():
     for directory in directories:
         os.makedirs(directory, exist_ok=True)
 
-def save_outputs(content, transcript):
+@timed("save_outputs")
+def save_outputs(content, transcript, video_id=None, metadata=None, output_dir=None, segments=None):
     """
-    Save all generated content to files
+    Save all generated content as a new run in the run store
     
     Args:
         content (dict): Generated content (summary, hashtags, titles)
         transcript (str): Original transcript
+        video_id (str): YouTube video ID, if known
+        metadata (dict): Extra fields for the run index (e.g. url)
+        output_dir (str): Store root (defaults to OUTPUT_DIR)
+        segments (list): Optional segment dicts with start, end and text,
+            used for timestamped search results
+        
+    Returns:
+        dict: Index record of the saved run or None if saving failed
     """
     try:
-        # Ensure outputs directory exists
-        os.makedirs("outputs", exist_ok=True)
-        
-        # Generate timestamp for unique filenames
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        
-        # Save summary as markdown
-        if content.get('summary'):
-            summary_path = "outputs/video_summary.md"
-            with open(summary_path, 'w', encoding='utf-8') as f:
-                f.write(f"# Video Summary\n\n")
-                f.write(f"**Generated on:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-                f.write(f"{content['summary']}\n\n")
-                
-                # Add hashtags to summary
-                if content.get('hashtags'):
-                    f.write(f"## Hashtags\n\n")
-                    for hashtag in content['hashtags']:
-                        f.write(f"{hashtag} ")
-                    f.write(f"\n\n")
-                
-                # Add titles to summary
-                if content.get('titles'):
-                    f.write(f"## Title Suggestions\n\n")
-                    for i, title in enumerate(content['titles'], 1):
-                        f.write(f"{i}. {title}\n")
-        
-        # Save hashtags
-        if content.get('hashtags'):
-            hashtags_path = "outputs/hashtags.txt"
-            with open(hashtags_path, 'w', encoding='utf-8') as f:
-                for hashtag in content['hashtags']:
-                    f.write(f"{hashtag}\n")
-        
-        # Save titles
-        if content.get('titles'):
-            titles_path = "outputs/titles.txt"
-            with open(titles_path, 'w', encoding='utf-8') as f:
-                for i, title in enumerate(content['titles'], 1):
-                    f.write(f"{i}. {title}\n")
-        
-        # Save transcript
-        transcript_path = "outputs/transcript.txt"
-        with open(transcript_path, 'w', encoding='utf-8') as f:
-            f.write(f"Video Transcript\n")
-            f.write(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write(f"{'='*50}\n\n")
-            f.write(transcript)
-        
-        # Save all data as JSON for programmatic access
-        json_path = "outputs/content.json"
-        output_data = {
-            'timestamp': timestamp,
-            'summary': content.get('summary', ''),
-            'hashtags': content.get('hashtags', []),
-            'titles': content.get('titles', []),
-            'transcript': transcript
-        }
-        
-        with open(json_path, 'w', encoding='utf-8') as f:
-            json.dump(output_data, f, indent=2, ensure_ascii=False)
-        
+        record = write_run(content, transcript, video_id, metadata, output_dir, segments)
         st.success(f"✅ All outputs saved successfully!")
         
     except Exception as e:
         st.error(f"Error saving outputs: {str(e)}")
+        return None
+    
+    try:
+        index_run(record, content, transcript, segments, output_dir)
+    except Exception as e:
+        # The run is saved; "python -m utils.search_index update" catches up later
+        st.warning(f"Saved outputs could not be added to the search index: {str(e)}")
+    
+    return record
 
-def load_previous_results():
-    """Load previous processing results if available"""
+def list_previous_results(video_id=None, limit=20):
+    """
+    List saved runs newest first without loading their content
+    
+    Args:
+        video_id (str): Only runs of this video
+        limit (int): Maximum number of runs
+        
+    Returns:
+        list: Index records
+    """
     try:
-        json_path = "outputs/content.json"
-        if os.path.exists(json_path):
-            with open(json_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return None
+        return list(iter_runs(video_id, limit))
+    except Exception as e:
+        st.error(f"Error listing previous results: {str(e)}")
+        return []
+
+def load_previous_results(record=None):
+    """
+    Load a saved run (the newest one by default)
+    
+    Args:
+        record (dict): Index record from list_previous_results
+        
+    Returns:
+        dict: Content with transcript or None if there is none
+    """
+    try:
+        record = record or latest_run()
+        if not record:
+            return None
+        return load_run(record)
     except Exception as e:
         st.error(f"Error loading previous results: {str(e)}")
         return None
 
-def cleanup_temp_files():
-    """Clean up temporary files"""
+def cleanup_temp_files(max_age=None, max_bytes=None):
+    """
+    Clean up stale job workspaces and the job records that went with them
+    
+    Args:
+        max_age (float): Seconds since last use (defaults to WORKSPACE_MAX_AGE)
+        max_bytes (int): Size budget (defaults to WORKSPACE_MAX_BYTES)
+        
+    Returns:
+        int: Number of workspaces removed
+    """
     try:
-        temp_dir = "temp"
-        if os.path.exists(temp_dir):
-            for filename in os.listdir(temp_dir):
-                file_path = os.path.join(temp_dir, filename)
-                if os.path.isfile(file_path):
-                    os.remove(file_path)
+        prune_jobs(max_age)
+        return evict_workspaces(max_age, max_bytes)
     except Exception as e:
         st.error(f"Error cleaning up temp files: {str(e)}")
+        return 0
 
 def save_video_url(url):
     """Save the processed video URL for reference"""
@@ -0,0 +1,464 @@
+import os
+import json
+import time
+import socket
+import sqlite3
+import threading
+from contextlib import closing
+from utils.workspace import WORKSPACE_ROOT, WORKSPACE_MAX_AGE, workspace_key
+
+JOBS_DB = os.environ.get("JOBS_DB", os.path.join(WORKSPACE_ROOT, "jobs.sqlite"))
+
+# Completed stages in order; a job resumes after the last one it reached
+JOB_STATES = ('queued', 'downloaded', 'transcribed', 'generated', 'saved')
+
+# Transcribed segments buffered before they are written as a checkpoint
+CHECKPOINT_SEGMENTS = int(os.environ.get("CHECKPOINT_SEGMENTS", "20"))
+
+_schema_ready = set()
+_schema_lock = threading.Lock()
+
+def _create_schema(conn):
+    """Create the tables and indexes"""
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            job_id TEXT PRIMARY KEY,
+            url TEXT NOT NULL,
+            video_id TEXT,
+            state TEXT NOT NULL,
+            audio_path TEXT,
+            transcript TEXT,
+            content TEXT,
+            run_id TEXT,
+            error TEXT,
+            created REAL NOT NULL,
+            updated REAL NOT NULL,
+            user_id TEXT,
+            priority INTEGER NOT NULL DEFAULT 0,
+            stage TEXT,
+            claimed_by TEXT,
+            stage_started REAL,
+            progress REAL,
+            timings TEXT,
+            whisper_profile TEXT,
+            foreground INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS job_segments (
+            job_id TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            segment TEXT NOT NULL,
+            PRIMARY KEY (job_id, seq)
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, claimed_by)")
+    conn.commit()
+
+def _connect():
+    """Open the job store, creating it on first use in this process"""
+    directory = os.path.dirname(JOBS_DB)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(JOBS_DB, timeout=30)
+    conn.row_factory = sqlite3.Row
+    if JOBS_DB not in _schema_ready:
+        with _schema_lock:
+            if JOBS_DB not in _schema_ready:
+                _create_schema(conn)
+                _schema_ready.add(JOBS_DB)
+    return conn
+
+def _row_to_job(row):
+    """Convert a jobs row to a dict with decoded content"""
+    if row is None:
+        return None
+    job = dict(row)
+    job['content'] = json.loads(job['content']) if job['content'] else None
+    job['timings'] = json.loads(job['timings']) if job['timings'] else {}
+    job['whisper_profile'] = json.loads(job['whisper_profile']) if job['whisper_profile'] else None
+    return job
+
+def get_job(job_id):
+    """
+    Return a job by ID
+
+    Args:
+        job_id (str): Job ID
+
+    Returns:
+        dict: Job or None if unknown
+    """
+    with closing(_connect()) as conn:
+        return _row_to_job(conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone())
+
+def open_job(url, video_id=None):
+    """
+    Return the unfinished job for a URL, or start a new one
+
+    A job that reached 'saved' is finished; opening its URL again starts
+    over (the caches still make the repeat cheap).
+
+    Args:
+        url (str): Video URL
+        video_id (str): YouTube video ID, if known
+
+    Returns:
+        dict: Job with its state and checkpointed fields
+    """
+    job_id = workspace_key(video_id, url)
+    with closing(_connect()) as conn, conn:
+        row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row and row['state'] != 'saved':
+            return _row_to_job(row)
+
+        _insert_job(conn, job_id, url, video_id)
+        return _row_to_job(conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone())
+
+def _insert_job(conn, job_id, url, video_id, stage=None):
+    """Start a job over as queued, claimed for stage in the foreground if given"""
+    now = time.time()
+    conn.execute("DELETE FROM job_segments WHERE job_id = ?", (job_id,))
+    conn.execute(
+        "INSERT OR REPLACE INTO jobs (job_id, url, video_id, state, created, updated, "
+        "claimed_by, stage, stage_started, foreground) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (job_id, url, video_id, 'queued', now, now,
+         worker_name() if stage else None, stage, now if stage else None, int(bool(stage)))
+    )
+
+def open_foreground_job(url, video_id=None, stage="foreground"):
+    """
+    Open the job for a URL and claim it for a run in the foreground
+
+    Opening and claiming happen in one transaction, so the scheduler can
+    never take the job in between. The job is marked as foreground, which
+    keeps claim_next_job away from it even after the claim is released,
+    until it is submitted to the queue.
+
+    Args:
+        url (str): Video URL
+        video_id (str): YouTube video ID, if known
+        stage (str): Stage name shown while the claim is held
+
+    Returns:
+        tuple: (job, claimed); claimed is False when another worker holds the job
+    """
+    job_id = workspace_key(video_id, url)
+    with closing(_connect()) as conn, conn:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("SELECT state FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row and row['state'] != 'saved':
+            claimed = conn.execute(
+                "UPDATE jobs SET claimed_by = ?, stage = ?, stage_started = ?, progress = NULL, foreground = 1 "
+                "WHERE job_id = ? AND claimed_by IS NULL",
+                (worker_name(), stage, time.time(), job_id)
+            ).rowcount == 1
+        else:
+            _insert_job(conn, job_id, url, video_id, stage)
+            claimed = True
+        job = _row_to_job(conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone())
+    return job, claimed
+
+def submit_job(url, video_id=None, user_id=None, priority=0):
+    """
+    Queue a URL for the background scheduler
+
+    An unfinished job for the URL is reused (and retried if it failed),
+    so submitting twice never runs the same video twice at once.
+
+    Args:
+        url (str): Video URL
+        video_id (str): YouTube video ID, if known
+        user_id (str): Who submitted it, for per-user fairness
+        priority (int): Higher runs first
+
+    Returns:
+        dict: Job
+    """
+    job = open_job(url, video_id)
+    with closing(_connect()) as conn, conn:
+        conn.execute(
+            "UPDATE jobs SET user_id = ?, priority = ?, error = NULL, foreground = 0, updated = ? WHERE job_id = ?",
+            (user_id, priority, time.time(), job['job_id'])
+        )
+    return get_job(job['job_id'])
+
+def worker_name():
+    """Identify this process as host:pid when claiming jobs"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def claim_job(job_id, stage, worker=None):
+    """
+    Take a job for one stage unless someone else holds it
+
+    Args:
+        job_id (str): Job ID
+        stage (str): Stage about to run
+        worker (str): Claim owner (defaults to worker_name())
+
+    Returns:
+        bool: True if the claim was taken
+    """
+    with closing(_connect()) as conn, conn:
+        cursor = conn.execute(
+            "UPDATE jobs SET claimed_by = ?, stage = ?, stage_started = ?, progress = NULL "
+            "WHERE job_id = ? AND claimed_by IS NULL",
+            (worker or worker_name(), stage, time.time(), job_id)
+        )
+        return cursor.rowcount == 1
+
+def claim_next_job(state, stage, worker=None):
+    """
+    Claim the next job waiting in a state
+
+    Higher priority goes first; among equal priorities, users with fewer
+    jobs running go first, then the oldest submission. Failed jobs wait
+    until they are submitted again, and jobs opened in the foreground are
+    left to the run that opened them.
+
+    Args:
+        state (str): State the stage picks jobs up from
+        stage (str): Stage about to run
+        worker (str): Claim owner (defaults to worker_name())
+
+    Returns:
+        dict: Claimed job or None if nothing is waiting
+    """
+    worker = worker or worker_name()
+    while True:
+        with closing(_connect()) as conn:
+            row = conn.execute("""
+                SELECT job_id FROM jobs AS waiting
+                WHERE state = ? AND claimed_by IS NULL AND error IS NULL AND foreground = 0
+                ORDER BY priority DESC,
+                    (SELECT COUNT(*) FROM jobs AS running
+                     WHERE running.claimed_by IS NOT NULL AND running.user_id IS waiting.user_id) ASC,
+                    created ASC
+                LIMIT 1
+            """, (state,)).fetchone()
+        if row is None:
+            return None
+        # Another worker may have taken it in between; then look again
+        if claim_job(row['job_id'], stage, worker):
+            return get_job(row['job_id'])
+
+def release_job(job_id, seconds=None):
+    """
+    Give up a job's claim, recording how long its stage took
+
+    Args:
+        job_id (str): Job ID
+        seconds (float): Stage duration to add to the job's timings
+    """
+    with closing(_connect()) as conn, conn:
+        row = conn.execute("SELECT stage, timings FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return
+        timings = json.loads(row['timings']) if row['timings'] else {}
+        if seconds is not None and row['stage']:
+            timings[row['stage']] = round(timings.get(row['stage'], 0) + seconds, 3)
+        conn.execute(
+            "UPDATE jobs SET claimed_by = NULL, stage = NULL, stage_started = NULL, timings = ?, updated = ? "
+            "WHERE job_id = ?",
+            (json.dumps(timings), time.time(), job_id)
+        )
+
+def release_stale_claims():
+    """
+    Free claims held by processes on this host that are no longer running
+
+    Returns:
+        int: Number of claims released
+    """
+    host = socket.gethostname()
+    with closing(_connect()) as conn:
+        rows = conn.execute("SELECT job_id, claimed_by FROM jobs WHERE claimed_by IS NOT NULL").fetchall()
+
+    released = 0
+    for row in rows:
+        claim_host, _, pid = row['claimed_by'].rpartition(":")
+        if claim_host != host or not pid.isdigit():
+            continue
+        try:
+            os.kill(int(pid), 0)
+            continue
+        except ProcessLookupError:
+            pass
+        except PermissionError:
+            # Running under another user
+            continue
+        release_job(row['job_id'])
+        released += 1
+    return released
+
+def list_jobs(limit=200, states=None):
+    """
+    Return recent jobs, newest first
+
+    Args:
+        limit (int): Maximum number of jobs
+        states (tuple): Only jobs in these states
+
+    Returns:
+        list: Jobs without transcripts or content
+    """
+    columns = "job_id, url, video_id, state, audio_path, run_id, error, created, updated, " \
+              "user_id, priority, stage, claimed_by, stage_started, progress, timings, foreground"
+    sql = f"SELECT {columns} FROM jobs"
+    params = []
+    if states:
+        sql += f" WHERE state IN ({', '.join('?' for _ in states)})"
+        params.extend(states)
+    sql += " ORDER BY created DESC LIMIT ?"
+    params.append(limit)
+    with closing(_connect()) as conn:
+        rows = conn.execute(sql, params).fetchall()
+
+    jobs = []
+    for row in rows:
+        job = dict(row)
+        job['timings'] = json.loads(job['timings']) if job['timings'] else {}
+        jobs.append(job)
+    return jobs
+
+def advance_job(job_id, state, **fields):
+    """
+    Record that a job completed a stage, with that stage's outputs
+
+    Args:
+        job_id (str): Job ID
+        state (str): Stage just completed, one of JOB_STATES
+        **fields: Outputs to store (audio_path, transcript, content, run_id)
+
+    Raises:
+        ValueError: Unknown state, unknown field or a move backwards
+    """
+    if state not in JOB_STATES:
+        raise ValueError(f"Unknown job state {state!r}")
+    unknown = set(fields) - {'audio_path', 'transcript', 'content', 'run_id'}
+    if unknown:
+        raise ValueError(f"Unknown job fields: {', '.join(sorted(unknown))}")
+    if 'content' in fields:
+        fields['content'] = json.dumps(fields['content'], ensure_ascii=False)
+
+    with closing(_connect()) as conn, conn:
+        row = conn.execute("SELECT state FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            raise ValueError(f"Unknown job {job_id!r}")
+        if JOB_STATES.index(state) < JOB_STATES.index(row['state']):
+            raise ValueError(f"Job {job_id} cannot go back from {row['state']} to {state}")
+
+        assignments = "".join(f", {name} = ?" for name in fields)
+        conn.execute(
+            f"UPDATE jobs SET state = ?, error = NULL, updated = ?{assignments} WHERE job_id = ?",
+            (state, time.time(), *fields.values(), job_id)
+        )
+        if state == 'saved':
+            # Segments are kept until the run store has its own copy
+            conn.execute("DELETE FROM job_segments WHERE job_id = ?", (job_id,))
+
+def fail_job(job_id, error):
+    """
+    Note why a job stopped; it stays at its last completed stage
+
+    Args:
+        job_id (str): Job ID
+        error (str): Error description
+    """
+    with closing(_connect()) as conn, conn:
+        conn.execute(
+            "UPDATE jobs SET error = ?, updated = ? WHERE job_id = ?", (error, time.time(), job_id)
+        )
+
+def set_job_profile(job_id, profile):
+    """
+    Remember the Whisper settings a job's transcription started with
+
+    Args:
+        job_id (str): Job ID
+        profile (dict): Profile fields (WhisperProfile._asdict())
+    """
+    with closing(_connect()) as conn, conn:
+        conn.execute(
+            "UPDATE jobs SET whisper_profile = ?, updated = ? WHERE job_id = ?",
+            (json.dumps(profile), time.time(), job_id)
+        )
+
+def checkpoint_segments(job_id, segments, first_seq):
+    """
+    Append transcribed segments to a job's checkpoint
+
+    Args:
+        job_id (str): Job ID
+        segments (list): Segment dicts in order
+        first_seq (int): Position of the first segment in the transcript
+    """
+    with closing(_connect()) as conn, conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO job_segments (job_id, seq, segment) VALUES (?, ?, ?)",
+            [
+                (job_id, first_seq + offset, json.dumps(segment, ensure_ascii=False))
+                for offset, segment in enumerate(segments)
+            ]
+        )
+        conn.execute(
+            "UPDATE jobs SET progress = ?, updated = ? WHERE job_id = ?",
+            (segments[-1].get('progress') if segments else None, time.time(), job_id)
+        )
+
+def load_segments(job_id):
+    """
+    Return a job's checkpointed segments
+
+    Args:
+        job_id (str): Job ID
+
+    Returns:
+        list: Segment dicts in order
+    """
+    with closing(_connect()) as conn:
+        rows = conn.execute(
+            "SELECT segment FROM job_segments WHERE job_id = ? ORDER BY seq", (job_id,)
+        ).fetchall()
+    return [json.loads(row['segment']) for row in rows]
+
+class SegmentCheckpointer:
+    """on_segment callback that checkpoints every CHECKPOINT_SEGMENTS segments"""
+
+    def __init__(self, job_id, on_segment=None, first_seq=0, every=None):
+        self.job_id = job_id
+        self.on_segment = on_segment
+        self.seq = first_seq
+        self.every = every or CHECKPOINT_SEGMENTS
+        self.pending = []
+
+    def __call__(self, segment):
+        self.pending.append(segment)
+        if len(self.pending) >= self.every:
+            self.flush()
+        if self.on_segment:
+            self.on_segment(segment)
+
+    def flush(self):
+        """Write buffered segments"""
+        if self.pending:
+            checkpoint_segments(self.job_id, self.pending, self.seq)
+            self.seq += len(self.pending)
+            self.pending = []
+
+def prune_jobs(max_age=None):
+    """
+    Forget jobs untouched for longer than max_age
+
+    Args:
+        max_age (float): Seconds since last update (defaults to WORKSPACE_MAX_AGE)
+
+    Returns:
+        int: Number of jobs removed
+    """
+    cutoff = time.time() - (WORKSPACE_MAX_AGE if max_age is None else max_age)
+    with closing(_connect()) as conn, conn:
+        stale = "SELECT job_id FROM jobs WHERE updated < ? AND claimed_by IS NULL"
+        conn.execute(f"DELETE FROM job_segments WHERE job_id IN ({stale})", (cutoff,))
+        return conn.execute(f"DELETE FROM jobs WHERE job_id IN ({stale})", (cutoff,)).rowcount
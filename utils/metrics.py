@@ -0,0 +1,319 @@
+import os
+import sys
+import json
+import time
+import inspect
+import functools
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from utils.run_store import iter_jsonl_reversed
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; peak RSS is then left out
+    resource = None
+
+METRICS_LOG = os.environ.get("METRICS_LOG", os.path.join("outputs", "metrics.jsonl"))
+
+# Set METRICS_ENABLED=0 to skip recording entirely
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") == "1"
+
+# Port for the Prometheus text endpoint (0 leaves it off)
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))
+
+# Fields summed per stage for the Prometheus endpoint
+COUNTED_FIELDS = ('prompt_tokens', 'response_tokens', 'audio_seconds', 'bytes_downloaded', 'vad_skipped_seconds')
+
+_local = threading.local()
+_log_lock = threading.Lock()
+_totals_lock = threading.Lock()
+_totals = defaultdict(lambda: defaultdict(float))
+_server = None
+_server_lock = threading.Lock()
+
+def peak_rss_bytes():
+    """High-water mark of this process's resident memory, or None if unknown"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def _stack():
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    return _local.stack
+
+def add_metrics(**values):
+    """
+    Add values to the innermost stage running on this thread
+
+    Numbers are summed, so a stage making several Gemini calls reports
+    its total token counts. Does nothing outside a stage.
+    """
+    stack = _stack()
+    if not stack:
+        return
+    record = stack[-1]
+    for key, value in values.items():
+        if value is None:
+            continue
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and key in record:
+            record[key] += value
+        else:
+            record[key] = value
+
+def _write(record):
+    """Append a record to the metrics log and the running totals"""
+    with _log_lock:
+        directory = os.path.dirname(METRICS_LOG)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(METRICS_LOG, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    with _totals_lock:
+        totals = _totals[record['stage']]
+        totals['runs'] += 1
+        totals['errors'] += record['status'] == "error"
+        totals['wall_seconds'] += record['wall_seconds']
+        totals['cpu_seconds'] += record['cpu_seconds']
+        for key in COUNTED_FIELDS:
+            totals[key] += record.get(key) or 0
+
+@contextmanager
+def stage(name, **labels):
+    """
+    Measure one pipeline stage and log it as a JSONL record
+
+    Records wall time, process CPU time (all threads, so concurrent
+    stages overlap), peak RSS and anything added with add_metrics.
+    audio_seconds also yields the real-time factor.
+
+    Args:
+        name (str): Stage name
+        **labels: Extra fields for the record (e.g. video_id)
+
+    Yields:
+        dict: The record, for adding fields directly
+    """
+    if not METRICS_ENABLED:
+        yield {}
+        return
+
+    record = {'stage': name, **labels}
+    stack = _stack()
+    stack.append(record)
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+    record['status'] = "ok"
+    try:
+        yield record
+    except GeneratorExit:
+        # A streamed stage whose consumer stopped early
+        record['status'] = "cancelled"
+        raise
+    except BaseException as e:
+        record['status'] = "error"
+        record['error'] = type(e).__name__
+        raise
+    finally:
+        # A generator may be closed from another thread than the one it started on
+        if any(entry is record for entry in stack):
+            stack[:] = [entry for entry in stack if entry is not record]
+        record['wall_seconds'] = round(time.perf_counter() - started, 4)
+        record['cpu_seconds'] = round(time.process_time() - cpu_started, 4)
+        record['peak_rss_bytes'] = peak_rss_bytes()
+        if record.get('audio_seconds'):
+            record['realtime_factor'] = round(record['wall_seconds'] / record['audio_seconds'], 4)
+        record['finished'] = time.time()
+        try:
+            _write(record)
+        except OSError:
+            # Metrics must never break the pipeline
+            pass
+
+@contextmanager
+def collect_metrics():
+    """
+    Gather add_metrics values on this thread without logging a record
+
+    Used for work done on behalf of a stage running in another process,
+    which adds the collected values to its own record.
+
+    Yields:
+        dict: Values added while the block runs
+    """
+    values = {}
+    stack = _stack()
+    stack.append(values)
+    try:
+        yield values
+    finally:
+        stack[:] = [entry for entry in stack if entry is not values]
+
+def timed(name, **labels):
+    """
+    Decorate a function (or generator function) to run as a stage
+
+    A None result is recorded with status "empty", since most pipeline
+    functions report failure that way. Generators are measured from the
+    first to the last item, with first_item_seconds as time to first item.
+    """
+    def decorator(func):
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def generator_wrapper(*args, **kwargs):
+                with stage(name, **labels) as record:
+                    started = time.perf_counter()
+                    for item in func(*args, **kwargs):
+                        if 'first_item_seconds' not in record:
+                            record['first_item_seconds'] = round(time.perf_counter() - started, 4)
+                        yield item
+            return generator_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name, **labels) as record:
+                result = func(*args, **kwargs)
+                if result is None:
+                    record['status'] = "empty"
+                return result
+        return wrapper
+    return decorator
+
+def read_metrics(limit=1000, stage_name=None):
+    """
+    Return the most recent records, newest first
+
+    Args:
+        limit (int): Maximum number of records
+        stage_name (str): Only records of this stage
+
+    Returns:
+        list: Records
+    """
+    needle = json.dumps({'stage': stage_name})[1:-1].encode('utf-8') if stage_name else None
+    records = []
+    for record in iter_jsonl_reversed(METRICS_LOG, needle):
+        if stage_name and record.get('stage') != stage_name:
+            continue
+        records.append(record)
+        if len(records) >= limit:
+            break
+    return records
+
+def _percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def summarize_metrics(records):
+    """
+    Aggregate records per stage
+
+    Args:
+        records (list): Records from read_metrics
+
+    Returns:
+        list: One dict per stage with counts, wall time percentiles,
+            mean real-time factor and token totals
+    """
+    by_stage = defaultdict(list)
+    for record in records:
+        by_stage[record['stage']].append(record)
+
+    rows = []
+    for name, stage_records in sorted(by_stage.items()):
+        wall = [record['wall_seconds'] for record in stage_records]
+        factors = [record['realtime_factor'] for record in stage_records if record.get('realtime_factor')]
+        rows.append({
+            'stage': name,
+            'runs': len(stage_records),
+            'errors': sum(record['status'] != "ok" for record in stage_records),
+            'wall_p50': _percentile(wall, 0.5),
+            'wall_p95': _percentile(wall, 0.95),
+            'cpu_total': round(sum(record['cpu_seconds'] for record in stage_records), 2),
+            'realtime_factor': round(sum(factors) / len(factors), 3) if factors else None,
+            'prompt_tokens': sum(record.get('prompt_tokens') or 0 for record in stage_records),
+            'response_tokens': sum(record.get('response_tokens') or 0 for record in stage_records)
+        })
+    return rows
+
+def render_prometheus():
+    """
+    Render this process's totals in the Prometheus text format
+
+    Returns:
+        str: Exposition text
+    """
+    metrics = [
+        ('runs', "ytco_stage_runs_total", "Stage executions"),
+        ('errors', "ytco_stage_errors_total", "Stage executions that raised"),
+        ('wall_seconds', "ytco_stage_wall_seconds_total", "Wall time spent in the stage"),
+        ('cpu_seconds', "ytco_stage_cpu_seconds_total", "Process CPU time during the stage"),
+        ('prompt_tokens', "ytco_stage_prompt_tokens_total", "Gemini prompt tokens"),
+        ('response_tokens', "ytco_stage_response_tokens_total", "Gemini response tokens"),
+        ('audio_seconds', "ytco_stage_audio_seconds_total", "Seconds of audio handled"),
+        ('bytes_downloaded', "ytco_stage_downloaded_bytes_total", "Bytes downloaded"),
+        ('vad_skipped_seconds', "ytco_stage_vad_skipped_seconds_total", "Seconds of silence cut before transcription")
+    ]
+    with _totals_lock:
+        totals = {name: dict(values) for name, values in _totals.items()}
+
+    lines = []
+    for key, metric, description in metrics:
+        lines.append(f"# HELP {metric} {description}")
+        lines.append(f"# TYPE {metric} counter")
+        for name, values in sorted(totals.items()):
+            lines.append(f'{metric}{{stage="{name}"}} {values.get(key, 0):g}')
+
+    peak = peak_rss_bytes()
+    if peak is not None:
+        lines.append("# HELP ytco_peak_rss_bytes Peak resident memory of the process")
+        lines.append("# TYPE ytco_peak_rss_bytes gauge")
+        lines.append(f"ytco_peak_rss_bytes {peak}")
+    return "\n".join(lines) + "\n"
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_metrics_server(port=None, host="127.0.0.1"):
+    """
+    Serve /metrics in the Prometheus text format from a background thread
+
+    Only the first call starts a server; later calls return its port.
+
+    Args:
+        port (int): Port to listen on (defaults to METRICS_PORT; 0 does nothing)
+        host (str): Interface to bind
+
+    Returns:
+        int: Port being served or None if disabled
+    """
+    global _server
+    port = METRICS_PORT if port is None else port
+    with _server_lock:
+        if _server:
+            return _server.server_address[1]
+        if not port:
+            return None
+
+        _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+        return port
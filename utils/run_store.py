@@ -0,0 +1,279 @@
+import os
+import json
+import mmap
+import uuid
+import shutil
+import threading
+from datetime import datetime
+from utils.workspace import partial_path, commit_file
+
+# Root of the run store; each run gets <video>/<run_id>/ under RUNS_DIRNAME
+OUTPUT_DIR = os.environ.get("OUTPUT_DIR", "outputs")
+RUNS_DIRNAME = "runs"
+INDEX_NAME = "index.jsonl"
+
+# Characters of the summary kept in the index for history listings
+PREVIEW_CHARS = 200
+
+# Runs without a YouTube video ID are grouped here
+LOCAL_VIDEO_KEY = "_local"
+
+_index_lock = threading.Lock()
+
+def get_runs_dir(output_dir=None):
+    """Directory holding all runs and the index"""
+    return os.path.join(output_dir or OUTPUT_DIR, RUNS_DIRNAME)
+
+def new_run_id():
+    """Return a sortable, unique run ID"""
+    return f"{datetime.now().strftime('%Y%m%d_%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+def _write_text(directory, name, text):
+    """Write one text file into a run directory"""
+    with open(os.path.join(directory, name), 'w', encoding='utf-8') as f:
+        f.write(text)
+
+def _render_files(content, transcript, created):
+    """Render the per-run output files"""
+    generated_on = created.strftime('%Y-%m-%d %H:%M:%S')
+    files = {}
+
+    if content.get('summary'):
+        lines = ["# Video Summary\n", f"**Generated on:** {generated_on}\n", f"{content['summary']}\n"]
+        if content.get('hashtags'):
+            lines += ["## Hashtags\n", " ".join(content['hashtags']) + "\n"]
+        if content.get('titles'):
+            lines += ["## Title Suggestions\n"]
+            lines += [f"{i}. {title}" for i, title in enumerate(content['titles'], 1)]
+        files['video_summary.md'] = "\n".join(lines) + "\n"
+
+    if content.get('hashtags'):
+        files['hashtags.txt'] = "".join(f"{hashtag}\n" for hashtag in content['hashtags'])
+
+    if content.get('titles'):
+        files['titles.txt'] = "".join(f"{i}. {title}\n" for i, title in enumerate(content['titles'], 1))
+
+    files['transcript.txt'] = (
+        f"Video Transcript\nGenerated on: {generated_on}\n{'='*50}\n\n{transcript}"
+    )
+    return files
+
+def _append_index(runs_dir, record):
+    """Append one record to the index with a single O_APPEND write"""
+    line = (json.dumps(record, ensure_ascii=False) + "\n").encode('utf-8')
+    with _index_lock:
+        fd = os.open(os.path.join(runs_dir, INDEX_NAME), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+def write_run(content, transcript, video_id=None, metadata=None, output_dir=None, segments=None):
+    """
+    Store one run's outputs and record it in the index
+
+    The run directory is assembled under a temporary name and renamed
+    into place, so readers never see a half-written run. Runs are never
+    overwritten.
+
+    Args:
+        content (dict): Generated content (summary, hashtags, titles)
+        transcript (str): Original transcript
+        video_id (str): YouTube video ID, if known
+        metadata (dict): Extra fields for the index record (e.g. url)
+        output_dir (str): Store root (defaults to OUTPUT_DIR)
+        segments (list): Optional segment dicts with start, end and text
+
+    Returns:
+        dict: Index record of the new run
+    """
+    runs_dir = get_runs_dir(output_dir)
+    video_key = video_id or LOCAL_VIDEO_KEY
+    video_dir = os.path.join(runs_dir, video_key)
+    os.makedirs(video_dir, exist_ok=True)
+
+    created = datetime.now()
+    run_id = new_run_id()
+    staging = partial_path(video_dir, run_id)
+    os.makedirs(staging)
+    try:
+        for name, text in _render_files(content, transcript, created).items():
+            _write_text(staging, name, text)
+
+        # content.json holds everything but the transcript, which stays in its own file
+        output_data = {
+            'run_id': run_id,
+            'video_id': video_id,
+            'timestamp': created.strftime("%Y%m%d_%H%M%S"),
+            'summary': content.get('summary', ''),
+            'hashtags': content.get('hashtags', []),
+            'titles': content.get('titles', []),
+            **(metadata or {})
+        }
+        _write_text(staging, "content.json", json.dumps(output_data, indent=2, ensure_ascii=False))
+
+        if segments:
+            _write_text(staging, "segments.json", json.dumps(
+                [{'start': s['start'], 'end': s['end'], 'text': s['text']} for s in segments],
+                ensure_ascii=False
+            ))
+
+        run_dir = commit_file(staging, os.path.join(video_dir, run_id))
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    record = {
+        'run_id': run_id,
+        'video_id': video_id,
+        'created': created.isoformat(timespec='seconds'),
+        'path': os.path.relpath(run_dir, runs_dir),
+        'preview': (content.get('summary') or "")[:PREVIEW_CHARS],
+        'files': sorted(os.listdir(run_dir)),
+        **(metadata or {})
+    }
+    _append_index(runs_dir, record)
+    return record
+
+def iter_jsonl_reversed(path, needle=None):
+    """
+    Yield the records of a JSONL file newest (last) first
+
+    The file is memory-mapped and scanned backwards line by line, so
+    only the records actually yielded are decoded.
+
+    Args:
+        path (str): JSONL file
+        needle (bytes): Skip lines that don't contain these bytes
+
+    Yields:
+        dict: Decoded record
+    """
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return
+
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as lines:
+        end = len(lines)
+        while end > 0:
+            start = lines.rfind(b"\n", 0, end - 1) + 1
+            line = lines[start:end].strip()
+            end = start
+            if not line or (needle and needle not in line):
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # A torn final line from a crashed writer
+                continue
+
+def iter_runs(video_id=None, limit=None, output_dir=None):
+    """
+    Yield index records newest first
+
+    Args:
+        video_id (str): Only runs of this video
+        limit (int): Stop after this many records
+        output_dir (str): Store root (defaults to OUTPUT_DIR)
+
+    Yields:
+        dict: Index record
+    """
+    index_path = os.path.join(get_runs_dir(output_dir), INDEX_NAME)
+
+    # Cheap byte test before decoding a line
+    needle = json.dumps({'video_id': video_id})[1:-1].encode('utf-8') if video_id else None
+
+    count = 0
+    for record in iter_jsonl_reversed(index_path, needle):
+        if limit is not None and count >= limit:
+            return
+        if video_id and record.get('video_id') != video_id:
+            continue
+        count += 1
+        yield record
+
+def latest_run(video_id=None, output_dir=None):
+    """
+    Return the newest index record, optionally for one video
+
+    Args:
+        video_id (str): Only runs of this video
+        output_dir (str): Store root (defaults to OUTPUT_DIR)
+
+    Returns:
+        dict: Index record or None
+    """
+    return next(iter_runs(video_id, limit=1, output_dir=output_dir), None)
+
+def find_run(run_id, output_dir=None):
+    """
+    Return the index record of one run
+
+    Args:
+        run_id (str): Run ID
+        output_dir (str): Store root (defaults to OUTPUT_DIR)
+
+    Returns:
+        dict: Index record or None
+    """
+    index_path = os.path.join(get_runs_dir(output_dir), INDEX_NAME)
+    needle = json.dumps({'run_id': run_id})[1:-1].encode('utf-8')
+    for record in iter_jsonl_reversed(index_path, needle):
+        if record.get('run_id') == run_id:
+            return record
+    return None
+
+def run_file(record, name, output_dir=None):
+    """
+    Path of one output file of a run
+
+    Args:
+        record (dict): Index record
+        name (str): File name (e.g. "hashtags.txt")
+        output_dir (str): Store root (defaults to OUTPUT_DIR)
+
+    Returns:
+        str: Path or None if the run has no such file
+    """
+    path = os.path.join(get_runs_dir(output_dir), record['path'], name)
+    return path if os.path.exists(path) else None
+
+def load_run(record, with_transcript=True, output_dir=None):
+    """
+    Load the content of a run
+
+    Args:
+        record (dict): Index record
+        with_transcript (bool): Also read transcript.txt
+        output_dir (str): Store root (defaults to OUTPUT_DIR)
+
+    Returns:
+        dict: Content (with 'transcript' when requested)
+    """
+    with open(run_file(record, "content.json", output_dir), 'r', encoding='utf-8') as f:
+        content = json.load(f)
+
+    if with_transcript:
+        transcript_path = run_file(record, "transcript.txt", output_dir)
+        if transcript_path:
+            with open(transcript_path, 'r', encoding='utf-8') as f:
+                # Skip the three-line header written by write_run
+                content['transcript'] = f.read().split("\n\n", 1)[-1]
+    return content
+
+def load_run_segments(record, output_dir=None):
+    """
+    Load the timestamped segments of a run
+
+    Args:
+        record (dict): Index record
+        output_dir (str): Store root (defaults to OUTPUT_DIR)
+
+    Returns:
+        list: Segment dicts with start, end and text (empty if none were stored)
+    """
+    segments_path = run_file(record, "segments.json", output_dir)
+    if not segments_path:
+        return []
+    with open(segments_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
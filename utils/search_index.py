@@ -0,0 +1,255 @@
+"""
+Full-text search over stored runs
+
+Usage:
+    python -m utils.search_index update
+    python -m utils.search_index rebuild
+    python -m utils.search_index search "gradient descent"
+
+Runs are indexed as they are saved. "update" picks up runs missing from
+the index (e.g. written by another process); "rebuild" starts over from
+the run store.
+"""
+import os
+import sqlite3
+import argparse
+from contextlib import closing
+from utils.run_store import get_runs_dir, iter_runs, load_run, load_run_segments
+
+INDEX_FILENAME = "search.sqlite"
+
+# Consecutive segments are merged into passages of about this many seconds
+PASSAGE_SECONDS = 30
+
+# Passage size for transcripts stored without timestamps
+PASSAGE_CHARS = 600
+
+def _connect(output_dir=None):
+    """Open the search index, creating it on first use"""
+    runs_dir = get_runs_dir(output_dir)
+    os.makedirs(runs_dir, exist_ok=True)
+    conn = sqlite3.connect(os.path.join(runs_dir, INDEX_FILENAME), timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS runs (
+            run_id TEXT PRIMARY KEY,
+            video_id TEXT,
+            url TEXT,
+            created TEXT NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS passages USING fts5(
+            text,
+            field UNINDEXED,
+            run_id UNINDEXED,
+            start UNINDEXED,
+            tokenize = 'porter unicode61'
+        )
+    """)
+    return conn
+
+def make_passages(transcript, segments=None):
+    """
+    Split a transcript into searchable passages
+
+    Args:
+        transcript (str): Full transcript
+        segments (list): Optional segment dicts with start, end and text
+
+    Returns:
+        list: (start seconds or None, text) tuples
+    """
+    passages = []
+    if segments:
+        start, texts = None, []
+        for segment in segments:
+            if start is None:
+                start = segment['start']
+            texts.append(segment['text'])
+            if segment['end'] - start >= PASSAGE_SECONDS:
+                passages.append((start, " ".join(texts)))
+                start, texts = None, []
+        if texts:
+            passages.append((start, " ".join(texts)))
+        return passages
+
+    words, length = [], 0
+    for word in transcript.split():
+        words.append(word)
+        length += len(word) + 1
+        if length >= PASSAGE_CHARS:
+            passages.append((None, " ".join(words)))
+            words, length = [], 0
+    if words:
+        passages.append((None, " ".join(words)))
+    return passages
+
+def index_run(record, content, transcript, segments=None, output_dir=None):
+    """
+    Add one run to the search index, replacing any earlier entry for it
+
+    Args:
+        record (dict): Run index record from the run store
+        content (dict): Generated content (summary, hashtags, titles)
+        transcript (str): Full transcript
+        segments (list): Optional segment dicts with start, end and text
+        output_dir (str): Store root (defaults to OUTPUT_DIR)
+    """
+    with closing(_connect(output_dir)) as conn, conn:
+        _insert_run(conn, record, content, transcript, segments)
+
+def _insert_run(conn, record, content, transcript, segments):
+    """Replace the passages of one run inside the caller's transaction"""
+    rows = [('transcript', start, text) for start, text in make_passages(transcript, segments)]
+    if content.get('summary'):
+        rows.append(('summary', None, content['summary']))
+    if content.get('titles'):
+        rows.append(('titles', None, "\n".join(content['titles'])))
+    if content.get('hashtags'):
+        rows.append(('hashtags', None, " ".join(tag.lstrip('#') for tag in content['hashtags'])))
+
+    # run_id is not indexed in the FTS table, so only scan it when replacing a run
+    if conn.execute("SELECT 1 FROM runs WHERE run_id = ?", (record['run_id'],)).fetchone():
+        conn.execute("DELETE FROM passages WHERE run_id = ?", (record['run_id'],))
+    conn.execute(
+        "INSERT OR REPLACE INTO runs (run_id, video_id, url, created) VALUES (?, ?, ?, ?)",
+        (record['run_id'], record.get('video_id'), record.get('url'), record['created'])
+    )
+    conn.executemany(
+        "INSERT INTO passages (text, field, run_id, start) VALUES (?, ?, ?, ?)",
+        [(text, field, record['run_id'], start) for field, start, text in rows]
+    )
+
+def update_index(output_dir=None):
+    """
+    Index every stored run that is not in the search index yet
+
+    Args:
+        output_dir (str): Store root (defaults to OUTPUT_DIR)
+
+    Returns:
+        int: Number of runs indexed
+    """
+    indexed = 0
+    with closing(_connect(output_dir)) as conn:
+        known = {row[0] for row in conn.execute("SELECT run_id FROM runs")}
+
+        # One transaction per batch of runs keeps large rebuilds fast
+        with conn:
+            for record in iter_runs(output_dir=output_dir):
+                if record['run_id'] in known:
+                    continue
+                content = load_run(record, output_dir=output_dir)
+                _insert_run(
+                    conn, record, content, content.get('transcript', ''),
+                    load_run_segments(record, output_dir)
+                )
+                indexed += 1
+    return indexed
+
+def rebuild_index(output_dir=None):
+    """
+    Drop the search index and rebuild it from the run store
+
+    Args:
+        output_dir (str): Store root (defaults to OUTPUT_DIR)
+
+    Returns:
+        int: Number of runs indexed
+    """
+    with closing(_connect(output_dir)) as conn, conn:
+        conn.execute("DELETE FROM passages")
+        conn.execute("DELETE FROM runs")
+    return update_index(output_dir)
+
+def deep_link(video_id, start=None):
+    """
+    Link to a moment of a YouTube video
+
+    Args:
+        video_id (str): YouTube video ID
+        start (float): Seconds into the video
+
+    Returns:
+        str: URL or None without a video ID
+    """
+    if not video_id:
+        return None
+    if start is None:
+        return f"https://youtu.be/{video_id}"
+    return f"https://youtu.be/{video_id}?t={int(start)}"
+
+def _match_expression(query):
+    """Quote each word so user input can't break the FTS5 query syntax"""
+    return " ".join('"' + word.replace('"', '""') + '"' for word in query.split())
+
+def search(query, limit=20, video_id=None, output_dir=None):
+    """
+    Search transcripts and generated content
+
+    Args:
+        query (str): Words that must all appear in a passage
+        limit (int): Maximum number of hits
+        video_id (str): Only search runs of this video
+        output_dir (str): Store root (defaults to OUTPUT_DIR)
+
+    Returns:
+        list: Hits (best first) with run_id, video_id, url, created, field,
+            start, snippet and link
+    """
+    expression = _match_expression(query)
+    if not expression:
+        return []
+
+    sql = """
+        SELECT p.run_id, r.video_id, r.url, r.created, p.field, p.start,
+               snippet(passages, 0, '**', '**', ' … ', 16)
+        FROM passages p JOIN runs r ON r.run_id = p.run_id
+        WHERE passages MATCH ?
+    """
+    params = [expression]
+    if video_id:
+        sql += " AND r.video_id = ?"
+        params.append(video_id)
+    sql += " ORDER BY bm25(passages) LIMIT ?"
+    params.append(limit)
+
+    with closing(_connect(output_dir)) as conn:
+        rows = conn.execute(sql, params).fetchall()
+
+    return [
+        {
+            'run_id': run_id,
+            'video_id': video,
+            'url': url,
+            'created': created,
+            'field': field,
+            'start': start,
+            'snippet': snippet,
+            'link': deep_link(video, start)
+        }
+        for run_id, video, url, created, field, start, snippet in rows
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain and query the transcript search index")
+    parser.add_argument("--output-dir", default=None, help="Run store root (defaults to OUTPUT_DIR)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("update", help="Index runs that are not indexed yet")
+    commands.add_parser("rebuild", help="Rebuild the index from scratch")
+    search_parser = commands.add_parser("search", help="Search the index")
+    search_parser.add_argument("query")
+    search_parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.command == "update":
+        print(f"Indexed {update_index(args.output_dir)} runs")
+    elif args.command == "rebuild":
+        print(f"Indexed {rebuild_index(args.output_dir)} runs")
+    else:
+        for hit in search(args.query, args.limit, output_dir=args.output_dir):
+            print(f"{hit['link'] or hit['run_id']} [{hit['field']}] {hit['snippet']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import os
+import time
+import shutil
+import hashlib
+import threading
+
+WORKSPACE_ROOT = os.environ.get("WORKSPACE_DIR", os.path.join("temp", "jobs"))
+
+# Workspaces untouched for longer than this are removed by the janitor
+WORKSPACE_MAX_AGE = float(os.environ.get("WORKSPACE_MAX_AGE_HOURS", "24")) * 3600
+
+# Total size kept across all workspaces; the oldest are removed first
+WORKSPACE_MAX_BYTES = int(os.environ.get("WORKSPACE_MAX_BYTES", str(5 * 1024 ** 3)))
+
+def workspace_key(video_id=None, source=None):
+    """
+    Return a deterministic, collision-free workspace name
+
+    Args:
+        video_id (str): YouTube video ID, used as-is when available
+        source (str): URL or file path used when there is no video ID
+
+    Returns:
+        str: Workspace name
+    """
+    if video_id:
+        return video_id
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()[:32]
+
+def get_workspace(key):
+    """
+    Create (or reuse) the workspace directory for a job
+
+    Args:
+        key (str): Workspace name from workspace_key
+
+    Returns:
+        str: Workspace directory path
+    """
+    path = os.path.join(WORKSPACE_ROOT, key)
+    os.makedirs(path, exist_ok=True)
+
+    # Mark the workspace as in use so the janitor leaves it alone
+    os.utime(path)
+    return path
+
+def partial_path(workspace, name):
+    """
+    Return a path for an in-progress file that no other job writes to
+
+    Args:
+        workspace (str): Workspace directory
+        name (str): Final file name
+
+    Returns:
+        str: Path of the partial file
+    """
+    return os.path.join(workspace, f".{name}.{os.getpid()}-{threading.get_ident()}.part")
+
+def commit_file(partial, final):
+    """
+    Atomically move a finished file into place
+
+    Args:
+        partial (str): Path of the finished partial file
+        final (str): Final path in the same workspace
+
+    Returns:
+        str: Final path
+    """
+    os.replace(partial, final)
+    return final
+
+def find_output(workspace, stem):
+    """
+    Return the committed output with the given stem, if any
+
+    Args:
+        workspace (str): Workspace directory
+        stem (str): File name without extension
+
+    Returns:
+        str: Path to the output or None
+    """
+    for entry in os.scandir(workspace):
+        if entry.is_file() and os.path.splitext(entry.name)[0] == stem:
+            return entry.path
+    return None
+
+def _workspace_size(path):
+    """Total size of the files in a workspace"""
+    total = 0
+    for root, dirs, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+def evict_workspaces(max_age=None, max_bytes=None):
+    """
+    Remove stale workspaces by age, then the oldest until under the size budget
+
+    Args:
+        max_age (float): Seconds since last use (defaults to WORKSPACE_MAX_AGE)
+        max_bytes (int): Size budget (defaults to WORKSPACE_MAX_BYTES)
+
+    Returns:
+        int: Number of workspaces removed
+    """
+    max_age = WORKSPACE_MAX_AGE if max_age is None else max_age
+    max_bytes = WORKSPACE_MAX_BYTES if max_bytes is None else max_bytes
+    if not os.path.isdir(WORKSPACE_ROOT):
+        return 0
+
+    now = time.time()
+    workspaces = []
+    for entry in os.scandir(WORKSPACE_ROOT):
+        if entry.is_dir():
+            workspaces.append((entry.stat().st_mtime, entry.path, _workspace_size(entry.path)))
+    workspaces.sort()
+
+    removed = 0
+    total = sum(size for _, _, size in workspaces)
+    for mtime, path, size in workspaces:
+        if now - mtime <= max_age and total <= max_bytes:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+        removed += 1
+
+    return removed